@@ -0,0 +1,522 @@
+# benchmarks.py
+import argparse
+import json
+import os
+import random
+import re
+import time
+from typing import List, Dict, Any, Callable
+
+from section_segmenter import SectionSegmenter, FDA_SECTIONS
+from chunker import TokenAwareChunker
+
+WORDS = [
+    "abatacept", "dose", "infusion", "patients", "mg", "kg", "weekly", "subcutaneous",
+    "intravenous", "reactions", "clinical", "study", "placebo", "weight", "administered",
+    "serious", "infections", "methotrexate", "arthritis", "response", "treatment", "the",
+    "of", "and", "in", "with", "was", "for", "were", "to"
+]
+
+
+def _timed(func: Callable, repeat: int) -> float:
+    """Best wall time of several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_label_elements(pages: int, lines_per_page: int = 50, words_per_line: int = 12,
+                             seed: int = 0) -> List[Dict[str, Any]]:
+    """Build one pdfplumber-style text element per page with FDA headings sprinkled in"""
+    rng = random.Random(seed)
+    elements = []
+    for page in range(1, pages + 1):
+        lines = []
+        for line_no in range(lines_per_page):
+            if line_no == 0 and page % 20 == 1:
+                lines.append(FDA_SECTIONS[(page // 20) % len(FDA_SECTIONS)])
+            else:
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(words_per_line)))
+        elements.append({
+            "type": "TextElement",
+            "text": "\n".join(lines),
+            "metadata": {"page_number": page},
+            "page_number": page
+        })
+    return elements
+
+
+def _legacy_extract_sections(elements: List[Dict[str, Any]], fda_sections: List[str]) -> List[Dict[str, Any]]:
+    """Previous marker-injecting implementation, kept as the benchmark baseline"""
+    fda_section_pattern = re.compile(
+        r'^\s*(' + '|'.join(re.escape(section) for section in fda_sections) + r')\s*$',
+        re.IGNORECASE | re.MULTILINE
+    )
+    combined_text = ""
+    current_page = 1
+    for element in elements:
+        if element["type"] in ["CompositeElement", "TextElement"] and element["text"].strip():
+            if element["page_number"] != current_page:
+                combined_text += f"\n--- Page {element['page_number']} ---\n"
+                current_page = element["page_number"]
+            combined_text += element["text"] + "\n"
+
+    is_fda = sum(1 for section in fda_sections if section.upper() in combined_text.upper()) >= 3
+
+    sections = []
+    current_section = "INTRODUCTION"
+    content = ""
+    page_start = 1
+    page_end = 1
+    for line in combined_text.split("\n"):
+        if line.startswith("--- Page "):
+            if content.strip():
+                sections.append({"section": current_section, "content": content.strip(),
+                                 "page_start": page_start, "page_end": page_end, "is_fda": is_fda})
+                content = ""
+            match = re.match(r'--- Page (\d+) ---', line)
+            if match:
+                page_start = int(match.group(1))
+                page_end = page_start
+            continue
+        if is_fda:
+            section_match = fda_section_pattern.match(line.upper())
+        else:
+            section_match = (re.match(r'^\s*([A-Z][A-Z\s\-]+(?:\.|:)?)\s*$', line)
+                             and len(line.strip()) < 100
+                             and not line.strip().isdigit())
+        if section_match:
+            if content.strip():
+                sections.append({"section": current_section, "content": content.strip(),
+                                 "page_start": page_start, "page_end": page_end, "is_fda": is_fda})
+            current_section = line.strip().upper()
+            content = ""
+            page_start = page_end
+        else:
+            content += line + "\n"
+            page_end = current_page
+    if content.strip():
+        sections.append({"section": current_section, "content": content.strip(),
+                         "page_start": page_start, "page_end": page_end, "is_fda": is_fda})
+    return sections
+
+
+def benchmark_sections(args: argparse.Namespace):
+    """Compare the streaming section segmenter with the legacy implementation"""
+    elements = synthetic_label_elements(args.pages)
+    total_chars = sum(len(e["text"]) for e in elements)
+    segmenter = SectionSegmenter()
+
+    print(f"Synthetic label: {args.pages} pages, {total_chars / 1e6:.1f}M characters")
+
+    streaming = _timed(lambda: segmenter.segment(elements), args.repeat)
+    sections = segmenter.segment(elements)
+    print(f"Streaming segmenter: {streaming * 1000:8.1f} ms  ({len(sections)} sections)")
+
+    if not args.skip_legacy:
+        legacy = _timed(lambda: _legacy_extract_sections(elements, FDA_SECTIONS), args.repeat)
+        legacy_sections = _legacy_extract_sections(elements, FDA_SECTIONS)
+        print(f"Legacy extraction:   {legacy * 1000:8.1f} ms  ({len(legacy_sections)} page-split sections)")
+        print(f"Speedup: {legacy / streaming:.1f}x")
+
+
+def benchmark_chunking(args: argparse.Namespace):
+    """Throughput of the token-aware chunker over a synthetic corpus"""
+    sections = []
+    for label in range(args.labels):
+        elements = synthetic_label_elements(args.pages, seed=label)
+        sections.extend(SectionSegmenter().segment(elements))
+    total_chars = sum(len(s["content"]) for s in sections)
+    chunker = TokenAwareChunker(max_tokens=args.max_tokens)
+
+    print(f"Synthetic corpus: {args.labels} labels x {args.pages} pages, {total_chars / 1e6:.1f}M characters")
+    print(f"Tokenizer: {'fast batch' if chunker.tokenizer is not None else 'approximate fallback'}")
+
+    elapsed = _timed(lambda: chunker.chunk_sections(sections), args.repeat)
+    chunks = [c for section_chunks in chunker.chunk_sections(sections) for c in section_chunks]
+    largest = max(c["token_count"] for c in chunks)
+    unique_ids = len({c["chunk_id"] for c in chunks})
+    print(f"Chunked into {len(chunks)} chunks in {elapsed:.2f} s ({total_chars / 1e6 / elapsed:.1f}M chars/s)")
+    print(f"Largest chunk: {largest} tokens (limit {args.max_tokens}), unique ids: {unique_ids}/{len(chunks)}")
+
+
+def load_eval_set(path: str) -> List[Dict[str, Any]]:
+    """Load held-out questions, one JSON object per line.
+
+    Each line has a "query" and at least one relevance criterion: "pdf_name",
+    "pages" (list of PDF page numbers) and/or "text" (a substring of the answer).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(result: Dict[str, Any], item: Dict[str, Any]) -> bool:
+    """Check a retrieved chunk against the relevance criteria of an eval item"""
+    if item.get("pdf_name") and result.get("pdf_name") != item["pdf_name"]:
+        return False
+    if item.get("pages"):
+        page_start = result.get("page_start") or 0
+        page_end = result.get("page_end") or page_start
+        if not any(page_start <= page <= page_end for page in item["pages"]):
+            return False
+    if item.get("text") and item["text"].lower() not in result.get("chunk_text", "").lower():
+        return False
+    return True
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def evaluate_retrieval(search: Callable[[str], List[Dict[str, Any]]], eval_set: List[Dict[str, Any]],
+                       k: int) -> Dict[str, float]:
+    """Recall@k and latency of a retrieval function over an eval set"""
+    hits = 0
+    latencies = []
+    for item in eval_set:
+        start = time.perf_counter()
+        results = search(item["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        if any(is_relevant(result, item) for result in results[:k]):
+            hits += 1
+    return {
+        "recall": hits / max(len(eval_set), 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99)
+    }
+
+
+def benchmark_retrieval(args: argparse.Namespace):
+    """Recall@k of dense-only retrieval against hybrid BM25 + dense retrieval"""
+    from vector_db import EfficientVectorDB
+
+    vector_db = EfficientVectorDB(persist_directory=args.db)
+    if not vector_db.initialize(reset=False):
+        return
+    eval_set = load_eval_set(args.eval)
+    print(f"{len(eval_set)} queries against {vector_db.get_document_count()} chunks, recall@{args.k}")
+
+    for name, hybrid in [("dense only", False), ("hybrid", True)]:
+        stats = evaluate_retrieval(lambda q: vector_db.query(q, n_results=args.k, hybrid=hybrid), eval_set, args.k)
+        print(f"{name:12s} recall@{args.k}={stats['recall']:.3f}  p50={stats['p50_ms']:.1f} ms  p99={stats['p99_ms']:.1f} ms")
+
+
+def benchmark_rerank(args: argparse.Namespace):
+    """Quality/latency trade-off of cross-encoder reranking per candidate pool size"""
+    from vector_db import EfficientVectorDB
+    from reranker import CrossEncoderReranker
+
+    reranker = CrossEncoderReranker(model_name=args.model, time_budget_ms=args.budget_ms)
+    vector_db = EfficientVectorDB(persist_directory=args.db, reranker=reranker)
+    if not vector_db.initialize(reset=False):
+        return
+    eval_set = load_eval_set(args.eval)
+    print(f"{len(eval_set)} queries against {vector_db.get_document_count()} chunks, recall@{args.k}")
+
+    for pool in args.pools:
+        for name, rerank in [("heuristic", False), ("cross-encoder", True)]:
+            if rerank and not reranker.is_available():
+                continue
+            stats = evaluate_retrieval(
+                lambda q: vector_db.query(q, n_results=args.k, candidate_pool=pool, rerank=rerank),
+                eval_set, args.k
+            )
+            print(f"pool={pool:4d} {name:13s} recall@{args.k}={stats['recall']:.3f}  "
+                  f"p50={stats['p50_ms']:.1f} ms  p99={stats['p99_ms']:.1f} ms")
+
+
+def _directory_size(path: str) -> int:
+    """Total size of the files under a directory, in bytes"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def load_embedding_eval(args: argparse.Namespace) -> Dict[str, Any]:
+    """Stored chunk embeddings, embedded eval queries and their exact cosine top-k ids"""
+    import numpy as np
+    from vector_db import EfficientVectorDB
+
+    vector_db = EfficientVectorDB(persist_directory=args.db)
+    if not vector_db.initialize(reset=False):
+        raise SystemExit(1)
+    stored = vector_db.collection.get(include=["embeddings", "metadatas"])
+    ids = stored["ids"]
+    embeddings = np.asarray(stored["embeddings"], dtype=np.float32)
+    normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    eval_set = load_eval_set(args.eval)
+    queries = np.asarray(vector_db.embedding_function([item["query"] for item in eval_set]), dtype=np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    # Ground truth: exact cosine top-k by brute force
+    exact = np.argsort(-(queries @ normalized.T), axis=1)[:, :args.k]
+    return {
+        "vector_db": vector_db,
+        "ids": ids,
+        "pdf_names": [metadata.get("pdf_name", "unknown") for metadata in stored["metadatas"]],
+        "embeddings": embeddings,
+        "queries": queries,
+        "exact_ids": [{ids[i] for i in row} for row in exact]
+    }
+
+
+def benchmark_hnsw(args: argparse.Namespace):
+    """Sweep HNSW parameters and report recall@k against exact search, latency, build time and size"""
+    import itertools
+    import shutil
+    import tempfile
+    import chromadb
+    from vector_db import hnsw_metadata
+
+    data = load_embedding_eval(args)
+    ids, embeddings, queries, exact_ids = data["ids"], data["embeddings"], data["queries"], data["exact_ids"]
+    print(f"{len(queries)} queries against {len(ids)} chunks, recall@{args.k} vs exact search")
+    print(f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'build s':>8} {'size MB':>8}")
+
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        directory = tempfile.mkdtemp(prefix="hnsw_sweep_")
+        try:
+            client = chromadb.PersistentClient(path=directory)
+            collection = client.create_collection(name="sweep", metadata=hnsw_metadata(m, construction_ef, search_ef))
+            start = time.perf_counter()
+            for offset in range(0, len(ids), args.batch_size):
+                collection.add(ids=ids[offset:offset + args.batch_size],
+                               embeddings=embeddings[offset:offset + args.batch_size].tolist())
+            build_time = time.perf_counter() - start
+
+            latencies = []
+            recall = 0.0
+            for query, truth in zip(queries, exact_ids):
+                start = time.perf_counter()
+                found = collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])
+                latencies.append((time.perf_counter() - start) * 1000)
+                recall += len(truth & set(found["ids"][0])) / max(len(truth), 1)
+            recall /= max(len(queries), 1)
+
+            size_mb = _directory_size(directory) / 1e6
+            print(f"{m:4d} {construction_ef:9d} {search_ef:9d} {recall:7.3f} {percentile(latencies, 50):7.2f} "
+                  f"{percentile(latencies, 99):7.2f} {build_time:8.1f} {size_mb:8.1f}")
+            del collection, client
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def benchmark_quantized(args: argparse.Namespace):
+    """Recall loss, memory and latency of quantized storage against the HNSW index and exact search"""
+    import tempfile
+    from quantized_store import QuantizedVectorStore
+
+    data = load_embedding_eval(args)
+    ids, queries, exact_ids = data["ids"], data["queries"], data["exact_ids"]
+    print(f"{len(queries)} queries against {len(ids)} chunks, recall@{args.k} vs exact search")
+    print(f"{'index':22s} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'memory MB':>10} {'ratio':>6}")
+
+    def report(name: str, search: Callable, memory: float, float32_memory: float):
+        latencies = []
+        recall = 0.0
+        for query, truth in zip(queries, exact_ids):
+            start = time.perf_counter()
+            found = search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recall += len(truth & set(found)) / max(len(truth), 1)
+        print(f"{name:22s} {recall / max(len(queries), 1):7.3f} {percentile(latencies, 50):7.2f} "
+              f"{percentile(latencies, 99):7.2f} {memory / 1e6:10.1f} {float32_memory / max(memory, 1):5.1f}x")
+
+    float32_memory = data["embeddings"].nbytes
+    collection = data["vector_db"].collection
+    report("hnsw (current)",
+           lambda q: collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=[])["ids"][0],
+           float32_memory, float32_memory)
+
+    for method in args.methods:
+        store = QuantizedVectorStore(tempfile.mkdtemp(prefix="quantized_"), method=method,
+                                     pq_subvectors=args.pq_subvectors, rerank_factor=args.rerank_factor)
+        start = time.perf_counter()
+        store.build(ids, data["embeddings"], data["pdf_names"])
+        print(f"Built {method} in {time.perf_counter() - start:.1f} s")
+        codes_memory = store.memory_bytes()["codes"]
+        for rerank in (False, True):
+            report(f"{method}{' + rerank' if rerank else ''}",
+                   lambda q: [doc_id for doc_id, _ in store.search(q, k=args.k, rerank=rerank)],
+                   codes_memory, float32_memory)
+
+
+def benchmark_lexical(args: argparse.Namespace):
+    """BM25 query latency on a synthetic corpus with a Zipfian vocabulary"""
+    import numpy as np
+    from lexical_index import BM25Index
+
+    rng = np.random.default_rng(0)
+    ranks = np.minimum(rng.zipf(1.3, size=(args.chunks, args.words)), args.vocabulary)
+    texts = [" ".join(f"t{r}" for r in row) for row in ranks]
+
+    index = BM25Index()
+    start = time.perf_counter()
+    index.add([str(i) for i in range(args.chunks)], texts, ["synthetic.pdf"] * args.chunks)
+    index.finalize()
+    print(f"Built BM25 index over {args.chunks} chunks in {time.perf_counter() - start:.1f} s")
+
+    queries = [" ".join(f"t{r}" for r in row) for row in np.minimum(rng.zipf(1.3, size=(args.queries, 6)), args.vocabulary)]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=25)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"Query latency p50={percentile(latencies, 50):.2f} ms  p99={percentile(latencies, 99):.2f} ms")
+
+
+def benchmark_context(args: argparse.Namespace):
+    """Prompt context size and answer coverage of the context packer per token budget"""
+    from vector_db import EfficientVectorDB
+    from context_packer import ContextPacker, estimate_tokens
+
+    vector_db = EfficientVectorDB(persist_directory=args.db)
+    if not vector_db.initialize(reset=False):
+        return
+    eval_set = load_eval_set(args.eval)
+    retrieved = vector_db.query_batch([item["query"] for item in eval_set], n_results=args.n_results)
+    unpacked = [sum(estimate_tokens(chunk["chunk_text"]) for chunk in chunks) for chunks in retrieved]
+    covered = sum(any(is_relevant(chunk, item) for chunk in chunks) for item, chunks in zip(eval_set, retrieved))
+    print(f"{len(eval_set)} queries, {args.n_results} chunks each")
+    print(f"{'unpacked':>14s}  tokens p50={percentile(unpacked, 50):.0f}  p99={percentile(unpacked, 99):.0f}  "
+          f"coverage={covered / max(len(eval_set), 1):.3f}")
+
+    for budget in args.budgets:
+        packer = ContextPacker(token_budget=budget)
+        tokens, latencies, covered = [], [], 0
+        for item, chunks in zip(eval_set, retrieved):
+            packed, stats = packer.pack(item["query"], chunks)
+            tokens.append(stats["packed_tokens"])
+            latencies.append(stats["pack_ms"])
+            covered += any(is_relevant(chunk, item) for chunk in packed)
+        print(f"budget={budget:6d}  tokens p50={percentile(tokens, 50):.0f}  p99={percentile(tokens, 99):.0f}  "
+              f"coverage={covered / max(len(eval_set), 1):.3f}  pack p99={percentile(latencies, 99):.2f} ms")
+
+
+def _legacy_table_text(table_data: Dict[str, Any], page_num: int) -> str:
+    """Previous PDFProcessor table rendering (string += in a double loop), kept as the baseline"""
+    text_rep = f"Table from page {page_num}. "
+    if table_data["headers"]:
+        text_rep += f"Headers: {', '.join([h for h in table_data['headers'] if h])}. "
+    for i, row in enumerate(table_data["data"]):
+        if any(cell.strip() for cell in row):
+            row_data = []
+            for j, cell in enumerate(row):
+                if cell.strip() and j < len(table_data["headers"]):
+                    header_name = table_data["headers"][j] if table_data["headers"][j] else f"Column_{j+1}"
+                    row_data.append(f"{header_name}: {cell}")
+            if row_data:
+                text_rep += f"Row {i+1}: {', '.join(row_data)}. "
+    return text_rep.strip()
+
+
+def benchmark_tables(args: argparse.Namespace):
+    """Rendering time and output size of the table text formats on large synthetic tables"""
+    from table_render import render_table, TABLE_FORMATS
+
+    rng = random.Random(0)
+    headers = [f"{rng.choice(WORDS).title()} {j + 1}" for j in range(args.columns)]
+    rows = [
+        [f"{rng.randint(1, 999)} {rng.choice(WORDS)}" if rng.random() > 0.1 else "" for _ in range(args.columns)]
+        for _ in range(args.rows)
+    ]
+    print(f"{args.rows} rows x {args.columns} columns")
+
+    legacy = _legacy_table_text({"headers": headers, "data": rows}, 1)
+    if not args.skip_legacy:
+        seconds = _timed(lambda: _legacy_table_text({"headers": headers, "data": rows}, 1), args.repeat)
+        print(f"{'legacy':>10s}  {seconds * 1000:8.1f} ms  {len(legacy):10d} chars")
+    for fmt in TABLE_FORMATS:
+        seconds = _timed(lambda: render_table(headers, rows, fmt, page_number=1), args.repeat)
+        text = render_table(headers, rows, fmt, page_number=1)
+        print(f"{fmt:>10s}  {seconds * 1000:8.1f} ms  {len(text):10d} chars")
+    assert render_table(headers, rows, "sentences", page_number=1) == legacy, "sentence rendering differs from legacy"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the DrugRAG pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sections_parser = subparsers.add_parser("sections", help="Section extraction on synthetic labels")
+    sections_parser.add_argument("--pages", type=int, default=1000)
+    sections_parser.add_argument("--repeat", type=int, default=3)
+    sections_parser.add_argument("--skip-legacy", action="store_true")
+    sections_parser.set_defaults(func=benchmark_sections)
+
+    chunking_parser = subparsers.add_parser("chunking", help="Token-aware chunking throughput")
+    chunking_parser.add_argument("--labels", type=int, default=20)
+    chunking_parser.add_argument("--pages", type=int, default=100)
+    chunking_parser.add_argument("--max-tokens", type=int, default=250)
+    chunking_parser.add_argument("--repeat", type=int, default=1)
+    chunking_parser.set_defaults(func=benchmark_chunking)
+
+    retrieval_parser = subparsers.add_parser("retrieval", help="Recall@k of dense-only vs hybrid retrieval")
+    retrieval_parser.add_argument("--eval", required=True, help="JSONL file of held-out queries")
+    retrieval_parser.add_argument("--db", default="./chroma_db")
+    retrieval_parser.add_argument("--k", type=int, default=5)
+    retrieval_parser.set_defaults(func=benchmark_retrieval)
+
+    rerank_parser = subparsers.add_parser("rerank", help="Cross-encoder reranking quality/latency per pool size")
+    rerank_parser.add_argument("--eval", required=True, help="JSONL file of held-out queries")
+    rerank_parser.add_argument("--db", default="./chroma_db")
+    rerank_parser.add_argument("--k", type=int, default=5)
+    rerank_parser.add_argument("--pools", type=int, nargs="+", default=[10, 25, 50, 100])
+    rerank_parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_parser.add_argument("--budget-ms", type=float, default=300.0)
+    rerank_parser.set_defaults(func=benchmark_rerank)
+
+    hnsw_parser = subparsers.add_parser("hnsw", help="HNSW parameter sweep against exact search")
+    hnsw_parser.add_argument("--eval", required=True, help="JSONL file of held-out queries")
+    hnsw_parser.add_argument("--db", default="./chroma_db")
+    hnsw_parser.add_argument("--k", type=int, default=10)
+    hnsw_parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    hnsw_parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    hnsw_parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    hnsw_parser.add_argument("--batch-size", type=int, default=5000)
+    hnsw_parser.set_defaults(func=benchmark_hnsw)
+
+    quantized_parser = subparsers.add_parser("quantized", help="Recall and memory of quantized vector storage")
+    quantized_parser.add_argument("--eval", required=True, help="JSONL file of held-out queries")
+    quantized_parser.add_argument("--db", default="./chroma_db")
+    quantized_parser.add_argument("--k", type=int, default=10)
+    quantized_parser.add_argument("--methods", nargs="+", default=["sq8", "pq"])
+    quantized_parser.add_argument("--pq-subvectors", type=int, default=96)
+    quantized_parser.add_argument("--rerank-factor", type=int, default=8)
+    quantized_parser.set_defaults(func=benchmark_quantized)
+
+    lexical_parser = subparsers.add_parser("lexical", help="BM25 query latency at corpus scale")
+    lexical_parser.add_argument("--chunks", type=int, default=1000000)
+    lexical_parser.add_argument("--words", type=int, default=40)
+    lexical_parser.add_argument("--vocabulary", type=int, default=50000)
+    lexical_parser.add_argument("--queries", type=int, default=200)
+    lexical_parser.set_defaults(func=benchmark_lexical)
+
+    context_parser = subparsers.add_parser("context", help="Prompt tokens and coverage of context packing")
+    context_parser.add_argument("--eval", required=True, help="JSONL file of held-out queries")
+    context_parser.add_argument("--db", default="./chroma_db")
+    context_parser.add_argument("--n-results", type=int, default=10)
+    context_parser.add_argument("--budgets", type=int, nargs="+", default=[1000, 2000, 3000])
+    context_parser.set_defaults(func=benchmark_context)
+
+    tables_parser = subparsers.add_parser("tables", help="Table text rendering on large synthetic tables")
+    tables_parser.add_argument("--rows", type=int, default=20000)
+    tables_parser.add_argument("--columns", type=int, default=8)
+    tables_parser.add_argument("--repeat", type=int, default=3)
+    tables_parser.add_argument("--skip-legacy", action="store_true")
+    tables_parser.set_defaults(func=benchmark_tables)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
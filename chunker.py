@@ -0,0 +1,153 @@
+import math
+import re
+from typing import List, Dict, Any, Tuple
+
+# Sentence ends at terminal punctuation followed by whitespace, or at a line break
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+_APPROX_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+
+class TokenAwareChunker:
+    """Sentence-aware chunker that measures chunk length in embedding-model tokens.
+
+    Chroma's default embedding model (all-MiniLM-L6-v2) truncates input at 256
+    word pieces, so chunks are packed from whole sentences up to `max_tokens`
+    and never exceed it. All sentences of a document are tokenized in a single
+    batch call to the Rust `tokenizers` library.
+    """
+
+    def __init__(self, tokenizer_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 max_tokens: int = 250, overlap_tokens: int = 32):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer_name = tokenizer_name
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = None
+        self._initialize_tokenizer()
+
+    def _initialize_tokenizer(self):
+        """Load the fast tokenizer of the embedding model"""
+        try:
+            from tokenizers import Tokenizer
+            self.tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+            self.tokenizer.no_truncation()
+            self.tokenizer.no_padding()
+        except Exception as e:
+            print(f"Failed to load tokenizer {self.tokenizer_name}: {e}")
+            print("Falling back to approximate token counts")
+            self.tokenizer = None
+
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of the non-empty sentences in a text"""
+        spans = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(text):
+            spans.append((start, match.start()))
+            start = match.end()
+        spans.append((start, len(text)))
+        return [(s, e) for s, e in spans if text[s:e].strip()]
+
+    def _token_offsets(self, sentences: List[str]) -> List[List[Tuple[int, int]]]:
+        """Per-sentence token character offsets, computed in one batch"""
+        if self.tokenizer is not None:
+            encodings = self.tokenizer.encode_batch(sentences, add_special_tokens=False)
+            return [encoding.offsets for encoding in encodings]
+
+        # Approximation: word pieces are on average ~1.3 per word
+        offsets = []
+        for sentence in sentences:
+            words = [(m.start(), m.end()) for m in _APPROX_TOKEN_PATTERN.finditer(sentence)]
+            pieces = []
+            for start, end in words:
+                pieces.extend([(start, end)] * max(1, math.ceil((end - start) / 6)))
+            offsets.append(pieces)
+        return offsets
+
+    def chunk_text(self, text: str, ordinal_start: int = 0) -> List[Dict[str, Any]]:
+        """Chunk a single text"""
+        return self.chunk_sections([{"content": text}], ordinal_start)[0]
+
+    def chunk_sections(self, sections: List[Dict[str, Any]], ordinal_start: int = 0) -> List[List[Dict[str, Any]]]:
+        """Chunk the content of many sections with one tokenizer call.
+
+        Returns one chunk list per section. Chunk ids are ordinals that are unique
+        across all given sections; `char_start`/`char_end` index the section content.
+        """
+        section_spans = [self._sentence_spans(section["content"]) for section in sections]
+        sentences = [
+            section["content"][start:end]
+            for section, spans in zip(sections, section_spans)
+            for start, end in spans
+        ]
+        token_offsets = self._token_offsets(sentences) if sentences else []
+
+        ordinal = ordinal_start
+        results = []
+        cursor = 0
+        for section, spans in zip(sections, section_spans):
+            offsets = token_offsets[cursor:cursor + len(spans)]
+            cursor += len(spans)
+            chunks = self._pack(section["content"], spans, offsets, ordinal)
+            ordinal += len(chunks)
+            results.append(chunks)
+        return results
+
+    def _pack(self, text: str, spans: List[Tuple[int, int]], offsets: List[List[Tuple[int, int]]],
+              ordinal: int) -> List[Dict[str, Any]]:
+        """Greedily pack whole sentences into chunks of at most max_tokens"""
+        chunks = []
+        current = []  # (char_start, char_end, token_count)
+        has_new_content = False
+
+        def emit(char_start: int, char_end: int, token_count: int):
+            content = text[char_start:char_end]
+            chunks.append({
+                "content": content,
+                "chunk_id": f"chunk_{ordinal + len(chunks)}",
+                "chunk_ordinal": ordinal + len(chunks),
+                "char_start": char_start,
+                "char_end": char_end,
+                "token_count": token_count
+            })
+
+        def flush():
+            nonlocal current, has_new_content
+            if current and has_new_content:
+                emit(current[0][0], current[-1][1], sum(t for _, _, t in current))
+            # Carry trailing sentences into the next chunk as overlap
+            carried = []
+            carried_tokens = 0
+            for sentence in reversed(current):
+                if carried_tokens + sentence[2] > self.overlap_tokens:
+                    break
+                carried.insert(0, sentence)
+                carried_tokens += sentence[2]
+            current = carried
+            has_new_content = False
+
+        for (start, end), sentence_offsets in zip(spans, offsets):
+            token_count = len(sentence_offsets)
+
+            if token_count > self.max_tokens:
+                # A single over-long sentence is split on token boundaries
+                flush()
+                current = []
+                step = self.max_tokens - self.overlap_tokens
+                for i in range(0, token_count, step):
+                    window = sentence_offsets[i:i + self.max_tokens]
+                    emit(start + window[0][0], start + window[-1][1], len(window))
+                    if i + self.max_tokens >= token_count:
+                        break
+                continue
+
+            if sum(t for _, _, t in current) + token_count > self.max_tokens:
+                flush()
+                if sum(t for _, _, t in current) + token_count > self.max_tokens:
+                    current = []
+
+            current.append((start, end, token_count))
+            has_new_content = True
+
+        flush()
+        return chunks
@@ -0,0 +1,161 @@
+import math
+import re
+import time
+from typing import List, Dict, Any, Optional, Callable, Set, Tuple
+
+_WORD_PATTERN = re.compile(r'\w+')
+_APPROX_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+_TABLE_ROW_PATTERN = re.compile(r'(?=\bRow \d+: )')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count: one token per short word or punctuation mark"""
+    return sum(max(1, math.ceil((m.end() - m.start()) / 6)) for m in _APPROX_TOKEN_PATTERN.finditer(text))
+
+
+def _terms(text: str) -> Set[str]:
+    return {word.lower() for word in _WORD_PATTERN.findall(text) if len(word) > 1}
+
+
+class ContextPacker:
+    """Fits retrieved chunks into a fixed prompt token budget.
+
+    Adjacent chunks of the same section are merged first, tables are cut down
+    to the rows sharing the most terms with the query, and chunks are then
+    selected greedily by maximal marginal relevance (MMR): relevance is the
+    retrieval score, redundancy the word overlap with already selected chunks.
+    The last chunk that does not fit whole is trimmed at a sentence boundary.
+    `pack` returns its statistics with the result, so one packer can be shared
+    by concurrent queries.
+    """
+
+    def __init__(self, token_budget: int = 3000, mmr_lambda: float = 0.7, max_table_rows: int = 8,
+                 min_chunk_tokens: int = 48, count_tokens: Optional[Callable[[str], int]] = None):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.max_table_rows = max_table_rows
+        self.min_chunk_tokens = min_chunk_tokens
+        self.count_tokens = count_tokens or estimate_tokens
+
+    def pack(self, query: str, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Selected (and possibly merged or trimmed) copies of the chunks, most relevant first, and packing statistics"""
+        start = time.perf_counter()
+        query_terms = _terms(query)
+        candidates = self._merge_adjacent([dict(chunk) for chunk in chunks])
+        for chunk in candidates:
+            if chunk.get("doc_type") == "table":
+                chunk["chunk_text"] = self._compress_table(chunk["chunk_text"], query_terms)
+
+        tokens = [self.count_tokens(chunk["chunk_text"]) for chunk in candidates]
+        terms = [_terms(chunk["chunk_text"]) for chunk in candidates]
+        relevance = self._normalized_relevance(candidates)
+
+        selected = []
+        used = 0
+        trimmed = 0
+        remaining = list(range(len(candidates)))
+        while remaining and used < self.token_budget:
+            best = max(remaining, key=lambda i: self._mmr(i, relevance, terms, selected))
+            remaining.remove(best)
+            chunk = candidates[best]
+            if used + tokens[best] > self.token_budget:
+                room = self.token_budget - used
+                if room < self.min_chunk_tokens:
+                    continue
+                chunk["chunk_text"] = self._trim(chunk["chunk_text"], room)
+                tokens[best] = self.count_tokens(chunk["chunk_text"])
+                trimmed += 1
+            selected.append(best)
+            used += tokens[best]
+
+        stats = {
+            "input_chunks": len(chunks),
+            "input_tokens": sum(self.count_tokens(chunk.get("chunk_text", "")) for chunk in chunks),
+            "packed_chunks": len(selected),
+            "packed_tokens": used,
+            "trimmed_chunks": trimmed,
+            "pack_ms": (time.perf_counter() - start) * 1000
+        }
+        return [candidates[i] for i in selected], stats
+
+    def _merge_adjacent(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Join chunks that continue each other in the same document section"""
+        merged = []
+        by_position = sorted(
+            (chunk for chunk in chunks if chunk.get("char_start") is not None and chunk.get("char_end") is not None),
+            key=lambda chunk: (chunk.get("pdf_name", ""), chunk["char_start"])
+        )
+        for chunk in by_position:
+            previous = merged[-1] if merged else None
+            if (previous is not None and previous.get("pdf_name") == chunk.get("pdf_name")
+                    and previous.get("section") == chunk.get("section")
+                    and chunk["char_start"] <= previous["char_end"] + 1):
+                # Overlapping chunks share characters; append only the new tail
+                overlap = max(previous["char_end"] - chunk["char_start"], 0)
+                separator = "" if overlap else " "
+                if chunk["char_end"] > previous["char_end"]:
+                    previous["chunk_text"] += separator + chunk["chunk_text"][overlap:]
+                    previous["char_end"] = chunk["char_end"]
+                previous["page_end"] = max(previous.get("page_end") or 0, chunk.get("page_end") or 0) or None
+                previous["score"] = max(previous.get("score", 0.0), chunk.get("score", 0.0))
+                if "rerank_score" in chunk:
+                    previous["rerank_score"] = max(previous.get("rerank_score", chunk["rerank_score"]),
+                                                   chunk["rerank_score"])
+            else:
+                merged.append(chunk)
+        # Chunks without offsets (tables, images, legacy chunks) are kept as they are
+        return merged + [chunk for chunk in chunks if chunk.get("char_start") is None or chunk.get("char_end") is None]
+
+    def _compress_table(self, text: str, query_terms: Set[str]) -> str:
+        """Keep the table preamble and the rows that share the most terms with the query"""
+        parts = _TABLE_ROW_PATTERN.split(text)
+        preamble, rows = parts[0], [row for row in parts[1:] if row.strip()]
+        if len(rows) <= self.max_table_rows:
+            return text
+        overlaps = [len(_terms(row) & query_terms) for row in rows]
+        # Best rows first, ties broken by table order; shown in table order
+        keep = sorted(sorted(range(len(rows)), key=lambda i: -overlaps[i])[:self.max_table_rows])
+        kept_rows = " ".join(rows[i].strip() for i in keep)
+        return f"{preamble.strip()} {kept_rows} ({len(keep)} of {len(rows)} rows shown)"
+
+    def _trim(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of whole sentences within max_tokens, else a hard word cut"""
+        kept = []
+        used = 0
+        for sentence in _SENTENCE_END.split(text):
+            sentence_tokens = self.count_tokens(sentence)
+            if used + sentence_tokens > max_tokens:
+                break
+            kept.append(sentence)
+            used += sentence_tokens
+        if kept:
+            return " ".join(kept) + " ..."
+        words = []
+        for word in text.split():
+            word_tokens = self.count_tokens(word)
+            if used + word_tokens > max_tokens:
+                break
+            words.append(word)
+            used += word_tokens
+        return " ".join(words) + " ..."
+
+    @staticmethod
+    def _normalized_relevance(chunks: List[Dict[str, Any]]) -> List[float]:
+        """Rerank scores when available, else retrieval scores, scaled to [0, 1]"""
+        use_rerank = chunks and all("rerank_score" in chunk for chunk in chunks)
+        scores = [chunk["rerank_score"] if use_rerank else chunk.get("score", 0.0) for chunk in chunks]
+        if not scores:
+            return []
+        low, high = min(scores), max(scores)
+        if high - low < 1e-9:
+            return [1.0] * len(scores)
+        return [(score - low) / (high - low) for score in scores]
+
+    def _mmr(self, i: int, relevance: List[float], terms: List[Set[str]], selected: List[int]) -> float:
+        redundancy = 0.0
+        for j in selected:
+            union = len(terms[i] | terms[j])
+            if union:
+                redundancy = max(redundancy, len(terms[i] & terms[j]) / union)
+        return self.mmr_lambda * relevance[i] - (1.0 - self.mmr_lambda) * redundancy
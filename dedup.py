@@ -0,0 +1,280 @@
+import os
+import re
+import json
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Any, Set, Tuple, Optional
+import numpy as np
+from drug_index import drug_key, filename_drug_names
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_set(text: str, size: int = 5) -> Set[int]:
+    """Hash the word n-gram shingles of a text into a set of 32-bit integers"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def containment(candidate: Set[int], reference: Set[int]) -> float:
+    """Fraction of the candidate shingles that also occur in the reference set"""
+    if not candidate:
+        return 1.0
+    return len(candidate & reference) / len(candidate)
+
+
+def reconcile_extractor_text(elements: List[Dict[str, Any]], threshold: float = 0.8,
+                             shingle_size: int = 5, page_window: int = 1) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+    """Drop pdfplumber page text that is already covered by unstructured elements.
+
+    Unstructured `CompositeElement`s are treated as the canonical version because
+    they carry title-based chunking. A pdfplumber `TextElement` for page N is only
+    kept when less than `threshold` of its shingles appear in the composite text of
+    pages N-page_window..N+page_window (composites may run across a page break).
+    Returns the kept elements, the dropped elements and a savings report.
+    """
+    composite_shingles = defaultdict(set)
+    for element in elements:
+        if element["type"] == "CompositeElement" and element["text"].strip():
+            composite_shingles[element["page_number"]] |= shingle_set(element["text"], shingle_size)
+
+    kept = []
+    dropped = []
+    pages_compared = 0
+
+    for element in elements:
+        if element["type"] != "TextElement" or not composite_shingles:
+            kept.append(element)
+            continue
+
+        page = element["page_number"]
+        reference = set()
+        for neighbour in range(page - page_window, page + page_window + 1):
+            reference |= composite_shingles.get(neighbour, set())
+
+        if not reference:
+            # Unstructured produced nothing around this page, pdfplumber is the only source
+            kept.append(element)
+            continue
+
+        pages_compared += 1
+        if containment(shingle_set(element["text"], shingle_size), reference) >= threshold:
+            dropped.append(element)
+        else:
+            kept.append(element)
+
+    bytes_before = sum(len(e["text"].encode("utf-8")) for e in elements)
+    bytes_saved = sum(len(e["text"].encode("utf-8")) for e in dropped)
+
+    report = {
+        "pages_compared": pages_compared,
+        "elements_dropped": len(dropped),
+        "dropped_pages": sorted({e["page_number"] for e in dropped}),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_before - bytes_saved,
+        "bytes_saved": bytes_saved,
+    }
+    return kept, dropped, report
+
+
+class NearDuplicateIndex:
+    """Corpus-level MinHash/LSH index that folds near-duplicate chunks into one canonical copy.
+
+    The first occurrence of a passage is stored; later copies (for example the same
+    paragraph in the IV and subcutaneous labels) are not embedded again but recorded
+    as back-references in the canonical chunk's `shared_sources` metadata.
+    Copies are only folded into a canonical of the same drug, i.e. whose filename
+    shares a drug name with theirs ("orencia_intravenous" and
+    "orencia_clickject_125mg" both name "orencia"), because drug filters, BM25
+    and shard routing see only the canonical chunk's pdf_name. With a `directory` the signatures are persisted
+    next to the collection, so later additions still fold into stored chunks.
+    """
+
+    _PRIME = (1 << 31) - 1
+    # Canonical metadata kept on disk: enough to route back-reference updates to the stored chunk
+    _PERSISTED_FIELDS = ("pdf_name", "row", "shared_sources")
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 8,
+                 shingle_size: int = 5, seed: int = 7, directory: Optional[str] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.directory = directory
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, self._PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, self._PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._signatures = {}
+        self._canonical_metadata = {}
+        self._drug_names = {}  # pdf_name -> drug names of its filename
+        self.folded_count = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Compute the MinHash signature of a text, or None if it has no words"""
+        shingles = shingle_set(text, self.shingle_size)
+        if not shingles:
+            return None
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) & np.uint64(self._PRIME)
+        return ((self._a * values[None, :] + self._b) % np.uint64(self._PRIME)).min(axis=1)
+
+    def drug_names(self, pdf_name: str) -> Set[str]:
+        """Lexicon drug names of a document's filename, or its partition key if it names none"""
+        names = self._drug_names.get(pdf_name)
+        if names is None:
+            names = self._drug_names[pdf_name] = set(filename_drug_names(pdf_name)) or {drug_key(pdf_name)}
+        return names
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find_duplicate(self, signature: np.ndarray, drugs: Optional[Set[str]] = None) -> Optional[str]:
+        """Return the id of a stored chunk (naming one of `drugs`, if given) whose estimated Jaccard similarity exceeds the threshold"""
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate_id in self._buckets[band].get(key, ()):
+                if candidate_id in seen:
+                    continue
+                seen.add(candidate_id)
+                candidate_pdf = self._canonical_metadata[candidate_id].get("pdf_name", "unknown")
+                if drugs is not None and not drugs & self.drug_names(candidate_pdf):
+                    continue
+                similarity = float(np.mean(self._signatures[candidate_id] == signature))
+                if similarity >= self.threshold:
+                    return candidate_id
+        return None
+
+    def add(self, doc_id: str, signature: np.ndarray, metadata: Dict[str, Any]):
+        """Register a chunk as the canonical copy of its passage"""
+        self._signatures[doc_id] = signature
+        self._canonical_metadata[doc_id] = metadata
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(doc_id)
+
+    def remove_documents(self, pdf_names: List[str]) -> int:
+        """Forget the canonical chunks of the given documents; returns how many were removed"""
+        names = set(pdf_names)
+        removed = {doc_id for doc_id, metadata in self._canonical_metadata.items() if metadata.get("pdf_name") in names}
+        if not removed:
+            return 0
+        for doc_id in removed:
+            del self._signatures[doc_id]
+            del self._canonical_metadata[doc_id]
+        for buckets in self._buckets:
+            for key in list(buckets):
+                buckets[key] = [doc_id for doc_id in buckets[key] if doc_id not in removed]
+                if not buckets[key]:
+                    del buckets[key]
+        return len(removed)
+
+    def save(self) -> bool:
+        """Persist the signatures and canonical references; the LSH bands are rebuilt from them on load"""
+        if not self.directory:
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            ids = list(self._signatures)
+            signatures = np.stack([self._signatures[doc_id] for doc_id in ids]) if ids else np.empty((0, self.num_perm), dtype=np.uint64)
+            np.save(os.path.join(self.directory, "signatures.npy"), signatures)
+            canonicals = [
+                {field: self._canonical_metadata[doc_id][field] for field in self._PERSISTED_FIELDS
+                 if self._canonical_metadata[doc_id].get(field) is not None}
+                for doc_id in ids
+            ]
+            with open(os.path.join(self.directory, "canonicals.json"), "w", encoding="utf-8") as f:
+                json.dump({"num_perm": self.num_perm, "bands": self.bands, "ids": ids, "metadata": canonicals}, f)
+            return True
+        except Exception as e:
+            print(f"Error saving near-duplicate index: {e}")
+            return False
+
+    def load(self) -> bool:
+        """Load a persisted index if one exists with the same MinHash layout"""
+        if not self.directory or not os.path.exists(os.path.join(self.directory, "canonicals.json")):
+            return False
+        try:
+            with open(os.path.join(self.directory, "canonicals.json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["num_perm"] != self.num_perm or data["bands"] != self.bands:
+                print("Near-duplicate index was built with other MinHash settings, starting empty")
+                return False
+            signatures = np.load(os.path.join(self.directory, "signatures.npy"))
+            self._buckets = [defaultdict(list) for _ in range(self.bands)]
+            self._signatures = {}
+            self._canonical_metadata = {}
+            for doc_id, signature, metadata in zip(data["ids"], signatures, data["metadata"]):
+                self.add(doc_id, signature, metadata)
+            return True
+        except Exception as e:
+            print(f"Error loading near-duplicate index: {e}")
+            return False
+
+    def fold_duplicates(self, documents: List[Dict[str, Any]],
+                        doc_types: Tuple[str, ...] = ("text", "table")) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Split a batch into chunks to store and back-reference updates for earlier canonicals.
+
+        Returns the documents that must still be embedded and a mapping of already
+        stored canonical ids to their updated metadata.
+        """
+        unique_documents = []
+        batch_ids = set()
+        stored_updates = {}
+
+        for doc in documents:
+            metadata = doc["metadata"]
+            if metadata.get("doc_type") not in doc_types:
+                unique_documents.append(doc)
+                continue
+
+            signature = self.signature(doc["content"])
+            if signature is None:
+                unique_documents.append(doc)
+                continue
+
+            canonical_id = self.find_duplicate(signature, self.drug_names(metadata.get("pdf_name", "unknown")))
+            if canonical_id is None:
+                self.add(doc["id"], signature, metadata)
+                unique_documents.append(doc)
+                batch_ids.add(doc["id"])
+                continue
+
+            canonical_metadata = self._canonical_metadata[canonical_id]
+            shared_sources = canonical_metadata.get("shared_sources") or []
+            if isinstance(shared_sources, str):
+                shared_sources = json.loads(shared_sources)
+            canonical_metadata["shared_sources"] = shared_sources + [source_reference(metadata)]
+            self.folded_count += 1
+
+            if canonical_id not in batch_ids:
+                stored_updates[canonical_id] = canonical_metadata
+
+        return unique_documents, stored_updates
+
+
+def source_reference(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact citation for a folded duplicate chunk"""
+    reference = {
+        "pdf_name": metadata.get("pdf_name", "unknown"),
+        "section": metadata.get("section", ""),
+    }
+    if metadata.get("char_start") is not None:
+        # Resolved to pages through the page offset index at query time
+        reference["char_start"] = metadata["char_start"]
+        reference["char_end"] = metadata["char_end"]
+    page_start = metadata.get("page_start") or metadata.get("page_number")
+    if page_start:
+        reference["page_start"] = page_start
+        reference["page_end"] = metadata.get("page_end") or page_start
+    return reference
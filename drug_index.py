@@ -0,0 +1,118 @@
+import os
+import re
+import json
+from typing import List, Optional, Iterable
+
+# Filename words that never name a drug ("orencia_label_2023.pdf")
+FILENAME_STOPWORDS = {
+    "label", "labels", "labeling", "prescribing", "information", "pi", "fda", "full",
+    "highlights", "medication", "guide", "package", "insert", "final", "draft", "and",
+    "for", "the", "of", "injection", "tablets", "capsules", "solution"
+}
+
+# Routes, devices and dosage forms say how a drug is given, not which drug it is. They
+# stay in the partition key, so existing shards keep their names, but are never drug names.
+NON_DRUG_WORDS = {
+    "subcutaneous", "intravenous", "intramuscular", "oral", "iv", "sc", "im", "infusion",
+    "pen", "pens", "autoinjector", "injector", "prefilled", "syringe", "syringes", "vial", "vials",
+    "kit", "cartridge", "powder", "lyophilized", "concentrate", "suspension", "single", "dose", "use"
+}
+
+# Strengths and volumes ("40mg", "100", "5ml")
+_STRENGTH_PATTERN = re.compile(r'^\d+(?:mg|mcg|ug|g|ml|iu|units?)?$|^(?:mg|mcg|ml)$')
+
+
+def normalize_drug_name(name: str) -> str:
+    """Lower-case a drug name and collapse punctuation and whitespace to single spaces"""
+    return " ".join(re.findall(r'[a-z0-9]+', name.lower()))
+
+
+def _filename_words(pdf_name: str) -> List[str]:
+    """Words of a filename stem that may be part of a drug name"""
+    stem = normalize_drug_name(os.path.splitext(os.path.basename(pdf_name))[0])
+    return [
+        word for word in stem.split()
+        if len(word) >= 3 and not word.isdigit() and word not in FILENAME_STOPWORDS
+    ]
+
+
+def drug_key(pdf_name: str) -> str:
+    """Partition key of a document: the drug words of its filename ("simponi aria")"""
+    return " ".join(_filename_words(pdf_name)) or normalize_drug_name(os.path.splitext(os.path.basename(pdf_name))[0])
+
+
+def filename_drug_names(pdf_name: str) -> List[str]:
+    """Candidate drug names of a document: its filename drug words together and each on its own"""
+    words = [
+        word for word in _filename_words(pdf_name)
+        if word not in NON_DRUG_WORDS and not _STRENGTH_PATTERN.match(word)
+    ]
+    if not words:
+        return []
+    return list(dict.fromkeys([" ".join(words)] + words))
+
+
+class DrugDocumentIndex:
+    """Normalized drug name -> document mapping used to restrict retrieval to a drug's labels"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.documents_by_drug = {}  # normalized name -> sorted list of pdf_names
+
+    def __contains__(self, pdf_name: str) -> bool:
+        return any(pdf_name in documents for documents in self.documents_by_drug.values())
+
+    def add_document(self, pdf_name: str, drug_names: Iterable[str]) -> bool:
+        """Register the drug names of a document; returns True if the index changed"""
+        changed = False
+        for name in drug_names:
+            name = normalize_drug_name(name)
+            if not name:
+                continue
+            documents = self.documents_by_drug.setdefault(name, [])
+            if pdf_name not in documents:
+                documents.append(pdf_name)
+                documents.sort()
+                changed = True
+        return changed
+
+    def remove_document(self, pdf_name: str):
+        """Forget a document"""
+        for name in list(self.documents_by_drug):
+            documents = [document for document in self.documents_by_drug[name] if document != pdf_name]
+            if documents:
+                self.documents_by_drug[name] = documents
+            else:
+                del self.documents_by_drug[name]
+
+    def documents_for(self, drug_names: Iterable[str]) -> List[str]:
+        """Documents of any of the given drugs"""
+        documents = set()
+        for name in drug_names:
+            documents.update(self.documents_by_drug.get(normalize_drug_name(name), []))
+        return sorted(documents)
+
+    def load(self) -> bool:
+        """Load the index from disk if it exists"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.documents_by_drug = json.load(f)
+            return True
+        except Exception as e:
+            print(f"Error loading drug index: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Persist the index as JSON"""
+        if not self.path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.documents_by_drug, f)
+            return True
+        except Exception as e:
+            print(f"Error saving drug index: {e}")
+            return False
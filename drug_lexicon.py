@@ -0,0 +1,163 @@
+import re
+from collections import deque
+from typing import List, Tuple, Optional, Iterable
+from drug_index import DrugDocumentIndex, normalize_drug_name
+
+# "ORENCIA® (abatacept)", "REMICADE (infliximab-dyyb)" in label titles and DESCRIPTION sections
+_BRAND_GENERIC_PATTERN = re.compile(
+    r'\b([A-Z][A-Z0-9\-]{2,}(?:\s+[A-Z][A-Z0-9\-]{2,})?)\s*[®™]?\s*\(\s*([a-z][a-z0-9\-]{3,}(?:\s+[a-z][a-z0-9\-]+){0,2})\s*\)'
+)
+
+# All-caps words that precede a parenthesis in labels without being a drug name
+_NON_DRUG_WORDS = {
+    "fda", "usp", "nf", "highlights", "warning", "warnings", "description", "indications",
+    "dosage", "table", "figure", "see", "note", "initial", "revised", "for", "and", "the",
+    "of", "in", "with", "to", "or", "continued", "precautions", "adverse", "reactions",
+    "contraindications", "administration", "usage", "forms", "strengths", "clinical", "studies",
+    "pharmacology", "overdosage", "interactions", "populations", "specific", "use", "patient",
+    "counseling", "information", "storage", "handling", "supplied", "references", "recent",
+    "major", "changes", "boxed", "drug", "toxicology", "nonclinical", "section", "sections"
+}
+
+
+def _is_drug_name(name: str) -> bool:
+    """A declared name is rejected if any of its words is a stopword or section heading word"""
+    return bool(name) and not any(word in _NON_DRUG_WORDS for word in name.split())
+
+# Sections a label introduces its brand and generic names in
+DRUG_NAME_SECTIONS = ("INTRODUCTION", "DESCRIPTION")
+
+
+def description_drug_names(text: str) -> List[str]:
+    """Brand, generic and suffix-less generic names declared in label text"""
+    names = []
+    for brand, generic in _BRAND_GENERIC_PATTERN.findall(text):
+        brand = normalize_drug_name(brand)
+        # "(abatacept for injection)" declares "abatacept"; "(continued)" declares nothing
+        generic_words = normalize_drug_name(generic).split()
+        for i, word in enumerate(generic_words):
+            if word in _NON_DRUG_WORDS:
+                generic_words = generic_words[:i]
+                break
+        generic = " ".join(generic_words)
+        if _is_drug_name(brand):
+            names.append(brand)
+        if _is_drug_name(generic):
+            names.append(generic)
+            # Biosimilar suffixes ("infliximab-dyyb") also match the core name
+            core = generic.split()[0]
+            if core != generic:
+                names.append(core)
+    return list(dict.fromkeys(names))
+
+
+class AhoCorasickAutomaton:
+    """Pure-Python Aho-Corasick automaton over word-normalized patterns.
+
+    Matching is a single pass over the text, so its cost depends on the text
+    length and the number of matches, not on the number of patterns.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]  # pattern lengths ending at each node, own and inherited
+        for pattern in patterns:
+            self._insert(pattern)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        if len(pattern) not in self._outputs[node]:
+            self._outputs[node].append(len(pattern))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) spans of every pattern occurrence"""
+        spans = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length in self._outputs[node]:
+                spans.append((i + 1 - length, i + 1))
+        return spans
+
+
+class DrugLexicon(DrugDocumentIndex):
+    """Drug names of the corpus (brand, generic, synonyms) with fast query-time matching.
+
+    Names come from filenames and the title/DESCRIPTION text of each label and
+    map to the documents that declare them. Queries are matched with an
+    Aho-Corasick automaton on whole words only, so "aria" does not match
+    inside "variable" or "malaria".
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        self._automaton = None
+
+    def add_document(self, pdf_name: str, drug_names: Iterable[str]) -> bool:
+        changed = super().add_document(pdf_name, drug_names)
+        if changed:
+            self._automaton = None
+        return changed
+
+    def remove_document(self, pdf_name: str):
+        super().remove_document(pdf_name)
+        self._automaton = None
+
+    def load(self) -> bool:
+        self._automaton = None
+        return super().load()
+
+    def clear(self):
+        """Forget all names"""
+        self.documents_by_drug = {}
+        self._automaton = None
+
+    def find(self, text: str) -> List[str]:
+        """Drug names mentioned in a text, leftmost-longest and without overlaps"""
+        if not self.documents_by_drug:
+            return []
+        if self._automaton is None:
+            self._automaton = AhoCorasickAutomaton(self.documents_by_drug.keys())
+
+        normalized = normalize_drug_name(text)
+        # Word boundaries: a match must start and end at a space or the text edge
+        spans = [
+            (start, end) for start, end in self._automaton.find_all(normalized)
+            if (start == 0 or normalized[start - 1] == " ")
+            and (end == len(normalized) or normalized[end] == " ")
+        ]
+        spans.sort(key=lambda span: (span[0], span[0] - span[1]))
+
+        names = []
+        last_end = -1
+        for start, end in spans:
+            if start >= last_end:
+                names.append(normalized[start:end])
+                last_end = end
+        return list(dict.fromkeys(names))
@@ -0,0 +1,161 @@
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma's where syntax used in this code base"""
+    if not where:
+        return True
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(field)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+        elif metadata.get(field) != condition:
+            return False
+    return True
+
+
+class ExactSearchCollection:
+    """In-memory exact cosine search with the Chroma collection interface.
+
+    Embeddings are kept L2-normalized in one contiguous float32 matrix, so a
+    query is a single matrix-vector product followed by `argpartition`. For a
+    few thousand chunks this is exact and faster than an HNSW index, with no
+    disk I/O.
+    """
+
+    def __init__(self, embedding_function: Callable[[List[str]], Any], name: str = "exact",
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.embedding_function = embedding_function
+        self.name = name
+        self.metadata = metadata or {}
+        self._matrix = None
+        self._size = 0
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._rows = {}
+
+    @classmethod
+    def from_collection(cls, collection: Any, embedding_function: Callable[[List[str]], Any]) -> "ExactSearchCollection":
+        """Load a stored collection (documents, metadata and embeddings) into memory"""
+        exact = cls(embedding_function, name=collection.name, metadata=collection.metadata)
+        stored = collection.get(include=["documents", "metadatas", "embeddings"])
+        if stored["ids"]:
+            exact._append(stored["ids"], stored["documents"], stored["metadatas"],
+                          np.asarray(stored["embeddings"], dtype=np.float32))
+        return exact
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def _append(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray):
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        needed = self._size + len(ids)
+        if self._matrix is None or needed > len(self._matrix):
+            # Grow geometrically so appends stay amortized O(1)
+            capacity = max(needed, 2 * (len(self._matrix) if self._matrix is not None else 256))
+            matrix = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._size:
+                matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+        self._matrix[self._size:needed] = vectors
+        for doc_id in ids:
+            self._rows[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+        self._size = needed
+
+    def add(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str],
+            embeddings: Optional[Any] = None):
+        if ids:
+            vectors = np.asarray(embeddings, dtype=np.float32) if embeddings is not None else self._embed(documents)
+            self._append(ids, documents, metadatas, vectors)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the collection: embedding matrix plus document text"""
+        matrix_bytes = self._matrix.nbytes if self._matrix is not None else 0
+        return matrix_bytes + sum(len(document) for document in self.documents) + 256 * self._size
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        for doc_id, metadata in zip(ids, metadatas):
+            if doc_id in self._rows:
+                self.metadatas[self._rows[doc_id]] = metadata
+
+    def count(self) -> int:
+        return self._size
+
+    def _selected_rows(self, ids: Optional[List[str]], where: Optional[Dict[str, Any]]) -> List[int]:
+        rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows] if ids is not None else range(self._size)
+        return [row for row in rows if matches_where(self.metadatas[row], where)]
+
+    def query(self, query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, query_embeddings: Optional[Any] = None,
+              **kwargs) -> Dict[str, Any]:
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        rows = np.asarray(self._selected_rows(None, where) if where else np.arange(self._size), dtype=np.int64)
+        num_queries = len(query_embeddings) if query_embeddings is not None else len(query_texts)
+        queries = None
+        if len(rows):
+            if query_embeddings is not None:
+                queries = np.asarray(query_embeddings, dtype=np.float32)
+                queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            else:
+                queries = self._embed(query_texts)
+
+        for q in range(num_queries):
+            if not len(rows):
+                top = rows
+                similarities = np.empty(0, dtype=np.float32)
+            else:
+                candidates = self._matrix[rows] if where else self._matrix[:self._size]
+                similarities = candidates @ queries[q]
+                k = min(n_results, len(rows))
+                top = np.argpartition(-similarities, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+                top = top[np.argsort(-similarities[top], kind="stable")]
+            selected = rows[top]
+            results["ids"].append([self.ids[row] for row in selected])
+            results["documents"].append([self.documents[row] for row in selected])
+            results["metadatas"].append([self.metadatas[row] for row in selected])
+            results["distances"].append([float(1.0 - similarities[i]) for i in top])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        rows = self._selected_rows(ids, where)
+        results = {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows],
+            "metadatas": [self.metadatas[row] for row in rows]
+        }
+        if include and "embeddings" in include:
+            results["embeddings"] = self._matrix[rows].tolist() if rows else []
+        return results
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        removed = set(self._selected_rows(ids, where))
+        if not removed:
+            return
+        keep = [row for row in range(self._size) if row not in removed]
+        self._matrix = self._matrix[keep].copy() if keep else None
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._size = len(keep)
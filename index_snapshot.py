@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import shutil
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+from exact_search import matches_where
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SIDECARS_DIR = "sidecars"
+
+# Metadata fields stored as dictionary-encoded code columns for filtering without decoding rows
+FILTER_COLUMNS = ("pdf_name", "content_type", "drug", "doc_type")
+
+
+def _write_blob(path: str, values: List[str]) -> np.ndarray:
+    """Write strings back to back as UTF-8 and return their [n + 1] byte offsets"""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    return offsets
+
+
+def publish_snapshot(root: str, ids: List[str], embeddings: Any, documents: List[str],
+                     metadatas: List[Dict[str, Any]], keep: int = 2,
+                     sidecars: Optional[Dict[str, str]] = None) -> str:
+    """Write an immutable snapshot version and atomically make it current.
+
+    The version is built in a temporary directory, renamed into place and then
+    published by replacing the CURRENT pointer file, so readers either see the
+    previous or the new snapshot, never a partial one. Version names start with
+    a zero-padded nanosecond timestamp, so they sort in publication order; the
+    version CURRENT points to plus the newest `keep - 1` others are retained.
+    `sidecars` maps names to files or directories (lexical, drug and page
+    indexes, table and metadata stores) that are copied into the version, so
+    a swap replaces them together with the vectors.
+    """
+    versions_root = os.path.join(root, VERSIONS_DIR)
+    os.makedirs(versions_root, exist_ok=True)
+    version = f"v{time.time_ns():020d}_{os.getpid()}"
+    staging = os.path.join(versions_root, f".{version}.tmp")
+    os.makedirs(staging)
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    np.save(os.path.join(staging, "vectors.npy"), vectors)
+    np.save(os.path.join(staging, "document_offsets.npy"),
+            _write_blob(os.path.join(staging, "documents.bin"), documents))
+    np.save(os.path.join(staging, "metadata_offsets.npy"),
+            _write_blob(os.path.join(staging, "metadata.bin"), [json.dumps(metadata) for metadata in metadatas]))
+
+    dictionaries = {}
+    for column in FILTER_COLUMNS:
+        values = [str(metadata.get(column, "")) for metadata in metadatas]
+        dictionary = sorted(set(values))
+        codes = {value: i for i, value in enumerate(dictionary)}
+        np.save(os.path.join(staging, f"{column}_codes.npy"), np.array([codes[v] for v in values], dtype=np.int32))
+        dictionaries[column] = dictionary
+
+    # Fixed-width ids plus a sorted copy for binary-search lookups, all memory-mapped
+    id_array = np.array([doc_id.encode("utf-8") for doc_id in ids], dtype=f"S{max([len(i) for i in ids] + [1])}")
+    id_order = np.argsort(id_array, kind="stable")
+    np.save(os.path.join(staging, "ids.npy"), id_array)
+    np.save(os.path.join(staging, "sorted_ids.npy"), id_array[id_order])
+    np.save(os.path.join(staging, "sorted_id_rows.npy"), id_order.astype(np.int64))
+
+    for name, source in (sidecars or {}).items():
+        target = os.path.join(staging, SIDECARS_DIR, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        elif os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "count": len(ids), "dictionaries": dictionaries}, f)
+
+    os.rename(staging, os.path.join(versions_root, version))
+    pointer = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+    # Old versions stay readable for workers that still map them until they refresh.
+    # The current one is read from the pointer, since another publisher may have replaced ours
+    current = _current_version(root)
+    versions = sorted(name for name in os.listdir(versions_root) if not name.startswith(".") and name != current)
+    for old in versions[:len(versions) - (keep - 1)] if keep else []:
+        shutil.rmtree(os.path.join(versions_root, old), ignore_errors=True)
+    return version
+
+
+def _current_version(root: str) -> Optional[str]:
+    """The version named by the CURRENT pointer, or None if nothing is published"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class _SnapshotView:
+    """Memory-mapped arrays of one snapshot version"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.version = manifest["version"]
+        self.count = manifest["count"]
+        self.ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode="r")
+        self.sorted_ids = np.load(os.path.join(directory, "sorted_ids.npy"), mmap_mode="r")
+        self.sorted_id_rows = np.load(os.path.join(directory, "sorted_id_rows.npy"), mmap_mode="r")
+        self.dictionaries = manifest["dictionaries"]
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.document_offsets = np.load(os.path.join(directory, "document_offsets.npy"), mmap_mode="r")
+        self.metadata_offsets = np.load(os.path.join(directory, "metadata_offsets.npy"), mmap_mode="r")
+        self.documents = self._map_blob(os.path.join(directory, "documents.bin"))
+        self.metadata = self._map_blob(os.path.join(directory, "metadata.bin"))
+        self.codes = {
+            column: np.load(os.path.join(directory, f"{column}_codes.npy"), mmap_mode="r")
+            for column in self.dictionaries
+        }
+
+    @staticmethod
+    def _map_blob(path: str) -> np.ndarray:
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    def doc_id(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+    def rows_of(self, ids: List[str]) -> List[int]:
+        """Rows of the given ids, skipping unknown ids"""
+        if not ids or not self.count:
+            return []
+        keys = np.array([doc_id.encode("utf-8") for doc_id in ids])
+        positions = np.minimum(np.searchsorted(self.sorted_ids, keys), self.count - 1)
+        found = self.sorted_ids[positions] == keys
+        return [int(row) for row in self.sorted_id_rows[positions[found]]]
+
+    def document(self, row: int) -> str:
+        return bytes(self.documents[self.document_offsets[row]:self.document_offsets[row + 1]]).decode("utf-8")
+
+    def metadata_of(self, row: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.metadata[self.metadata_offsets[row]:self.metadata_offsets[row + 1]]))
+
+
+class IndexSnapshot:
+    """Read-only, memory-mapped snapshot with the Chroma collection query interface.
+
+    All serving processes map the same files, so the OS page cache holds one
+    physical copy of the vectors and metadata however many workers run. The
+    CURRENT pointer is re-checked at most every `check_interval` seconds and a
+    newly published version is swapped in without restarting. `on_swap` is
+    called with the new version's directory before its vectors are served, to
+    reload the sidecar indexes stored with it.
+    """
+
+    def __init__(self, root: str, embedding_function: Callable[[List[str]], Any],
+                 check_interval: float = 5.0, block_size: int = 65536,
+                 on_swap: Optional[Callable[[str], Any]] = None):
+        self.root = root
+        self.name = "snapshot"
+        self.metadata = {}
+        self.embedding_function = embedding_function
+        self.check_interval = check_interval
+        self.block_size = block_size
+        self.on_swap = on_swap
+        self._view = None
+        self._last_check = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._view.version if self._view is not None else None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Swap in the current version if it changed; returns True if a snapshot is open"""
+        now = time.monotonic()
+        if not force and self._view is not None and now - self._last_check < self.check_interval:
+            return True
+        self._last_check = now
+        version = _current_version(self.root)
+        if version is None:
+            return self._view is not None
+        if self._view is None or self._view.version != version:
+            try:
+                directory = os.path.join(self.root, VERSIONS_DIR, version)
+                view = _SnapshotView(directory)
+                if self.on_swap is not None:
+                    self.on_swap(directory)
+                # A single reference assignment, so concurrent queries see one version or the other
+                self._view = view
+                print(f"Serving index snapshot {version}")
+            except Exception as e:
+                print(f"Error opening index snapshot {version}: {e}")
+        return self._view is not None
+
+    def count(self) -> int:
+        return self._view.count if self.refresh() else 0
+
+    def _mask(self, view: _SnapshotView, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask of a where filter, from code columns where possible"""
+        if not where:
+            return None
+        mask = np.ones(view.count, dtype=bool)
+        clauses = where["$and"] if list(where) == ["$and"] else [{field: condition} for field, condition in where.items()]
+        remaining = []
+        for clause in clauses:
+            (field, condition), = clause.items()
+            if field in view.codes and isinstance(condition, dict) and set(condition) <= {"$in", "$eq"}:
+                values = condition.get("$in") or [condition.get("$eq")]
+                dictionary = {value: i for i, value in enumerate(view.dictionaries[field])}
+                codes = [dictionary[str(value)] for value in values if str(value) in dictionary]
+                mask &= np.isin(view.codes[field], codes)
+            else:
+                remaining.append(clause)
+        # Conditions on other fields are evaluated on the decoded metadata of surviving rows
+        if remaining:
+            for row in np.flatnonzero(mask):
+                if not matches_where(view.metadata_of(row), {"$and": remaining}):
+                    mask[row] = False
+        return mask
+
+    def query(self, query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, query_embeddings: Optional[Any] = None,
+              **kwargs) -> Dict[str, Any]:
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not self.refresh():
+            num_queries = len(query_embeddings) if query_embeddings is not None else len(query_texts)
+            for key in results:
+                results[key] = [[] for _ in range(num_queries)]
+            return results
+        view = self._view
+        mask = self._mask(view, where)
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        queries = np.array(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        for query in queries:
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, view.count, self.block_size):
+                rows = np.arange(start, min(start + self.block_size, view.count))
+                scores = view.vectors[start:start + len(rows)] @ query
+                if mask is not None:
+                    keep = mask[rows]
+                    rows = rows[keep]
+                    scores = scores[keep]
+                best_rows = np.concatenate([best_rows, rows])
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_rows) > n_results:
+                    top = np.argpartition(-best_scores, n_results - 1)[:n_results]
+                    best_rows = best_rows[top]
+                    best_scores = best_scores[top]
+            order = np.argsort(-best_scores, kind="stable")[:n_results]
+            rows = best_rows[order]
+            results["ids"].append([view.doc_id(row) for row in rows])
+            results["documents"].append([view.document(row) for row in rows])
+            results["metadatas"].append([view.metadata_of(row) for row in rows])
+            results["distances"].append([float(1.0 - score) for score in best_scores[order]])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        if not self.refresh():
+            return {"ids": [], "documents": [], "metadatas": []}
+        view = self._view
+        mask = self._mask(view, where)
+        rows = view.rows_of(ids) if ids is not None else range(view.count)
+        rows = [row for row in rows if mask is None or mask[row]]
+        results = {
+            "ids": [view.doc_id(row) for row in rows],
+            "documents": [view.document(row) for row in rows],
+            "metadatas": [view.metadata_of(row) for row in rows]
+        }
+        if include and "embeddings" in include:
+            results["embeddings"] = np.asarray(view.vectors[rows]).tolist() if rows else []
+        return results
+
+    def _read_only(self, *args, **kwargs):
+        raise RuntimeError("Index snapshots are read-only; write through the ingestion database")
+
+    add = update = delete = _read_only
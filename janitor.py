@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import threading
+from typing import List, Dict, Any, Optional, Callable, Set
+
+
+class SessionRegistry:
+    """Small persistent index of upload sessions and the files they own.
+
+    Records when each session was last used, the uploaded PDFs it saved
+    (with size and whether processing has finished), and the extraction cache
+    entries it references. Expiry decisions are made from this index, so the
+    janitor never lists directories or stats every file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.sessions = {}  # session_id -> {"created", "last_seen"}
+        self.uploads = {}   # path -> {"session_id", "bytes", "added", "processed"}
+        self.cache = {}     # cache key -> {"bytes", "last_used", "sessions", "filenames"}
+        self._dirty = False  # touches not yet written to disk
+        self._lock = threading.RLock()
+
+    def touch(self, session_id: str):
+        """Mark a session as used now; kept in memory until the next `save` or `flush`"""
+        with self._lock:
+            now = time.time()
+            entry = self.sessions.setdefault(session_id, {"created": now})
+            entry["last_seen"] = now
+            self._dirty = True
+
+    def add_upload(self, session_id: str, path: str):
+        with self._lock:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            self.uploads[path] = {"session_id": session_id, "bytes": size, "added": time.time(), "processed": False}
+            self.touch(session_id)
+            self.save()
+
+    def mark_processed(self, path: str):
+        """The upload's job finished; its content now lives in the extraction cache"""
+        with self._lock:
+            if path in self.uploads:
+                self.uploads[path]["processed"] = True
+                self.save()
+
+    def use_cache_entry(self, key: str, session_id: str, size: Optional[int] = None, filename: Optional[str] = None):
+        """Record that a session references a cache entry (under the filename it uploaded)"""
+        with self._lock:
+            entry = self.cache.setdefault(key, {"bytes": 0, "sessions": []})
+            if size is not None:
+                entry["bytes"] = size
+            if filename is not None:
+                entry.setdefault("filenames", {})[session_id] = filename
+            entry["last_used"] = time.time()
+            if session_id not in entry["sessions"]:
+                entry["sessions"].append(session_id)
+            self.touch(session_id)
+            self.save()
+
+    def session_files(self) -> Dict[str, List[tuple]]:
+        """session_id -> [(cache key, filename)] of every cache entry a session references"""
+        with self._lock:
+            files = {}
+            for key, entry in self.cache.items():
+                for session_id in entry["sessions"]:
+                    filename = entry.get("filenames", {}).get(session_id)
+                    if filename:
+                        files.setdefault(session_id, []).append((key, filename))
+            return files
+
+    def processed_uploads(self) -> List[str]:
+        with self._lock:
+            return [path for path, entry in self.uploads.items() if entry["processed"]]
+
+    def stale_uploads(self, cutoff: float) -> List[tuple]:
+        """(path, session_id) of uploads added before the cutoff that never finished processing"""
+        with self._lock:
+            return [(path, entry["session_id"]) for path, entry in self.uploads.items()
+                    if not entry["processed"] and entry.get("added", 0) < cutoff]
+
+    def cache_entries(self) -> List[tuple]:
+        """(key, entry) pairs of the cache, least recently used first"""
+        with self._lock:
+            return sorted(((key, dict(entry, sessions=list(entry["sessions"]))) for key, entry in self.cache.items()),
+                          key=lambda item: item[1].get("last_used", 0))
+
+    def expired_sessions(self, cutoff: float) -> List[str]:
+        with self._lock:
+            return [session_id for session_id, entry in self.sessions.items() if entry["last_seen"] < cutoff]
+
+    def remove_session(self, session_id: str) -> List[str]:
+        """Forget a session; returns the paths of its uploads, which are forgotten too"""
+        with self._lock:
+            self.sessions.pop(session_id, None)
+            uploads = [path for path, entry in self.uploads.items() if entry["session_id"] == session_id]
+            for path in uploads:
+                del self.uploads[path]
+            for entry in self.cache.values():
+                if session_id in entry["sessions"]:
+                    entry["sessions"].remove(session_id)
+                entry.get("filenames", {}).pop(session_id, None)
+            self.save()
+            return uploads
+
+    def remove_upload(self, path: str):
+        with self._lock:
+            self.uploads.pop(path, None)
+            self.save()
+
+    def remove_cache_entry(self, key: str) -> List[str]:
+        """Forget a cache entry; returns the sessions that referenced it"""
+        with self._lock:
+            entry = self.cache.pop(key, None)
+            self.save()
+            return entry["sessions"] if entry else []
+
+    def flush(self) -> bool:
+        """Save only if sessions were touched since the last save"""
+        with self._lock:
+            return self.save() if self._dirty else True
+
+    def load(self) -> bool:
+        """Load the registry from disk if it exists"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                self.sessions = data.get("sessions", {})
+                self.uploads = data.get("uploads", {})
+                self.cache = data.get("cache", {})
+            return True
+        except Exception as e:
+            print(f"Error loading session registry: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Persist the registry; written to a temporary file and renamed"""
+        if not self.path:
+            return False
+        try:
+            with self._lock:
+                data = {"sessions": self.sessions, "uploads": self.uploads, "cache": self.cache}
+                temporary_path = f"{self.path}.tmp"
+                with open(temporary_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(temporary_path, self.path)
+                self._dirty = False
+            return True
+        except Exception as e:
+            print(f"Error saving session registry: {e}")
+            return False
+
+
+def _remove_file(path: str) -> int:
+    """Delete a file if it exists and return its size"""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+
+class Janitor:
+    """Background expiry of uploads, extraction cache entries, images and session indexes.
+
+    Every `interval_seconds` one pass runs over the session registry:
+    - sessions idle for longer than the TTL (and without queued or running
+      jobs) lose their in-memory index, their uploaded PDFs and, through
+      `on_session_expired`, their job records;
+    - uploaded PDFs whose processing has finished are deleted; uploads that
+      failed are deleted once older than the TTL (unless a job still holds them);
+    - cache entries (with their extracted images) that no live session
+      references are deleted once idle for the TTL, and least recently used
+      entries are deleted while the cache exceeds its size budget.
+    Each pass returns a report of what it reclaimed; totals are kept in `totals`.
+    """
+
+    def __init__(self, registry: SessionRegistry, sessions: Any, cache: Any, ttl_hours: float = 24,
+                 cache_budget_mb: int = 1024, interval_seconds: float = 300):
+        self.registry = registry
+        self.sessions = sessions
+        self.cache = cache
+        self.ttl_seconds = ttl_hours * 3600
+        self.cache_budget_bytes = cache_budget_mb * 1024 * 1024
+        self.interval_seconds = interval_seconds
+        self.active_sessions = None  # callable returning the sessions with unfinished jobs
+        self.on_session_expired = None  # callable run with each expired session ID, e.g. to drop its jobs
+        self.last_report = {}
+        self.totals = {"passes": 0, "sessions_expired": 0, "uploads_removed": 0,
+                       "cache_entries_removed": 0, "bytes_reclaimed": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, active_sessions: Optional[Callable[[], Set[str]]] = None,
+              on_session_expired: Optional[Callable[[str], Any]] = None):
+        """Run passes in a daemon thread until `stop` is called"""
+        if active_sessions is not None:
+            self.active_sessions = active_sessions
+        if on_session_expired is not None:
+            self.on_session_expired = on_session_expired
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="upload-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.registry.flush()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in janitor pass: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def run_once(self) -> Dict[str, Any]:
+        """One expiry pass; returns what was reclaimed"""
+        with self._lock:
+            start = time.perf_counter()
+            now = time.time()
+            cutoff = now - self.ttl_seconds
+            active = set(self.active_sessions()) if self.active_sessions else set()
+            report = {"sessions_expired": 0, "session_chunks_freed": 0, "uploads_removed": 0,
+                      "cache_entries_removed": 0, "bytes_reclaimed": 0}
+
+            # Idle sessions: in-memory index and uploads
+            for session_id in self.registry.expired_sessions(cutoff):
+                if session_id in active:
+                    continue
+                report["session_chunks_freed"] += self.sessions.drop(session_id)
+                for path in self.registry.remove_session(session_id):
+                    report["bytes_reclaimed"] += _remove_file(path)
+                    report["uploads_removed"] += 1
+                if self.on_session_expired:
+                    self.on_session_expired(session_id)
+                report["sessions_expired"] += 1
+
+            # Uploads that have been processed are no longer needed
+            for path in self.registry.processed_uploads():
+                report["bytes_reclaimed"] += _remove_file(path)
+                report["uploads_removed"] += 1
+                self.registry.remove_upload(path)
+
+            # Failed uploads, kept for retries until the TTL
+            for path, session_id in self.registry.stale_uploads(cutoff):
+                if session_id in active:
+                    continue
+                report["bytes_reclaimed"] += _remove_file(path)
+                report["uploads_removed"] += 1
+                self.registry.remove_upload(path)
+
+            # Unreferenced cache entries past the TTL, then least recently used ones over the budget
+            entries = self.registry.cache_entries()
+            total_bytes = sum(entry["bytes"] for _, entry in entries)
+            for key, entry in entries:
+                unreferenced = not entry["sessions"]
+                expired = unreferenced and entry.get("last_used", 0) < cutoff
+                over_budget = total_bytes > self.cache_budget_bytes and not (set(entry["sessions"]) & active)
+                if not (expired or over_budget):
+                    continue
+                freed = self.cache.remove(key)
+                for session_id in self.registry.remove_cache_entry(key):
+                    # Still-live sessions keep their in-memory index but can no longer be rebuilt from it
+                    self.sessions.forget_file(session_id, key)
+                report["bytes_reclaimed"] += freed
+                report["cache_entries_removed"] += 1
+                total_bytes -= entry["bytes"]
+
+            # Query touches are only persisted here
+            self.registry.flush()
+            report["pass_ms"] = (time.perf_counter() - start) * 1000
+            self.last_report = report
+            self.totals["passes"] += 1
+            for field in ("sessions_expired", "uploads_removed", "cache_entries_removed", "bytes_reclaimed"):
+                self.totals[field] += report[field]
+            if report["sessions_expired"] or report["uploads_removed"] or report["cache_entries_removed"]:
+                print(f"[Janitor] Expired {report['sessions_expired']} sessions ({report['session_chunks_freed']} chunks), "
+                      f"removed {report['uploads_removed']} uploads and {report['cache_entries_removed']} cache entries, "
+                      f"reclaimed {report['bytes_reclaimed'] / (1024 * 1024):.1f} MB")
+            return report
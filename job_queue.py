@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+FINISHED_STATUSES = ("completed", "failed")
+# How long the event counter of a finished job is kept for streams still catching up
+VERSION_RETENTION_SECONDS = 60.0
+
+_COLUMNS = ("job_id", "session_id", "filename", "pdf_path", "status", "pages_done", "pages_total",
+            "documents_indexed", "error", "created_at", "updated_at")
+
+
+class JobStore:
+    """Persistent table of upload processing jobs in a local SQLite file.
+
+    Every status and progress change is written through, so job state survives
+    a restart of the server and can be read by any request thread. Connections
+    are opened per call; a lock serializes writers.
+    """
+
+    def __init__(self, path: str = "./temp_uploads/jobs.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    filename TEXT,
+                    pdf_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pages_done INTEGER DEFAULT 0,
+                    pages_total INTEGER,
+                    documents_indexed INTEGER DEFAULT 0,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, session_id: str, pdf_path: str, filename: Optional[str] = None) -> str:
+        """Insert a queued job and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, session_id, filename, pdf_path, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, session_id, filename or os.path.basename(pdf_path), pdf_path, now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Set columns of a job; `updated_at` is refreshed"""
+        fields = {field: value for field, value in fields.items() if field in _COLUMNS and field != "job_id"}
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", list(fields.values()) + [job_id])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def list(self, session_id: Optional[str] = None, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Jobs in creation order, optionally of one session and/or in the given statuses"""
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs{where} ORDER BY created_at", params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def delete(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(f"DELETE FROM jobs WHERE job_id IN ({', '.join('?' for _ in job_ids)})", list(job_ids))
+
+    def delete_session(self, session_id: str) -> int:
+        """Delete the finished jobs of a session; returns how many were removed"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE session_id = ? AND status IN ({', '.join('?' for _ in FINISHED_STATUSES)})",
+                (session_id,) + FINISHED_STATUSES
+            )
+            return cursor.rowcount
+
+
+class JobQueue:
+    """Background processing of uploaded PDFs on a small local worker pool.
+
+    `submit` records a job and returns immediately; a worker then runs the
+    processing function, which reports progress per indexed page batch. Two
+    limits keep a burst of uploads from starving query traffic: at most
+    `max_workers` PDFs are processed at once, and `submit` refuses new jobs
+    once `max_pending` are queued or running overall, or `max_jobs_per_session`
+    for one session. Jobs left queued or running by a previous process are
+    started again on construction, since the temporary index lives in memory.
+    """
+
+    def __init__(self, process_fn: Callable[..., Any], store: JobStore, max_workers: int = 2,
+                 max_pending: int = 16, max_jobs_per_session: int = 3):
+        self.process_fn = process_fn
+        self.store = store
+        self.max_pending = max_pending
+        self.max_jobs_per_session = max_jobs_per_session
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-worker")
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._versions = {}  # job_id -> number of updates, for event streams
+        self._finished = {}  # job_id -> finish time, for pruning `_versions`
+
+        for job in self.store.list(statuses=["queued", "running"]):
+            if os.path.exists(job["pdf_path"]):
+                print(f"Resuming interrupted upload job {job['job_id']} ({job['filename']})")
+                self.store.update(job["job_id"], status="queued", pages_done=0, documents_indexed=0)
+                self._executor.submit(self._run, job["job_id"])
+            else:
+                self.store.update(job["job_id"], status="failed", error="Upload file no longer exists")
+
+    def submit(self, pdf_path: str, session_id: str, filename: Optional[str] = None) -> Optional[str]:
+        """Queue a PDF for processing; returns the job ID, or None when the queue is full"""
+        with self._lock:
+            active = self.store.list(statuses=["queued", "running"])
+            if len(active) >= self.max_pending:
+                return None
+            if sum(1 for job in active if job["session_id"] == session_id) >= self.max_jobs_per_session:
+                return None
+            job_id = self.store.create(session_id, pdf_path, filename)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _notify(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+        with self._changed:
+            self._versions[job_id] = self._versions.get(job_id, 0) + 1
+            self._changed.notify_all()
+            # Streams see the final update right away; afterwards the counters of finished jobs are dropped
+            now = time.time()
+            if fields.get("status") in FINISHED_STATUSES:
+                self._finished[job_id] = now
+            expired = [finished_id for finished_id, finished_at in self._finished.items()
+                       if finished_at < now - VERSION_RETENTION_SECONDS]
+            for finished_id in expired:
+                del self._finished[finished_id]
+                self._versions.pop(finished_id, None)
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != "queued":
+            return
+        self._notify(job_id, status="running")
+
+        def progress(pages_done: int, pages_total: int, documents_indexed: int):
+            self._notify(job_id, pages_done=pages_done, pages_total=pages_total,
+                         documents_indexed=documents_indexed)
+
+        try:
+            success, document_count, _ = self.process_fn(job["pdf_path"], job["session_id"],
+                                                         progress=progress, filename=job["filename"])
+            if success:
+                self._notify(job_id, status="completed", documents_indexed=document_count)
+            else:
+                self._notify(job_id, status="failed", error="Processing failed")
+        except Exception as e:
+            print(f"Error processing upload job {job_id}: {e}")
+            self._notify(job_id, status="failed", error=str(e))
+
+    def events(self, job_id: str, heartbeat_seconds: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """Yield the job after every change until it finishes; None is yielded as a keep-alive"""
+        seen = -1
+        while True:
+            with self._changed:
+                version = self._versions.get(job_id, 0)
+                if version == seen:
+                    self._changed.wait(timeout=heartbeat_seconds)
+                    version = self._versions.get(job_id, 0)
+            if version == seen:
+                yield None
+                continue
+            seen = version
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job["status"] in FINISHED_STATUSES:
+                return
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job as shown to clients, without server paths"""
+    return {field: value for field, value in job.items() if field != "pdf_path"}
+
+
+def format_sse(job: Optional[Dict[str, Any]]) -> str:
+    """Server-sent event for a job update, or a comment line as keep-alive"""
+    if job is None:
+        return ": keep-alive\n\n"
+    return f"event: {job['status']}\ndata: {json.dumps(public_job(job))}\n\n"
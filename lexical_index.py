@@ -0,0 +1,221 @@
+import os
+import re
+import json
+from array import array
+from collections import Counter
+from typing import List, Tuple, Optional, Iterable
+import numpy as np
+
+# Keeps doses, units and codes such as "125", "mg/ml" or "0003-2188-11" intact
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[./\-][a-z0-9]+)*')
+_TOKEN_PARTS = re.compile(r'[./\-]')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case lexical tokens; compound tokens are also indexed by their parts"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _TOKEN_PARTS.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Inverted BM25 index over chunk text stored as flat NumPy posting arrays.
+
+    Postings of each term are kept sorted by descending BM25 impact, so a query
+    only touches the `max_postings_per_term` strongest postings of every term and
+    answers in a few milliseconds even for a million chunks.
+    """
+
+    def __init__(self, directory: Optional[str] = None, k1: float = 1.2, b: float = 0.75,
+                 max_postings_per_term: int = 10000):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max_postings_per_term
+
+        # Builder state (flat columns appended during ingestion)
+        self._vocabulary = {}
+        self._terms = []
+        self._posting_terms = array('i')
+        self._posting_docs = array('i')
+        self._posting_tfs = array('i')
+
+        self.doc_ids = []
+        self._doc_lengths = array('i')
+        self._doc_pdf_codes = array('i')
+        self._pdf_names = []
+        self._pdf_codes = {}
+
+        # Search state (CSR arrays ordered by term, then descending impact)
+        self._term_offsets = None
+        self._docs = None
+        self._weights = None
+        self._doc_pdf_array = None
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_ids: List[str], texts: List[str], pdf_names: List[str]):
+        """Add a batch of chunks to the index"""
+        for doc_id, text, pdf_name in zip(doc_ids, texts, pdf_names):
+            doc = len(self.doc_ids)
+            tokens = tokenize(text)
+            self.doc_ids.append(doc_id)
+            self._doc_lengths.append(len(tokens))
+            if pdf_name not in self._pdf_codes:
+                self._pdf_codes[pdf_name] = len(self._pdf_names)
+                self._pdf_names.append(pdf_name)
+            self._doc_pdf_codes.append(self._pdf_codes[pdf_name])
+
+            for term, tf in Counter(tokens).items():
+                term_id = self._vocabulary.get(term)
+                if term_id is None:
+                    term_id = self._vocabulary[term] = len(self._terms)
+                    self._terms.append(term)
+                self._posting_terms.append(term_id)
+                self._posting_docs.append(doc)
+                self._posting_tfs.append(tf)
+        self._dirty = True
+
+    def remove(self, pdf_names: Iterable[str]) -> int:
+        """Drop all chunks of the given documents; returns the number removed"""
+        codes = [self._pdf_codes[name] for name in pdf_names if name in self._pdf_codes]
+        if not codes:
+            return 0
+        doc_pdf = np.frombuffer(self._doc_pdf_codes, dtype=np.int32)
+        keep = ~np.isin(doc_pdf, codes)
+        removed = int(len(keep) - keep.sum())
+        if not removed:
+            return 0
+
+        # Renumber the remaining documents and drop their removed postings
+        new_numbers = np.cumsum(keep, dtype=np.int32) - 1
+        docs = np.frombuffer(self._posting_docs, dtype=np.int32)
+        posting_keep = keep[docs]
+        self._posting_terms = array('i', np.frombuffer(self._posting_terms, dtype=np.int32)[posting_keep].tobytes())
+        self._posting_tfs = array('i', np.frombuffer(self._posting_tfs, dtype=np.int32)[posting_keep].tobytes())
+        self._posting_docs = array('i', new_numbers[docs[posting_keep]].tobytes())
+        self._doc_lengths = array('i', np.frombuffer(self._doc_lengths, dtype=np.int32)[keep].tobytes())
+        self._doc_pdf_codes = array('i', doc_pdf[keep].tobytes())
+        self.doc_ids = [doc_id for doc_id, kept in zip(self.doc_ids, keep) if kept]
+        self._dirty = True
+        return removed
+
+    def finalize(self):
+        """Compute BM25 impacts and build the impact-ordered posting arrays"""
+        terms = np.frombuffer(self._posting_terms, dtype=np.int32)
+        docs = np.frombuffer(self._posting_docs, dtype=np.int32)
+        tfs = np.frombuffer(self._posting_tfs, dtype=np.int32).astype(np.float32)
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32).astype(np.float32)
+
+        n_docs = max(len(self.doc_ids), 1)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        df = np.bincount(terms, minlength=len(self._terms)).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+        norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[docs] / max(avg_length, 1e-6))
+        weights = idf[terms] * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        order = np.lexsort((-weights, terms))
+        self._docs = docs[order]
+        self._weights = weights[order].astype(np.float32)
+        self._term_offsets = np.concatenate(([0], np.cumsum(df.astype(np.int64))))
+        self._doc_pdf_array = np.frombuffer(self._doc_pdf_codes, dtype=np.int32).copy()
+        self._dirty = False
+
+    def search(self, query: str, k: int = 25, pdf_names: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Return the top-k (doc_id, score) pairs for a query"""
+        if not self.doc_ids:
+            return []
+        if self._dirty or self._docs is None:
+            self.finalize()
+
+        allowed = None
+        if pdf_names is not None:
+            codes = [self._pdf_codes[name] for name in pdf_names if name in self._pdf_codes]
+            if not codes:
+                return []
+            allowed = np.array(codes, dtype=np.int32)
+
+        doc_parts = []
+        weight_parts = []
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._term_offsets[term_id], self._term_offsets[term_id + 1]
+            docs = self._docs[start:end]
+            weights = self._weights[start:end]
+            if allowed is not None:
+                mask = np.isin(self._doc_pdf_array[docs], allowed)
+                docs = docs[mask]
+                weights = weights[mask]
+            doc_parts.append(docs[:self.max_postings_per_term])
+            weight_parts.append(weights[:self.max_postings_per_term])
+
+        if not doc_parts:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(self.doc_ids[candidates[i]], float(scores[i])) for i in top]
+
+    def save(self) -> bool:
+        """Persist the posting columns and vocabulary to the index directory"""
+        if not self.directory:
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            columns = {
+                "posting_terms": self._posting_terms,
+                "posting_docs": self._posting_docs,
+                "posting_tfs": self._posting_tfs,
+                "doc_lengths": self._doc_lengths,
+                "doc_pdf_codes": self._doc_pdf_codes,
+            }
+            for name, column in columns.items():
+                np.save(os.path.join(self.directory, f"{name}.npy"), np.frombuffer(column, dtype=np.int32))
+            with open(os.path.join(self.directory, "index.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "k1": self.k1,
+                    "b": self.b,
+                    "terms": self._terms,
+                    "doc_ids": self.doc_ids,
+                    "pdf_names": self._pdf_names
+                }, f)
+            return True
+        except Exception as e:
+            print(f"Error saving lexical index: {e}")
+            return False
+
+    def load(self) -> bool:
+        """Load a persisted index if one exists"""
+        if not self.directory or not os.path.exists(os.path.join(self.directory, "index.json")):
+            return False
+        try:
+            with open(os.path.join(self.directory, "index.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.k1 = meta["k1"]
+            self.b = meta["b"]
+            self._terms = meta["terms"]
+            self._vocabulary = {term: i for i, term in enumerate(self._terms)}
+            self.doc_ids = meta["doc_ids"]
+            self._pdf_names = meta["pdf_names"]
+            self._pdf_codes = {name: i for i, name in enumerate(self._pdf_names)}
+            for name in ["posting_terms", "posting_docs", "posting_tfs", "doc_lengths", "doc_pdf_codes"]:
+                column = np.load(os.path.join(self.directory, f"{name}.npy"))
+                setattr(self, f"_{name}", array('i', column.astype(np.int32).tobytes()))
+            self.finalize()
+            return True
+        except Exception as e:
+            print(f"Error loading lexical index: {e}")
+            return False
@@ -486,13 +486,18 @@
 
 
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 from rag_orchestrator import RAGOrchestrator
+from pdf_query_handler import PDFQueryHandler
+from job_queue import JobStore, JobQueue, format_sse, public_job
 from dotenv import load_dotenv
 import google.generativeai as genai
 from enum import Enum
 import os
+import uuid
+import threading
 
 load_dotenv()
 
@@ -503,6 +508,14 @@ CORS(app)  # Enable CORS for frontend communication
 pdf_folder = "./pdf"
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 rag_system = None
+pdf_handler = None
+upload_queue = None
+_upload_queue_lock = threading.Lock()
+
+# Uploads are processed by a small worker pool so they cannot starve query traffic
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+MAX_PENDING_UPLOADS = int(os.getenv("MAX_PENDING_UPLOADS", "16"))
+MAX_UPLOADS_PER_SESSION = int(os.getenv("MAX_UPLOADS_PER_SESSION", "3"))
 
 class QueryIntent(Enum):
     DRUG_RELATED = "drug_related"  # Query is about drugs, medications, pharmacology
@@ -563,7 +576,8 @@ def initialize_rag_system():
     """Initialize the RAG system"""
     global rag_system
     try:
-        rag_system = RAGOrchestrator(pdf_folder, gemini_api_key)
+        # Workers share the memory-mapped index snapshot published by ingestion
+        rag_system = RAGOrchestrator(pdf_folder, gemini_api_key, serve_snapshot=True)
         
         # Check if database has documents
         if not rag_system.vector_db.is_initialized():
@@ -578,13 +592,37 @@ def initialize_rag_system():
         print(f"Error initializing RAG system: {e}")
         return False
 
+def initialize_upload_queue():
+    """Create the uploaded-PDF handler and its background job queue"""
+    global pdf_handler, upload_queue
+    if upload_queue is not None:
+        return upload_queue
+    # Concurrent first uploads must not start two queues over the same job table
+    with _upload_queue_lock:
+        if upload_queue is not None:
+            return upload_queue
+        pdf_handler = PDFQueryHandler(gemini_api_key)
+        store = JobStore(os.path.join(pdf_handler.upload_folder, "jobs.sqlite3"))
+        queue = JobQueue(pdf_handler.process_uploaded_pdf, store, max_workers=UPLOAD_WORKERS,
+                         max_pending=MAX_PENDING_UPLOADS, max_jobs_per_session=MAX_UPLOADS_PER_SESSION)
+        # Expire idle sessions, processed uploads and old extractions; sessions with unfinished jobs are kept.
+        # An expired session's jobs are deleted, so querying it answers 409 instead of searching nothing
+        pdf_handler.janitor.start(
+            active_sessions=lambda: {job['session_id'] for job in store.list(statuses=['queued', 'running'])},
+            on_session_expired=store.delete_session
+        )
+        # Published last, so other threads only see a fully started queue
+        upload_queue = queue
+    return upload_queue
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'database_initialized': rag_system is not None and rag_system.vector_db.is_initialized(),
-        'document_count': rag_system.vector_db.get_document_count() if rag_system else 0
+        'document_count': rag_system.vector_db.get_document_count() if rag_system else 0,
+        'upload_cleanup': pdf_handler.janitor.totals if pdf_handler else None
     })
 
 @app.route('/api/query', methods=['POST'])
@@ -646,6 +684,89 @@ def get_database_info():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload', methods=['POST'])
+def upload_pdf():
+    """Save an uploaded PDF and queue it for processing; returns a job to poll or stream"""
+    try:
+        queue = initialize_upload_queue()
+        file = request.files.get('file')
+        if file is None or not file.filename:
+            return jsonify({'error': 'A PDF file is required'}), 400
+        if not pdf_handler.allowed_file(file.filename):
+            return jsonify({'error': 'Only PDF files are supported'}), 400
+        
+        session_id = request.form.get('session_id') or str(uuid.uuid4())
+        filename = secure_filename(file.filename)
+        # Unique stored name, so concurrent uploads of the same file do not collide
+        pdf_path = os.path.join(pdf_handler.upload_folder, f"{uuid.uuid4().hex}_{filename}")
+        file.save(pdf_path)
+        
+        job_id = queue.submit(pdf_path, session_id, filename=filename)
+        if job_id is None:
+            os.remove(pdf_path)
+            return jsonify({'error': 'Too many uploads are being processed. Please retry shortly.',
+                            'success': False}), 429
+        
+        return jsonify({
+            'job_id': job_id,
+            'session_id': session_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events',
+            'success': True
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Error uploading file: {str(e)}', 'success': False}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Poll the status and progress of an upload job"""
+    job = initialize_upload_queue().status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(public_job(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Server-sent events with the job's progress until it completes or fails"""
+    queue = initialize_upload_queue()
+    if queue.status(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    events = (format_sse(job) for job in queue.events(job_id))
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/upload/query', methods=['POST'])
+def query_uploaded_pdf():
+    """Query the PDFs uploaded in a session; pages are searchable as soon as they are indexed"""
+    try:
+        queue = initialize_upload_queue()
+        data = request.get_json()
+        query = data.get('query', '').strip()
+        session_id = data.get('session_id', '')
+        
+        if not query or not session_id:
+            return jsonify({'error': 'Query and session_id are required'}), 400
+        
+        jobs = queue.store.list(session_id=session_id)
+        if not any(job['documents_indexed'] for job in jobs):
+            return jsonify({'error': 'No indexed pages for this session yet',
+                            'jobs': [public_job(job) for job in jobs]}), 409
+        
+        response_text, success, _ = pdf_handler.query_uploaded_pdf(query, session_id)
+        return jsonify({
+            'response': response_text,
+            'query': query,
+            'session_id': session_id,
+            # Answers may miss pages that are still being processed
+            'partial': any(job['status'] in ('queued', 'running') for job in jobs),
+            'success': success
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error processing query: {str(e)}', 'success': False}), 500
+
 if __name__ == '__main__':
     # Initialize RAG system on startup
     print("Initializing RAG system...")
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from array import array
+from typing import List, Dict, Any, Optional, Iterable
+import numpy as np
+
+MISSING_INT = -(2 ** 62)
+MISSING_CODE = -1
+
+# Storage of each column kind: (array typecode, NumPy dtype, missing value)
+_KIND_STORAGE = {
+    "int": ("q", np.int64, MISSING_INT),
+    "float": ("d", np.float64, float("nan")),
+    "bool": ("b", np.int8, -1),
+    "category": ("i", np.int32, MISSING_CODE),
+}
+
+# Unique per chunk, so dictionary encoding would not pay off
+OBJECT_FIELDS = {"chunk_id", "table_id", "image_id", "original_image_path", "upload_time", "filename"}
+
+
+def _infer_kind(field: str, value: Any) -> str:
+    if field in OBJECT_FIELDS or isinstance(value, (list, tuple, dict)):
+        return "object"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    return "category"
+
+
+class _Columns:
+    """The complete state of a store, replaced as a whole when a saved store is loaded"""
+
+    def __init__(self, generation: str):
+        self.kinds = {}          # field -> kind
+        self.columns = {}        # field -> array (typed kinds) or list (object)
+        self.dictionaries = {}   # category field -> list of values
+        self.codes = {}          # category field -> {value: code}
+        self.count = 0
+        self.generation = generation
+
+
+class MetadataStore:
+    """Typed, columnar chunk metadata keyed by row number.
+
+    Numbers and flags are stored in flat typed columns, repeated strings
+    (pdf_name, section, citation, ...) as dictionary codes, and structured values
+    such as table samples or shared sources natively. Assembling the metadata
+    of the top-n results is a column gather; nothing is parsed from JSON
+    strings at query time. Every new store gets a `generation` id, which is
+    saved with it and copied into the vector index metadata of its chunks, so
+    readers can tell a rebuilt store from the one they loaded.
+
+    Each save writes a new version directory and then replaces the CURRENT
+    pointer, and `load` swaps in the complete new state with one assignment,
+    so concurrent readers never mix columns of two versions.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._state = _Columns(uuid.uuid4().hex)
+
+    def __len__(self) -> int:
+        return self._state.count
+
+    @property
+    def generation(self) -> str:
+        return self._state.generation
+
+    @property
+    def kinds(self) -> Dict[str, str]:
+        return self._state.kinds
+
+    def _add_column(self, field: str, kind: str):
+        state = self._state
+        state.kinds[field] = kind
+        if kind == "object":
+            state.columns[field] = [None] * state.count
+        else:
+            typecode, _, missing = _KIND_STORAGE[kind]
+            state.columns[field] = array(typecode, [missing]) * state.count
+        if kind == "category":
+            state.dictionaries[field] = []
+            state.codes[field] = {}
+
+    def _encode(self, field: str, value: Any) -> Any:
+        state = self._state
+        kind = state.kinds[field]
+        if value is None:
+            return None if kind == "object" else _KIND_STORAGE[kind][2]
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "bool":
+            return int(bool(value))
+        if kind == "category":
+            value = str(value)
+            code = state.codes[field].get(value)
+            if code is None:
+                code = state.codes[field][value] = len(state.dictionaries[field])
+                state.dictionaries[field].append(value)
+            return code
+        return value
+
+    def add(self, metadatas: List[Dict[str, Any]]) -> List[int]:
+        """Append one row per metadata dict and return the row numbers"""
+        state = self._state
+        first_row = state.count
+        for metadata in metadatas:
+            for field, value in metadata.items():
+                if field not in state.kinds and value is not None:
+                    self._add_column(field, _infer_kind(field, value))
+            for field, column in state.columns.items():
+                column.append(self._encode(field, metadata.get(field)))
+            state.count += 1
+        return list(range(first_row, state.count))
+
+    def update(self, row: int, metadata: Dict[str, Any]):
+        """Overwrite the fields of an existing row"""
+        state = self._state
+        for field, value in metadata.items():
+            if field not in state.kinds:
+                if value is None:
+                    continue
+                self._add_column(field, _infer_kind(field, value))
+            state.columns[field][row] = self._encode(field, value)
+
+    def numeric(self, field: str, rows: Iterable[int], default: float = 0.0) -> np.ndarray:
+        """Gather a numeric column as float64, with missing values replaced by a default"""
+        state = self._state
+        rows = np.asarray(rows, dtype=np.int64)
+        if field not in state.kinds or state.kinds[field] not in ("int", "float", "bool"):
+            return np.full(len(rows), default, dtype=np.float64)
+        _, dtype, missing = _KIND_STORAGE[state.kinds[field]]
+        values = np.frombuffer(state.columns[field], dtype=dtype)[rows]
+        missing_mask = np.isnan(values) if state.kinds[field] == "float" else values == missing
+        return np.where(missing_mask, default, values.astype(np.float64))
+
+    def gather(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        """Metadata dicts of the given rows, assembled column by column"""
+        state = self._state
+        rows = np.asarray(rows, dtype=np.int64)
+        results = [{} for _ in range(len(rows))]
+        for field, kind in state.kinds.items():
+            column = state.columns[field]
+            if kind == "object":
+                values = [column[row] for row in rows]
+            else:
+                _, dtype, missing = _KIND_STORAGE[kind]
+                raw = np.frombuffer(column, dtype=dtype)[rows]
+                present = ~np.isnan(raw) if kind == "float" else raw != missing
+                if kind == "category":
+                    dictionary = state.dictionaries[field]
+                    values = [dictionary[code] if ok else None for code, ok in zip(raw.tolist(), present)]
+                elif kind == "bool":
+                    values = [bool(value) if ok else None for value, ok in zip(raw.tolist(), present)]
+                else:
+                    values = [value if ok else None for value, ok in zip(raw.tolist(), present)]
+            for result, value in zip(results, values):
+                if value is not None:
+                    result[field] = value
+        return results
+
+    def _current_directory(self) -> Optional[str]:
+        """Directory of the version CURRENT points to; stores saved before versioning use the top level"""
+        try:
+            with open(os.path.join(self.directory, "CURRENT"), "r", encoding="utf-8") as f:
+                return os.path.join(self.directory, f.read().strip())
+        except OSError:
+            return self.directory if os.path.exists(os.path.join(self.directory, "schema.json")) else None
+
+    def save(self) -> bool:
+        """Persist typed columns as .npy files and structured columns as JSON, as a new version"""
+        if not self.directory:
+            return False
+        try:
+            state = self._state
+            previous = self._current_directory()
+            version = f"v{time.time_ns():020d}"
+            target = os.path.join(self.directory, version)
+            os.makedirs(target)
+            objects = {}
+            for field, kind in state.kinds.items():
+                if kind == "object":
+                    objects[field] = state.columns[field]
+                else:
+                    np.save(os.path.join(target, f"{field}.npy"),
+                            np.frombuffer(state.columns[field], dtype=_KIND_STORAGE[kind][1]))
+            with open(os.path.join(target, "objects.json"), "w", encoding="utf-8") as f:
+                json.dump(objects, f)
+            with open(os.path.join(target, "schema.json"), "w", encoding="utf-8") as f:
+                json.dump({"count": state.count, "kinds": state.kinds, "dictionaries": state.dictionaries,
+                           "generation": state.generation}, f)
+
+            pointer = os.path.join(self.directory, ".CURRENT.tmp")
+            with open(pointer, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(pointer, os.path.join(self.directory, "CURRENT"))
+
+            # The previous version stays for readers that are still loading it
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.isdir(path) and name != version and path != previous:
+                    shutil.rmtree(path, ignore_errors=True)
+            return True
+        except Exception as e:
+            print(f"Error saving metadata store: {e}")
+            return False
+
+    def load(self) -> bool:
+        """Load a persisted store if one exists"""
+        if not self.directory:
+            return False
+        source = self._current_directory()
+        if source is None:
+            return False
+        try:
+            with open(os.path.join(source, "schema.json"), "r", encoding="utf-8") as f:
+                schema = json.load(f)
+            with open(os.path.join(source, "objects.json"), "r", encoding="utf-8") as f:
+                objects = json.load(f)
+            state = _Columns(schema.get("generation", self._state.generation))
+            state.count = schema["count"]
+            state.kinds = schema["kinds"]
+            state.dictionaries = schema["dictionaries"]
+            state.codes = {field: {value: i for i, value in enumerate(values)}
+                           for field, values in state.dictionaries.items()}
+            for field, kind in state.kinds.items():
+                if kind == "object":
+                    state.columns[field] = objects[field]
+                else:
+                    typecode, dtype, _ = _KIND_STORAGE[kind]
+                    values = np.load(os.path.join(source, f"{field}.npy")).astype(dtype)
+                    state.columns[field] = array(typecode, values.tobytes())
+            # One assignment: queries see either the old or the new store
+            self._state = state
+            return True
+        except Exception as e:
+            print(f"Error loading metadata store: {e}")
+            return False
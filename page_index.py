@@ -0,0 +1,85 @@
+import os
+import json
+from bisect import bisect_right
+from typing import List, Dict, Any, Tuple, Optional
+
+
+class PageOffsetIndex:
+    """Per-document index from character offsets to PDF page numbers.
+
+    Text chunks only store `char_start`/`char_end` in document coordinates (see
+    `SectionSegmenter`). The pages a chunk spans are resolved with a binary search
+    over the sorted page start offsets, which are stored once per PDF instead of
+    being copied into every chunk's metadata.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._documents = {}
+
+    @staticmethod
+    def from_sections(sections: List[Dict[str, Any]]) -> Tuple[List[int], List[int]]:
+        """Build sorted (offsets, pages) arrays from segmented sections"""
+        offsets = []
+        pages = []
+        for section in sections:
+            for offset, page in section.get("page_offsets", []):
+                if pages and pages[-1] == page:
+                    continue
+                offsets.append(section["doc_offset"] + offset)
+                pages.append(page)
+        return offsets, pages
+
+    def add(self, pdf_name: str, offsets: List[int], pages: List[int]):
+        """Register the page offsets of a document"""
+        if offsets:
+            self._documents[pdf_name] = (list(offsets), list(pages))
+
+    def remove(self, pdf_name: str):
+        """Forget the page offsets of a document"""
+        self._documents.pop(pdf_name, None)
+
+    def __contains__(self, pdf_name: str) -> bool:
+        return pdf_name in self._documents
+
+    def page_span(self, pdf_name: str, char_start: int, char_end: int) -> Optional[Tuple[int, int]]:
+        """Return the first and last page covered by a character span"""
+        entry = self._documents.get(pdf_name)
+        if entry is None:
+            return None
+        offsets, pages = entry
+        first = max(bisect_right(offsets, char_start) - 1, 0)
+        last = max(bisect_right(offsets, max(char_end - 1, char_start)) - 1, first)
+        return pages[first], pages[last]
+
+    def load(self) -> bool:
+        """Load the index from disk if it exists"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._documents = {
+                name: (entry["offsets"], entry["pages"]) for name, entry in data.items()
+            }
+            return True
+        except Exception as e:
+            print(f"Error loading page index: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Persist the index next to the vector store"""
+        if not self.path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            data = {
+                name: {"offsets": offsets, "pages": pages}
+                for name, (offsets, pages) in self._documents.items()
+            }
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            return True
+        except Exception as e:
+            print(f"Error saving page index: {e}")
+            return False
@@ -1173,8 +1173,7 @@
 import os
 import re
 import uuid
-import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from unstructured.partition.pdf import partition_pdf
 from unstructured.documents.elements import CompositeElement, Table, Image
 import google.generativeai as genai
@@ -1190,6 +1189,12 @@ import tempfile
 import torch
 from transformers import InstructBlipProcessor, InstructBlipForConditionalGeneration
 import requests
+from dedup import reconcile_extractor_text
+from section_segmenter import SectionSegmenter, FDA_SECTIONS
+from chunker import TokenAwareChunker
+from page_index import PageOffsetIndex
+from table_render import render_row, render_table, dataframe_rows
+from table_stitcher import stitch_table_fragments
 
 class PDFProcessor:
     """Enhanced PDF processor with multiple extraction strategies"""
@@ -1209,22 +1214,24 @@ class PDFProcessor:
         self._initialize_instructblip()
         
         # FDA sections
-        self.fda_sections = [
-            "BOXED WARNING", "INDICATIONS AND USAGE", "DOSAGE AND ADMINISTRATION",
-            "CONTRAINDICATIONS", "WARNINGS AND PRECAUTIONS", "ADVERSE REACTIONS",
-            "DRUG INTERACTIONS", "USE IN SPECIFIC POPULATIONS", "PATIENT COUNSELING INFORMATION",
-            "CLINICAL PHARMACOLOGY", "HOW SUPPLIED/STORAGE AND HANDLING", "MEDICATION GUIDE",
-            "DESCRIPTION", "CLINICAL STUDIES", "MECHANISM OF ACTION", "PHARMACOKINETICS",
-            "NONCLINICAL TOXICOLOGY", "CLINICAL TRIALS"
-        ]
-        self.fda_section_pattern = re.compile(
-            r'^\s*(' + '|'.join(re.escape(section) for section in self.fda_sections) + r')\s*$',
-            re.IGNORECASE | re.MULTILINE
-        )
+        self.fda_sections = list(FDA_SECTIONS)
+        self.section_segmenter = SectionSegmenter(self.fda_sections)
+        
+        # Chunk sizes are measured in tokens of the embedding model
+        self.chunker = TokenAwareChunker()
         
         # Create directory for extracted images if it doesn't exist
         self.image_output_dir = "./extracted_images"
         os.makedirs(self.image_output_dir, exist_ok=True)
+        
+        # Per-document reports of text dropped by extractor reconciliation
+        self.dedup_reports = {}
+        
+        # Per-document (offsets, pages) arrays used to resolve chunk pages at query time
+        self.page_indexes = {}
+        
+        # Per-document structured tables for the table store
+        self.table_records = {}
 
     def _initialize_instructblip(self):
         """Initialize InstructBLIP model for image captioning"""
@@ -1244,8 +1251,11 @@ class PDFProcessor:
             print(f"Failed to load InstructBLIP model: {e}")
             print("Falling back to basic image description")
 
-    def extract_elements(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Extract elements using multiple strategies for better table and image detection"""
+    def extract_elements(self, pdf_path: str, page_offset: int = 0) -> List[Dict[str, Any]]:
+        """Extract elements using multiple strategies for better table and image detection.
+
+        `page_offset` is added to every page number, for PDFs that are a page range of a larger document.
+        """
         print(f"Extracting elements from {pdf_path}...")
         
         processed_elements = []
@@ -1265,19 +1275,21 @@ class PDFProcessor:
                 languages=["eng"],
             )
             
-            page_number = 1
+            page_number = 1 + page_offset
             
             for element in elements:
+                # Elements without a page number stay on the page of the previous element
+                if getattr(element.metadata, 'page_number', None) is not None:
+                    page_number = element.metadata.page_number + page_offset
+                
                 element_data = {
                     "type": type(element).__name__,
+                    "extractor": "unstructured",
                     "text": str(element),
                     "metadata": element.metadata.to_dict(),
-                    "page_number": element.metadata.page_number if hasattr(element.metadata, 'page_number') else page_number
+                    "page_number": page_number
                 }
                 
-                if hasattr(element.metadata, 'page_number'):
-                    page_number = element.metadata.page_number
-                
                 # Handle tables
                 if isinstance(element, Table):
                     element_data["table_data"] = self._structure_table_data(element)
@@ -1298,7 +1310,7 @@ class PDFProcessor:
         # Strategy 2: Use pdfplumber for additional text extraction
         try:
             with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
+                for page_num, page in enumerate(pdf.pages, 1 + page_offset):
                     text = page.extract_text()
                     if text:
                         processed_elements.append({
@@ -1315,27 +1327,33 @@ class PDFProcessor:
             tables = camelot.read_pdf(pdf_path, pages='all', flavor='stream')
             for i, table in enumerate(tables):
                 if table.parsing_report and table.parsing_report.get('accuracy', 0) > 50:
+                    page = int(table.page) + page_offset
+                    # One vectorized conversion; the first row holds the headers
+                    cells = dataframe_rows(table.df)
                     table_data = {
-                        "headers": table.df.iloc[0].tolist() if not table.df.empty else [],
-                        "data": table.df.iloc[1:].values.tolist() if len(table.df) > 1 else [],
-                        "row_count": len(table.df) - 1 if len(table.df) > 1 else 0,
-                        "col_count": len(table.df.columns) if not table.df.empty else 0
+                        "headers": cells[0] if cells else [],
+                        "data": cells[1:],
+                        "row_count": max(len(cells) - 1, 0),
+                        "col_count": len(table.df.columns) if cells else 0
                     }
                     
                     processed_elements.append({
                         "type": "Table",
-                        "text": table.df.to_string(),
-                        "metadata": {"page_number": table.page},
-                        "page_number": table.page,
+                        "extractor": "camelot",
+                        "text": render_table(table_data["headers"], table_data["data"], "csv"),
+                        "metadata": {"page_number": page},
+                        "page_number": page,
+                        # Column x-ranges, used to recognize continuations on the next page
+                        "column_bounds": [tuple(col) for col in getattr(table, "cols", None) or []],
                         "table_data": table_data,
-                        "text_representation": self._create_table_text_representation(table_data, table.page)
+                        "text_representation": self._create_table_text_representation(table_data, page)
                     })
         except Exception as e:
             print(f"Camelot table extraction failed: {e}")
         
         # Strategy 4: Enhanced image extraction using PyMuPDF (fitZ)
         try:
-            image_elements = self._extract_images_with_pymupdf(pdf_path)
+            image_elements = self._extract_images_with_pymupdf(pdf_path, page_offset)
             processed_elements.extend(image_elements)
             print(f"Extracted {len(image_elements)} images using PyMuPDF")
         except Exception as e:
@@ -1343,13 +1361,13 @@ class PDFProcessor:
         
         return processed_elements
 
-    def _extract_images_with_pymupdf(self, pdf_path: str) -> List[Dict[str, Any]]:
+    def _extract_images_with_pymupdf(self, pdf_path: str, page_offset: int = 0) -> List[Dict[str, Any]]:
         """Extract images using PyMuPDF for better image detection"""
         image_elements = []
         doc = fitz.open(pdf_path)
         
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
+        for page_num in range(page_offset, page_offset + len(doc)):
+            page = doc.load_page(page_num - page_offset)
             image_list = page.get_images()
             
             for img_index, img in enumerate(image_list):
@@ -1360,7 +1378,9 @@ class PDFProcessor:
                     image_ext = base_image["ext"]
                     
                     # Save image to file
-                    image_filename = f"image_page{page_num+1}_{img_index}.{image_ext}"
+                    # Named after the PDF, so images of different documents never overwrite each other
+                    pdf_stem = os.path.splitext(os.path.basename(pdf_path))[0]
+                    image_filename = f"{pdf_stem}_page{page_num+1}_{img_index}.{image_ext}"
                     image_path = os.path.join(self.image_output_dir, image_filename)
                     
                     with open(image_path, "wb") as f:
@@ -1438,24 +1458,7 @@ class PDFProcessor:
 
     def _create_table_text_representation(self, table_data: Dict[str, Any], page_num: int) -> str:
         """Create comprehensive textual representation of table"""
-        text_rep = f"Table from page {page_num}. "
-        
-        if table_data["headers"]:
-            text_rep += f"Headers: {', '.join([h for h in table_data['headers'] if h])}. "
-        
-        # Add all data rows for comprehensive search
-        for i, row in enumerate(table_data["data"]):
-            if any(cell.strip() for cell in row):
-                row_data = []
-                for j, cell in enumerate(row):
-                    if cell.strip() and j < len(table_data["headers"]):
-                        header_name = table_data["headers"][j] if table_data["headers"][j] else f"Column_{j+1}"
-                        row_data.append(f"{header_name}: {cell}")
-                
-                if row_data:
-                    text_rep += f"Row {i+1}: {', '.join(row_data)}. "
-        
-        return text_rep.strip()
+        return render_table(table_data["headers"], table_data["data"], "sentences", page_number=page_num)
 
     def _describe_image(self, image_path: str) -> str:
         """Generate description for image using InstructBLIP"""
@@ -1590,175 +1593,162 @@ class PDFProcessor:
         except Exception as e:
             return f"Medical image showing relevant information. [Basic processing error: {str(e)}]"
 
-    def extract_sections(self, elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Extract sections from processed elements"""
-        if not elements:
-            return []
-        
-        # Combine text elements with page markers
-        combined_text = ""
-        current_page = 1
-        
-        for element in elements:
-            if element["type"] in ["CompositeElement", "TextElement"] and element["text"].strip():
-                if element["page_number"] != current_page:
-                    combined_text += f"\n--- Page {element['page_number']} ---\n"
-                    current_page = element["page_number"]
-                combined_text += element["text"] + "\n"
-        
-        # Check if document follows FDA format
-        is_fda = self.is_fda_format(combined_text)
-        
-        # Extract sections
-        sections = []
-        current_section = "INTRODUCTION"
-        content = ""
-        page_start = 1
-        page_end = 1
-
-        lines = combined_text.split("\n")
-        for line in lines:
-            # Check for page markers
-            if line.startswith("--- Page "):
-                if content.strip():
-                    sections.append({
-                        "section": current_section,
-                        "content": content.strip(),
-                        "page_start": page_start,
-                        "page_end": page_end,
-                        "is_fda": is_fda
-                    })
-                    content = ""
-                
-                match = re.match(r'--- Page (\d+) ---', line)
-                if match:
-                    page_start = int(match.group(1))
-                    page_end = page_start
-                continue
-
-            # Check for section headers
-            section_match = None
-            if is_fda:
-                section_match = self.fda_section_pattern.match(line.upper())
-            else:
-                section_match = (re.match(r'^\s*([A-Z][A-Z\s\-]+(?:\.|:)?)\s*$', line)
-                                 and len(line.strip()) < 100
-                                 and not line.strip().isdigit())
-
-            if section_match:
-                if content.strip():
-                    sections.append({
-                        "section": current_section,
-                        "content": content.strip(),
-                        "page_start": page_start,
-                        "page_end": page_end,
-                        "is_fda": is_fda
-                    })
-                current_section = line.strip().upper()
-                content = ""
-                page_start = page_end
-            else:
-                content += line + "\n"
-                page_end = current_page
-
-        if content.strip():
-            sections.append({
-                "section": current_section,
-                "content": content.strip(),
-                "page_start": page_start,
-                "page_end": page_end,
-                "is_fda": is_fda
-            })
-
-        return sections
+    def extract_sections(self, elements: List[Dict[str, Any]],
+                         state: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Extract sections from processed elements; `state` continues a document across page batches"""
+        return self.section_segmenter.segment(elements, state)
 
     def is_fda_format(self, text: str) -> bool:
-        count = sum(1 for section in self.fda_sections if section.upper() in text.upper())
-        return count >= 3
-
-    def chunk_content(self, content: str, chunk_size: int = 800, overlap: int = 100) -> List[Dict[str, Any]]:
-        chunks = []
-        words = content.split()
-        if len(words) <= chunk_size:
-            return [{"content": content, "chunk_id": "chunk_0"}]
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk_words = words[i:i + chunk_size]
-            chunk_text = " ".join(chunk_words)
-            if chunk_text.strip():
-                chunks.append({
-                    "content": chunk_text,
-                    "chunk_id": f"chunk_{i // chunk_size}"
-                })
-        return chunks
+        return self.section_segmenter.is_fda_format([text])
+
+    def chunk_content(self, content: str) -> List[Dict[str, Any]]:
+        return self.chunker.chunk_text(content)
 
     def prepare_documents_for_db(self, pdf_name: str, pdf_index: int, 
-                                elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Prepare all extracted elements for database storage"""
+                                elements: List[Dict[str, Any]],
+                                batch_offsets: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Prepare all extracted elements for database storage.
+
+        When a document is prepared in page batches, `batch_offsets` holds the
+        running character, chunk, table and image counts of the earlier batches
+        and the segmenter state (open section, FDA format decision); it is
+        advanced in place so ids and offsets stay unique per document and a
+        section continuing into the next batch keeps its name.
+        """
         documents_batch = []
+        offsets = batch_offsets if batch_offsets is not None else {}
         
         # First, extract sections from text elements
         text_elements = [e for e in elements if e["type"] in ["CompositeElement", "TextElement"]]
-        sections = self.extract_sections(text_elements)
+        text_elements = self.reconcile_text_elements(pdf_name, text_elements)
+        sections = self.extract_sections(text_elements, offsets.setdefault("segmenter", {}))
+        for section in sections:
+            section["doc_offset"] += offsets.get("chars", 0)
+        page_offsets, pages = PageOffsetIndex.from_sections(sections)
+        if offsets.get("chars") and pdf_name in self.page_indexes:
+            # Later batches extend the page index of the earlier ones
+            previous_offsets, previous_pages = self.page_indexes[pdf_name]
+            page_offsets, pages = previous_offsets + page_offsets, previous_pages + pages
+        self.page_indexes[pdf_name] = (page_offsets, pages)
+        page_lookup = PageOffsetIndex()
+        page_lookup.add(pdf_name, page_offsets, pages)
+        
+        # Chunk all sections in one tokenizer batch; ordinals are unique per document
+        chunked = self.chunker.chunk_sections(sections, offsets.get("chunks", 0))
+        for section, chunks in zip(sections, chunked):
+            section["chunks"] = chunks
         
         # Process text sections
         for section in sections:
-            if "chunks" not in section:
-                section["chunks"] = self.chunk_content(section["content"])
             for chunk in section["chunks"]:
                 doc_id = str(uuid.uuid4())
+                char_start = section["doc_offset"] + chunk["char_start"]
+                char_end = section["doc_offset"] + chunk["char_end"]
+                # Fallback for stores without this document's page offsets
+                page_span = page_lookup.page_span(pdf_name, char_start, char_end) or (None, None)
                 metadata = {
                     "pdf_index": pdf_index,
                     "pdf_name": pdf_name,
                     "section": section["section"],
-                    "page_start": section["page_start"],
-                    "page_end": section["page_end"],
                     "is_fda": section.get("is_fda", False),
                     "content_type": self._classify_content_type(chunk["content"]),
                     "has_tables": False,
                     "has_images": False,
                     "doc_type": "text",
-                    "citation": f"Page {section['page_start']}-{section['page_end']}, {section['section']}"
+                    "chunk_id": chunk["chunk_id"],
+                    "chunk_ordinal": chunk["chunk_ordinal"],
+                    # Offsets in document coordinates; pages come from the page offset index
+                    "char_start": char_start,
+                    "char_end": char_end,
+                    "page_start": page_span[0],
+                    "page_end": page_span[1],
+                    "token_count": chunk["token_count"],
+                    "citation": section["section"]
                 }
                 
                 documents_batch.append({
                     "id": doc_id,
                     "content": chunk["content"],
-                    "metadata": self._ensure_chromadb_compatible(metadata)
+                    "metadata": metadata
                 })
         
-        # Process tables
-        table_elements = [e for e in elements if e["type"] == "Table"]
-        for table_idx, table in enumerate(table_elements):
+        # Process tables; fragments continued across page breaks are merged first
+        table_elements = [e for e in elements if e["type"] == "Table" and "table_data" in e]
+        table_elements, stitch_report = stitch_table_fragments(table_elements)
+        if stitch_report["fragments_merged"]:
+            print(f"[Processing Summary] Stitched {stitch_report['fragments_before']} table fragments into "
+                  f"{stitch_report['tables_after']} tables ({stitch_report['multi_page_tables']} span several pages)")
+        self.table_records[pdf_name] = []
+        for table_idx, table in enumerate(table_elements, offsets.get("tables", 0)):
             doc_id = str(uuid.uuid4())
+            table_id = str(uuid.uuid4())
+            page_end = table.get("page_end", table["page_number"])
             
             metadata = {
                 "pdf_index": pdf_index,
                 "pdf_name": pdf_name,
                 "section": "TABULAR_DATA",
                 "page_number": table["page_number"],
+                "page_end": page_end,
                 "is_fda": False,
                 "content_type": "tabular",
                 "has_tables": True,
                 "has_images": False,
                 "doc_type": "table",
-                "table_id": str(uuid.uuid4()),
+                "table_id": table_id,
                 "table_index": table_idx + 1,
-                "citation": f"Page {table['page_number']}, Table {table_idx + 1}",
+                "citation": f"Page {table['page_number']}{'-' + str(page_end) if page_end != table['page_number'] else ''}, Table {table_idx + 1}",
                 "table_headers": table.get("table_data", {}).get("headers", []),
                 "table_row_count": table.get("table_data", {}).get("row_count", 0),
-                "table_data_sample": json.dumps(table.get("table_data", {}).get("data", [])[:2])
+                "table_data_sample": table.get("table_data", {}).get("data", [])[:2]
             }
             
             table_doc = {
                 "id": doc_id,
                 "content": table.get("text_representation", table["text"]),
-                "metadata": self._ensure_chromadb_compatible(metadata)
+                "metadata": metadata
             }
             documents_batch.append(table_doc)
+            
+            # Every row is also indexed on its own, so row-specific questions match one row
+            headers = table.get("table_data", {}).get("headers", [])
+            rows = table.get("table_data", {}).get("data", [])
+            row_pages = table.get("row_pages") or [table["page_number"]] * len(rows)
+            for row_idx, row in enumerate(rows):
+                row = [str(cell) if cell is not None else "" for cell in row]
+                if not any(cell.strip() for cell in row):
+                    continue
+                documents_batch.append({
+                    "id": str(uuid.uuid4()),
+                    "content": render_row(headers, row, table_idx + 1, row_pages[row_idx]),
+                    "metadata": {
+                        "pdf_index": pdf_index,
+                        "pdf_name": pdf_name,
+                        "section": "TABULAR_DATA_ROW",
+                        "page_number": row_pages[row_idx],
+                        "is_fda": False,
+                        "content_type": "tabular",
+                        "has_tables": True,
+                        "has_images": False,
+                        "doc_type": "table_row",
+                        "table_id": table_id,
+                        "table_index": table_idx + 1,
+                        "row_index": row_idx,
+                        "citation": f"Page {row_pages[row_idx]}, Table {table_idx + 1}, Row {row_idx + 1}"
+                    }
+                })
+            self.table_records[pdf_name].append({
+                "table_id": table_id,
+                "table_index": table_idx + 1,
+                "page_number": table["page_number"],
+                "headers": headers,
+                "rows": rows,
+                "row_pages": row_pages
+            })
         
         # Process images
         image_elements = [e for e in elements if e["type"] == "Image" and "image_description" in e]
-        for image_idx, image in enumerate(image_elements):
+        for image_idx, image in enumerate(image_elements, offsets.get("images", 0)):
             doc_id = str(uuid.uuid4())
             
             metadata = {
@@ -1780,12 +1770,26 @@ class PDFProcessor:
             image_doc = {
                 "id": doc_id,
                 "content": image["image_description"],
-                "metadata": self._ensure_chromadb_compatible(metadata)
+                "metadata": metadata
             }
             documents_batch.append(image_doc)
         
+        if batch_offsets is not None:
+            if sections:
+                batch_offsets["chars"] = sections[-1]["doc_offset"] + len(sections[-1]["content"]) + 1
+            batch_offsets["chunks"] = offsets.get("chunks", 0) + sum(len(section["chunks"]) for section in sections)
+            batch_offsets["tables"] = offsets.get("tables", 0) + len(table_elements)
+            batch_offsets["images"] = offsets.get("images", 0) + len(image_elements)
+        
         return documents_batch
 
+    def reconcile_text_elements(self, pdf_name: str, text_elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep one canonical copy of page text extracted by both unstructured and pdfplumber"""
+        kept, dropped, report = reconcile_extractor_text(text_elements)
+        report["chunks_saved"] = sum(len(self.chunk_content(e["text"])) for e in dropped)
+        self.dedup_reports[pdf_name] = report
+        return kept
+
     def _classify_content_type(self, content: str) -> str:
         content_lower = content.lower()
         medical_keywords = {
@@ -1804,18 +1808,6 @@ class PDFProcessor:
         else:
             return "general"
         
-    def _ensure_chromadb_compatible(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Ensure all metadata values are compatible with ChromaDB"""
-        compatible_metadata = {}
-        for key, value in metadata.items():
-            if isinstance(value, (list, tuple)):
-                compatible_metadata[key] = json.dumps(value)
-            elif isinstance(value, (str, int, float, bool)) or value is None:
-                compatible_metadata[key] = value
-            else:
-                compatible_metadata[key] = str(value)
-        return compatible_metadata
-
     def process_pdf_for_db(self, pdf_path: str, pdf_index: int = 0) -> List[Dict[str, Any]]:
         """Complete PDF processing pipeline"""
         pdf_name = os.path.basename(pdf_path)
@@ -1835,11 +1827,55 @@ class PDFProcessor:
         documents = self.prepare_documents_for_db(pdf_name, pdf_index, elements)
         print(f"[Processing Summary] Prepared {len(documents)} documents for database storage")
         
+        dedup_report = self.dedup_reports.get(pdf_name)
+        if dedup_report:
+            print(f"[Processing Summary] Extractor overlap - dropped {dedup_report['elements_dropped']} duplicate page texts, "
+                  f"saved {dedup_report['bytes_saved']} bytes ({dedup_report['bytes_before']} -> {dedup_report['bytes_after']}) "
+                  f"and ~{dedup_report['chunks_saved']} chunks")
+        
         # Count document types
         text_docs = sum(1 for doc in documents if doc['metadata']['doc_type'] == 'text')
         table_docs = sum(1 for doc in documents if doc['metadata']['doc_type'] == 'table')
+        row_docs = sum(1 for doc in documents if doc['metadata']['doc_type'] == 'table_row')
         image_docs = sum(1 for doc in documents if doc['metadata']['doc_type'] == 'image')
         
-        print(f"[Processing Summary] Document types - Text: {text_docs}, Tables: {table_docs}, Images: {image_docs}")
+        print(f"[Processing Summary] Document types - Text: {text_docs}, Tables: {table_docs}, "
+              f"Table rows: {row_docs}, Images: {image_docs}")
         
-        return documents
\ No newline at end of file
+        return documents
+    
+    def process_pdf_in_batches(self, pdf_path: str, pdf_index: int = 0,
+                               pages_per_batch: int = 10) -> Iterator[Dict[str, Any]]:
+        """Process a PDF a page range at a time, yielding each batch's documents when ready.
+
+        Every batch is copied into a temporary PDF and runs the full extraction
+        pipeline, so the first pages can be indexed and queried while the rest is
+        still being processed. Yields dicts with `documents`, `tables` (for the
+        table store), `pages_done` and `pages_total`; the document's page index
+        in `page_indexes` grows with every batch. Tables continuing across a
+        batch boundary are not stitched.
+        """
+        pdf_name = os.path.basename(pdf_path)
+        with fitz.open(pdf_path) as source:
+            pages_total = len(source)
+        print(f"\n[Processing] Starting processing for {pdf_name} in batches of {pages_per_batch} pages...")
+        
+        batch_offsets = {"chars": 0, "chunks": 0, "tables": 0, "images": 0, "segmenter": {}}
+        for first_page in range(0, pages_total, pages_per_batch):
+            last_page = min(first_page + pages_per_batch, pages_total) - 1
+            with tempfile.TemporaryDirectory() as batch_dir:
+                batch_path = os.path.join(batch_dir, pdf_name)
+                with fitz.open() as batch, fitz.open(pdf_path) as source:
+                    batch.insert_pdf(source, from_page=first_page, to_page=last_page)
+                    batch.save(batch_path)
+                elements = self.extract_elements(batch_path, page_offset=first_page)
+            
+            documents = self.prepare_documents_for_db(pdf_name, pdf_index, elements, batch_offsets)
+            print(f"[Processing Summary] Pages {first_page + 1}-{last_page + 1} of {pages_total}: "
+                  f"prepared {len(documents)} documents")
+            yield {
+                "documents": documents,
+                "tables": self.table_records.get(pdf_name, []),
+                "pages_done": last_page + 1,
+                "pages_total": pages_total
+            }
\ No newline at end of file
@@ -1,14 +1,19 @@
 import os
+import copy
 import uuid
 import json
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
+import numpy as np
 from werkzeug.utils import secure_filename
 from pdf_processor import PDFProcessor
-from vector_db import EfficientVectorDB
+from session_index import SessionIndex, ExtractionCache, file_digest
+from janitor import SessionRegistry, Janitor
 import google.generativeai as genai
 
 class PDFQueryHandler:
-    def __init__(self, gemini_api_key, upload_folder="./temp_uploads", max_file_age_hours=24):
+    def __init__(self, gemini_api_key, upload_folder="./temp_uploads", max_file_age_hours=24,
+                 max_sessions=32, session_memory_mb=512, cache_budget_mb=1024):
         self.gemini_api_key = gemini_api_key
         self.upload_folder = upload_folder
         self.max_file_age_hours = max_file_age_hours
@@ -17,46 +22,114 @@ class PDFQueryHandler:
         # Create upload directory if it doesn't exist
         os.makedirs(upload_folder, exist_ok=True)
         
-        # Initialize temporary vector DB for uploaded PDFs
-        self.temp_db = EfficientVectorDB(persist_directory="./temp_chroma_db")
-        self.temp_db.initialize(reset=False)
+        # Each session gets its own in-memory exact-search index; only extraction results persist
+        self.extraction_cache = ExtractionCache(os.path.join(upload_folder, "extraction_cache"))
+        self.sessions = SessionIndex(self.extraction_cache, max_sessions=max_sessions,
+                                     memory_budget_mb=session_memory_mb)
+        # Upload workers may write to the same session: writes are serialized, queries are not blocked
+        self._write_lock = threading.Lock()
+        
+        # Sessions and the files they own, expired on a TTL and size budget by the janitor
+        self.registry = SessionRegistry(os.path.join(upload_folder, "sessions.json"))
+        self.registry.load()
+        # Session indexes are in memory only; after a restart they are rebuilt from the cache on first use
+        for session_id, files in self.registry.session_files().items():
+            for key, filename in files:
+                if key in self.extraction_cache:
+                    self.sessions.register_file(session_id, key, filename)
+        self.janitor = Janitor(self.registry, self.sessions, self.extraction_cache,
+                               ttl_hours=max_file_age_hours, cache_budget_mb=cache_budget_mb)
         
         # Initialize Gemini
         genai.configure(api_key=gemini_api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Clean up old files on initialization
-        self.cleanup_old_files()
 
     def cleanup_old_files(self):
-        """Remove files older than max_file_age_hours"""
-        current_time = datetime.now()
-        for filename in os.listdir(self.upload_folder):
-            file_path = os.path.join(self.upload_folder, filename)
-            if os.path.isfile(file_path):
-                file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                if current_time - file_time > timedelta(hours=self.max_file_age_hours):
-                    os.remove(file_path)
-                    print(f"Removed old file: {filename}")
+        """Expire sessions, uploads and cached extractions older than max_file_age_hours now.
+
+        `self.janitor.start()` runs the same pass periodically in the background.
+        """
+        return self.janitor.run_once()
 
     def allowed_file(self, filename):
         """Check if the file has an allowed extension"""
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in ['pdf']
 
-    def process_uploaded_pdf(self, pdf_path, session_id):
-        """Process an uploaded PDF and add to temporary database"""
+    def process_uploaded_pdf(self, pdf_path, session_id, progress=None, filename=None, pages_per_batch=10):
+        """Process an uploaded PDF and add it to the session's index one page batch at a time.
+
+        `progress(pages_done, pages_total, documents_indexed)` is called after each
+        indexed batch; the pages indexed so far can already be queried. A file
+        that was extracted before is restored from the extraction cache.
+        """
+        pdf_name = os.path.basename(pdf_path)
+        filename = filename or pdf_name
+        self.registry.add_upload(session_id, pdf_path)
         try:
-            # Process the PDF
-            documents = self.pdf_processor.process_pdf_for_db(pdf_path, pdf_index=0)
-            
-            # Add session metadata to all documents
-            for doc in documents:
-                doc['metadata']['session_id'] = session_id
-                doc['metadata']['upload_time'] = datetime.now().isoformat()
-                doc['metadata']['filename'] = os.path.basename(pdf_path)
-            
-            # Add to temporary vector DB
-            success = self.temp_db.add_documents_batch(documents)
+            key = file_digest(pdf_path)
+            if key in self.extraction_cache:
+                restored, pages_total = self.sessions.restore_file(session_id, key, filename)
+                if restored:
+                    self.registry.use_cache_entry(key, session_id, filename=filename)
+                    self.registry.mark_processed(pdf_path)
+                    print(f"Restored {restored} documents of {filename} from the extraction cache")
+                    if progress:
+                        progress(pages_total, pages_total, restored)
+                    return True, restored, []
+            
+            upload_time = datetime.now().isoformat()
+            documents = []
+            cached_documents = []
+            cached_embeddings = []
+            tables = []
+            pages_total = 0
+            success = True
+            with self.sessions.open(session_id) as session_db:
+                for batch in self.pdf_processor.process_pdf_in_batches(pdf_path, pdf_index=0,
+                                                                        pages_per_batch=pages_per_batch):
+                    # Add session metadata to the batch's documents
+                    for doc in batch["documents"]:
+                        doc['metadata']['session_id'] = session_id
+                        doc['metadata']['upload_time'] = upload_time
+                        doc['metadata']['filename'] = filename
+                    
+                    # Embed outside the lock; the cache keeps the documents as prepared, before indexing
+                    batch_success = True
+                    if batch["documents"]:
+                        embeddings = self.sessions.embed([doc["content"] for doc in batch["documents"]])
+                        cached_documents.extend(copy.deepcopy(batch["documents"]))
+                        cached_embeddings.append(embeddings)
+                        with self._write_lock:
+                            batch_success = session_db.add_documents_batch(batch["documents"], embeddings=embeddings)
+                    with self._write_lock:
+                        page_index = self.pdf_processor.page_indexes.get(pdf_name)
+                        if batch_success and page_index:
+                            session_db.add_page_offsets(pdf_name, *page_index)
+                        if batch_success and batch["tables"]:
+                            session_db.add_tables(pdf_name, batch["tables"])
+                    success = success and batch_success
+                    tables.extend(batch["tables"])
+                    documents.extend(batch["documents"])
+                    pages_total = batch["pages_total"]
+                    if progress:
+                        progress(batch["pages_done"], batch["pages_total"], len(documents))
+            
+            if success:
+                entry = {
+                    "pdf_name": pdf_name,
+                    "pages_total": pages_total,
+                    "documents": cached_documents,
+                    "tables": tables,
+                    "page_index": self.pdf_processor.page_indexes.get(pdf_name),
+                    "images": [doc["metadata"]["original_image_path"] for doc in cached_documents
+                               if doc["metadata"].get("original_image_path")]
+                }
+                embeddings = np.concatenate(cached_embeddings) if cached_embeddings else np.empty((0, 0), dtype=np.float32)
+                if self.extraction_cache.save(key, entry, embeddings):
+                    self.sessions.register_file(session_id, key, filename)
+                    self.registry.use_cache_entry(key, session_id, self.extraction_cache.size(key), filename)
+                # Failed uploads stay on disk until their TTL, so the job can be retried
+                self.registry.mark_processed(pdf_path)
             
             # Count documents for this session
             session_doc_count = sum(1 for doc in documents if doc['metadata'].get('session_id') == session_id)
@@ -65,6 +138,11 @@ class PDFQueryHandler:
         except Exception as e:
             print(f"Error processing uploaded PDF: {e}")
             return False, 0, []
+        finally:
+            # Per-document extraction state now lives in the session index and the cache
+            for per_document in (self.pdf_processor.page_indexes, self.pdf_processor.table_records,
+                                 self.pdf_processor.dedup_reports):
+                per_document.pop(pdf_name, None)
 
     def format_retrieved_info_with_citations(self, retrieved_chunks):
         """Format retrieved information with proper citations using PDF page numbers"""
@@ -74,8 +152,15 @@ class PDFQueryHandler:
         formatted_info = "DOCUMENT CONTEXT WITH CITATIONS:\n\n"
         
         for i, chunk in enumerate(retrieved_chunks, 1):
-            # Use PDF page number for citation
-            page_num = chunk.get('pdf_page_number', chunk.get('pdf_page_start', chunk.get('page_start', 'N/A')))
+            # Pages are resolved from the chunk's character offsets by the vector store
+            page_start = chunk.get('page_start')
+            page_end = chunk.get('page_end', page_start)
+            if not page_start:
+                page_num = 'N/A'
+            elif page_start == page_end:
+                page_num = str(page_start)
+            else:
+                page_num = f"{page_start}-{page_end}"
             
             citation = f"[Source: {chunk.get('filename', 'Document')}, Page {page_num}"
             
@@ -99,18 +184,19 @@ class PDFQueryHandler:
     def query_uploaded_pdf(self, query_text, session_id, n_results=5):
         """Query the temporary database for a specific session with proper citations"""
         try:
-            # Create session filter
-            where_filter = {"session_id": session_id}
-            
-            # Query the temporary database
-            results = self.temp_db.collection.query(
-                query_texts=[query_text],
-                n_results=n_results * 3,
-                where=where_filter
-            )
-            
-            # Process results
-            processed_results = self.temp_db._process_query_results(results, n_results)
+            self.registry.touch(session_id)
+            # Only the session's own index is searched; no filter over other sessions' chunks
+            with self.sessions.open(session_id, create=False) as session_db:
+                if session_db is None or not session_db.get_document_count():
+                    processed_results = []
+                else:
+                    results = session_db.collection.query(
+                        query_texts=[query_text],
+                        n_results=n_results * 3
+                    )
+                    
+                    # Process results
+                    processed_results = session_db._process_query_results(results, n_results)
             
             # Format the retrieved information with citations
             formatted_info = self.format_retrieved_info_with_citations(processed_results)
@@ -145,13 +231,13 @@ class PDFQueryHandler:
     def cleanup_session(self, session_id):
         """Remove all documents for a specific session"""
         try:
-            # Get all documents for this session
-            results = self.temp_db.collection.get(where={"session_id": session_id})
-            
-            if results and results["ids"]:
-                # Delete documents from collection
-                self.temp_db.collection.delete(ids=results["ids"])
-                print(f"Removed {len(results['ids'])} documents for session {session_id}")
+            # Dropping the session's index frees all of its chunks at once
+            removed = self.sessions.drop(session_id)
+            if removed:
+                print(f"Removed {removed} documents for session {session_id}")
+            for path in self.registry.remove_session(session_id):
+                if os.path.exists(path):
+                    os.remove(path)
             
             return True
         except Exception as e:
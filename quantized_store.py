@@ -0,0 +1,203 @@
+import os
+import json
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import numpy as np
+
+QUANTIZATION_METHODS = ("sq8", "pq")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters keep their previous centroid"""
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (vectors ** 2).sum(1)[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignment = distances.argmin(1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class QuantizedVectorStore:
+    """Compressed, memory-mapped embedding index with full-precision reranking.
+
+    `sq8` stores every dimension as one byte (4x smaller than float32); `pq`
+    splits vectors into `pq_subvectors` parts encoded by a 256-entry codebook
+    each (384-dim vectors with 96 subvectors are 16x smaller). Codes are scanned
+    in blocks with asymmetric distance computation and only the best
+    `k * rerank_factor` candidates are rescored against the full-precision
+    vectors, which stay on disk and are paged in for the shortlist only.
+    """
+
+    def __init__(self, directory: Optional[str] = None, method: str = "sq8", pq_subvectors: int = 96,
+                 rerank_factor: int = 8, block_size: int = 65536, seed: int = 0):
+        if method not in QUANTIZATION_METHODS:
+            raise ValueError(f"Unknown quantization method {method}; expected one of {QUANTIZATION_METHODS}")
+        self.directory = directory
+        self.method = method
+        self.pq_subvectors = pq_subvectors
+        self.rerank_factor = rerank_factor
+        self.block_size = block_size
+        self.seed = seed
+
+        self.ids = []
+        self.codes = None
+        self.vectors = None
+        self.doc_pdf_codes = None
+        self.pdf_names = []
+        self._pdf_codes = {}
+        # sq8: per-dimension offset and scale; pq: codebooks [subvectors, 256, sub_dim]
+        self.offset = None
+        self.scale = None
+        self.codebooks = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, ids: List[str], embeddings: Any, pdf_names: List[str]):
+        """Train the quantizer on a corpus and encode it"""
+        vectors = _normalize(embeddings)
+        self.ids = list(ids)
+        self.pdf_names = list(dict.fromkeys(pdf_names))
+        self._pdf_codes = {name: i for i, name in enumerate(self.pdf_names)}
+        self.doc_pdf_codes = np.array([self._pdf_codes[name] for name in pdf_names], dtype=np.int32)
+        self.vectors = vectors
+
+        if self.method == "sq8":
+            low = vectors.min(0)
+            high = vectors.max(0)
+            self.offset = low
+            self.scale = np.maximum(high - low, 1e-12) / 255.0
+            self.codes = np.clip(np.rint((vectors - low) / self.scale), 0, 255).astype(np.uint8)
+        else:
+            dim = vectors.shape[1]
+            if dim % self.pq_subvectors:
+                raise ValueError(f"Embedding dimension {dim} is not divisible by {self.pq_subvectors} subvectors")
+            sub_dim = dim // self.pq_subvectors
+            rng = np.random.default_rng(self.seed)
+            training = vectors[rng.choice(len(vectors), min(len(vectors), 20000), replace=False)]
+            n_clusters = min(256, len(training))
+            self.codebooks = np.empty((self.pq_subvectors, n_clusters, sub_dim), dtype=np.float32)
+            self.codes = np.empty((len(vectors), self.pq_subvectors), dtype=np.uint8)
+            for j in range(self.pq_subvectors):
+                part = vectors[:, j * sub_dim:(j + 1) * sub_dim]
+                self.codebooks[j] = _kmeans(training[:, j * sub_dim:(j + 1) * sub_dim], n_clusters, 15, rng)
+                for start in range(0, len(part), self.block_size):
+                    block = part[start:start + self.block_size]
+                    distances = -2 * block @ self.codebooks[j].T + (self.codebooks[j] ** 2).sum(1)[None, :]
+                    self.codes[start:start + self.block_size, j] = distances.argmin(1)
+
+    def _approximate_scores(self, query: np.ndarray, rows: slice) -> np.ndarray:
+        """Approximate inner products of a query with a block of encoded vectors"""
+        codes = self.codes[rows]
+        if self.method == "sq8":
+            # q . (offset + scale * code) = q . offset + (q * scale) . code
+            return codes.astype(np.float32) @ (query * self.scale) + float(query @ self.offset)
+        sub_dim = self.codebooks.shape[2]
+        tables = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.pq_subvectors, sub_dim))
+        return tables[np.arange(self.pq_subvectors), codes].sum(1)
+
+    def search(self, query_embedding: Any, k: int = 25, pdf_names: Optional[Iterable[str]] = None,
+               rerank: bool = True) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, cosine distance) pairs of a query embedding"""
+        if not self.ids or k <= 0:
+            return []
+        query = _normalize(query_embedding)
+        shortlist_size = k * self.rerank_factor if rerank else k
+
+        allowed = None
+        if pdf_names is not None:
+            codes = [self._pdf_codes[name] for name in pdf_names if name in self._pdf_codes]
+            if not codes:
+                return []
+            allowed = np.isin(self.doc_pdf_codes, codes)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.ids), self.block_size):
+            rows = np.arange(start, min(start + self.block_size, len(self.ids)))
+            scores = self._approximate_scores(query, slice(rows[0], rows[-1] + 1))
+            if allowed is not None:
+                mask = allowed[rows]
+                rows = rows[mask]
+                scores = scores[mask]
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_rows) > shortlist_size:
+                top = np.argpartition(-best_scores, shortlist_size - 1)[:shortlist_size]
+                best_rows = best_rows[top]
+                best_scores = best_scores[top]
+
+        if rerank:
+            # Exact rescoring of the shortlist against the full-precision vectors
+            order = np.sort(best_rows)
+            best_rows = order
+            best_scores = np.asarray(self.vectors[order] @ query, dtype=np.float32)
+
+        top = np.argsort(-best_scores, kind="stable")[:k]
+        return [(self.ids[best_rows[i]], float(1.0 - best_scores[i])) for i in top]
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Resident size of the codes against the float32 vectors they replace"""
+        return {
+            "codes": int(self.codes.nbytes) if self.codes is not None else 0,
+            "float32": int(len(self.ids) * self.vectors.shape[1] * 4) if self.vectors is not None else 0
+        }
+
+    def save(self) -> bool:
+        """Persist codes, quantizer and full-precision vectors"""
+        if not self.directory or self.codes is None:
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            np.save(os.path.join(self.directory, "codes.npy"), self.codes)
+            np.save(os.path.join(self.directory, "vectors.npy"), np.asarray(self.vectors, dtype=np.float32))
+            np.save(os.path.join(self.directory, "doc_pdf_codes.npy"), self.doc_pdf_codes)
+            if self.method == "sq8":
+                np.savez(os.path.join(self.directory, "quantizer.npz"), offset=self.offset, scale=self.scale)
+            else:
+                np.savez(os.path.join(self.directory, "quantizer.npz"), codebooks=self.codebooks)
+            with open(os.path.join(self.directory, "index.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "method": self.method,
+                    "pq_subvectors": self.pq_subvectors,
+                    "ids": self.ids,
+                    "pdf_names": self.pdf_names
+                }, f)
+            return True
+        except Exception as e:
+            print(f"Error saving quantized index: {e}")
+            return False
+
+    def load(self) -> bool:
+        """Memory-map a persisted index"""
+        if not self.directory or not os.path.exists(os.path.join(self.directory, "index.json")):
+            return False
+        try:
+            with open(os.path.join(self.directory, "index.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.method = meta["method"]
+            self.pq_subvectors = meta["pq_subvectors"]
+            self.ids = meta["ids"]
+            self.pdf_names = meta["pdf_names"]
+            self._pdf_codes = {name: i for i, name in enumerate(self.pdf_names)}
+            self.codes = np.load(os.path.join(self.directory, "codes.npy"), mmap_mode="r")
+            self.vectors = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+            self.doc_pdf_codes = np.load(os.path.join(self.directory, "doc_pdf_codes.npy"))
+            quantizer = np.load(os.path.join(self.directory, "quantizer.npz"))
+            if self.method == "sq8":
+                self.offset = quantizer["offset"]
+                self.scale = quantizer["scale"]
+            else:
+                self.codebooks = quantizer["codebooks"]
+            return True
+        except Exception as e:
+            print(f"Error loading quantized index: {e}")
+            return False
@@ -124,38 +124,53 @@
 
 # query_processor.py
 import google.generativeai as genai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import re
+from itertools import product
+from drug_lexicon import DrugLexicon
+from section_segmenter import FDA_SECTIONS
+from context_packer import ContextPacker
+
+# Query phrasings that point at a label section, used to phrase sub-queries in the label's own terms
+SECTION_KEYWORDS = {
+    "DOSAGE AND ADMINISTRATION": ("dose", "dosing", "dosage", "administ", "regimen", "infusion rate"),
+    "ADVERSE REACTIONS": ("side effect", "adverse", "infusion reaction", "injection site reaction"),
+    "WARNINGS AND PRECAUTIONS": ("warning", "precaution", "risk of", "infection"),
+    "CONTRAINDICATIONS": ("contraindicat",),
+    "DRUG INTERACTIONS": ("interaction", "interact", "concomitant", "combined with"),
+    "USE IN SPECIFIC POPULATIONS": ("pregnan", "lactation", "pediatric", "children", "elderly", "geriatric",
+                                    "renal impairment", "hepatic impairment"),
+    "PHARMACOKINETICS": ("pharmacokinetic", "half-life", "half life", "clearance"),
+    "HOW SUPPLIED/STORAGE AND HANDLING": ("storage", "store ", "refrigerat", "supplied", "vial", "prefilled"),
+    "INDICATIONS AND USAGE": ("indicat", "used for", "approved for", "treat "),
+    "CLINICAL STUDIES": ("efficacy", "clinical stud", "trial"),
+}
+
+# Administration routes a question may contrast, with the abbreviations used in questions
+ROUTE_PATTERNS = {
+    "intravenous": re.compile(r'\b(iv|intravenous(ly)?)\b', re.IGNORECASE),
+    "subcutaneous": re.compile(r'\b(sc|subq|sub-q|subcutaneous(ly)?)\b', re.IGNORECASE),
+}
 
 class QueryProcessor:
     """Process queries and generate responses with proper citations"""
     
-    def __init__(self, gemini_api_key: str):
+    def __init__(self, gemini_api_key: str, drug_lexicon: Optional[DrugLexicon] = None,
+                 context_packer: Optional[ContextPacker] = None):
         genai.configure(api_key=gemini_api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Drug names of the ingested corpus; built during ingestion and stored with the vector DB
+        self.drug_lexicon = drug_lexicon
+        # Fits the retrieved chunks into the prompt token budget; None passes them through unchanged
+        self.context_packer = context_packer
     
     def analyze_query(self, query: str) -> Dict[str, Any]:
         """Analyze the query to determine optimal retrieval strategy"""
         query_lower = query.lower()
         
-        # Drug-specific queries
-        drug_keywords = {
-            'orencia': 'orencia', 
-            'simponi': 'simponi', 
-            'aria': 'aria',
-            'humira': 'humira', 
-            'enbrel': 'enbrel', 
-            'remicade': 'remicade', 
-            'keytruda': 'keytruda'
-        }
-        
-        mentioned_drugs = []
-        pdf_filter = None
-        
-        for drug, filter_term in drug_keywords.items():
-            if drug in query_lower:
-                mentioned_drugs.append(drug)
-                pdf_filter = filter_term  # Use the most specific match
+        # Drug-specific queries, matched on whole words against the corpus lexicon
+        mentioned_drugs = self.drug_lexicon.find(query) if self.drug_lexicon is not None else []
+        pdf_filter = mentioned_drugs[-1] if mentioned_drugs else None
         
         # Medical content queries
         medical_keywords = {
@@ -179,11 +194,73 @@ class QueryProcessor:
             "prefer_visual": is_visual_query
         }
     
-    def format_retrieved_info(self, retrieved_chunks: List[Dict[str, Any]]) -> str:
+    def expand_query(self, query: str, analysis: Dict[str, Any] = None, max_sub_queries: int = 4,
+                     use_llm: bool = False) -> List[Dict[str, Any]]:
+        """Decompose a query into focused sub-queries for separate retrieval.
+
+        Templates combine the drugs, administration routes and label sections the
+        query mentions, so "compare Orencia IV and SC dosing and their infusion
+        reactions" yields one sub-query per route and section. Optionally the LLM
+        adds paraphrases. Returns dicts with the sub-query text and the drugs to
+        restrict it to; the original query is not included.
+        """
+        analysis = analysis if analysis is not None else self.analyze_query(query)
+        query_lower = query.lower()
+        
+        mentioned_drugs = analysis.get("mentioned_drugs") or []
+        routes = [route for route, pattern in ROUTE_PATTERNS.items() if pattern.search(query)]
+        sections = [
+            section for section, keywords in SECTION_KEYWORDS.items()
+            if section in FDA_SECTIONS and any(keyword in query_lower for keyword in keywords)
+        ]
+        
+        sub_queries = []
+        # A single facet is what the original query already covers
+        if len(mentioned_drugs) > 1 or len(routes) > 1 or len(sections) > 1:
+            for drug, route, section in product(mentioned_drugs or [None], routes or [None], sections or [None]):
+                text = " ".join(part for part in (drug, route, section.lower() if section else None) if part)
+                if text:
+                    sub_queries.append({"query": text, "drugs": [drug] if drug else mentioned_drugs})
+        
+        if use_llm:
+            for text in self.llm_expand_query(query, max_sub_queries):
+                sub_queries.append({"query": text, "drugs": mentioned_drugs})
+        
+        # De-duplicate, keeping template sub-queries first
+        seen = {query_lower.strip()}
+        unique = []
+        for sub_query in sub_queries:
+            key = sub_query["query"].lower().strip()
+            if key not in seen:
+                seen.add(key)
+                unique.append(sub_query)
+        return unique[:max_sub_queries]
+    
+    def llm_expand_query(self, query: str, n: int = 3, timeout: float = 2.0) -> List[str]:
+        """Ask the LLM for short search queries covering the parts of a question"""
+        prompt = (
+            f"Rewrite the following question about FDA drug labels into at most {n} short, self-contained "
+            f"search queries, one per line, each covering one part of the question. "
+            f"Output only the queries.\n\nQuestion: {query}"
+        )
+        try:
+            response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+            lines = [re.sub(r'^\s*(\d+[.)]|[-*])\s*', '', line).strip() for line in response.text.splitlines()]
+            return [line for line in lines if line][:n]
+        except Exception as e:
+            print(f"Error expanding query with LLM: {e}")
+            return []
+    
+    def format_retrieved_info(self, retrieved_chunks: List[Dict[str, Any]], query: str = "") -> str:
         """Format retrieved information with proper citations"""
         if not retrieved_chunks:
             return "No relevant information found in the documents."
         
+        if self.context_packer is not None:
+            retrieved_chunks, stats = self.context_packer.pack(query, retrieved_chunks)
+            print(f"Packed {stats['packed_chunks']}/{stats['input_chunks']} chunks into {stats['packed_tokens']} "
+                  f"of {self.context_packer.token_budget} context tokens (from {stats['input_tokens']})")
+        
         formatted_info = "RETRIEVED INFORMATION WITH SOURCE CITATIONS:\n\n"
         
         for i, chunk in enumerate(retrieved_chunks, 1):
@@ -207,6 +284,14 @@ class QueryProcessor:
                 if chunk.get('image_index'):
                     citation_parts.append(f"Figure: {chunk['image_index']}")
             
+            # Identical passages from other labels are stored once and referenced here
+            if chunk.get('shared_sources'):
+                also_in = "; ".join(
+                    f"{source['pdf_name']} (Page {self._get_page_info(source)})"
+                    for source in chunk['shared_sources']
+                )
+                citation_parts.append(f"Also in: {also_in}")
+            
             citation = ", ".join(citation_parts)
             
             formatted_info += f"{i}. {citation}\nContent: {chunk['chunk_text']}\n\n"
@@ -215,20 +300,16 @@ class QueryProcessor:
     
     def _get_page_info(self, chunk: Dict[str, Any]) -> str:
         """Get appropriate page information for citation"""
-        # Prefer PDF page number if available
-        if chunk.get('pdf_page_number'):
-            return str(chunk['pdf_page_number'])
-        elif chunk.get('pdf_page_start') and chunk.get('pdf_page_end'):
-            if chunk['pdf_page_start'] == chunk['pdf_page_end']:
-                return str(chunk['pdf_page_start'])
-            else:
-                return f"{chunk['pdf_page_start']}-{chunk['pdf_page_end']}"
-        elif chunk.get('page_start') and chunk.get('page_end'):
-            if chunk['page_start'] == chunk['page_end']:
-                return str(chunk['page_start'])
-            else:
-                return f"{chunk['page_start']}-{chunk['page_end']}"
+        # Pages are resolved from the chunk's character offsets by the vector store
+        if chunk.get('page_start'):
+            return self._format_page_range(chunk['page_start'], chunk.get('page_end'))
         return "Unknown"
+    
+    def _format_page_range(self, page_start: Any, page_end: Any) -> str:
+        """Format a page range for a citation"""
+        if not page_end or page_start == page_end:
+            return str(page_start)
+        return f"{page_start}-{page_end}"
         
     def generate_response(self, user_query: str, retrieved_info: str) -> str:
         """Generate natural, conversational response using Gemini with proper source consolidation"""
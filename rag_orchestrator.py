@@ -223,11 +223,16 @@
 
 # rag_orchestrator.py
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import List, Dict, Any, TypedDict, Optional
 from langgraph.graph import StateGraph, END
 from pdf_processor import PDFProcessor
 from vector_db import EfficientVectorDB
 from query_processor import QueryProcessor
+from reranker import CrossEncoderReranker
+from context_packer import ContextPacker
 
 class RAGState(TypedDict):
     pdf_directory: str
@@ -244,12 +249,32 @@ class RAGState(TypedDict):
 class RAGOrchestrator:
     """Main orchestrator for the RAG system using LangGraph"""
     
-    def __init__(self, pdf_directory: str, gemini_api_key: str):
+    def __init__(self, pdf_directory: str, gemini_api_key: str, n_results: int = 10,
+                 candidate_pool: int = 30, use_reranker: bool = True, quantization: Optional[str] = None,
+                 serve_snapshot: bool = False, query_expansion: bool = True, llm_query_expansion: bool = False,
+                 expansion_budget_ms: float = 250.0, context_token_budget: Optional[int] = 3000):
         self.pdf_directory = pdf_directory
         self.gemini_api_key = gemini_api_key
+        self.n_results = n_results
+        # Sub-query results not ready this long after retrieval started are dropped
+        self.query_expansion = query_expansion
+        self.llm_query_expansion = llm_query_expansion
+        self.expansion_budget_ms = expansion_budget_ms
+        self._expansion_executor = ThreadPoolExecutor(max_workers=2) if query_expansion else None
+        # One slot per worker: when both are busy a query skips expansion instead of queueing behind them
+        self._expansion_slots = threading.BoundedSemaphore(2)
         self.pdf_processor = PDFProcessor(gemini_api_key)
-        self.vector_db = EfficientVectorDB()
-        self.query_processor = QueryProcessor(gemini_api_key)
+        self.vector_db = EfficientVectorDB(
+            candidate_pool=candidate_pool,
+            reranker=CrossEncoderReranker() if use_reranker else None,
+            quantization=quantization,
+            serve_snapshot=serve_snapshot
+        )
+        self.query_processor = QueryProcessor(
+            gemini_api_key,
+            drug_lexicon=self.vector_db.drug_index,
+            context_packer=ContextPacker(token_budget=context_token_budget) if context_token_budget else None
+        )
         self.workflow = self._create_workflow()
         self._ingestion_completed = False
     
@@ -290,6 +315,11 @@ class RAGOrchestrator:
     
     def _initialize_system(self, state: RAGState) -> dict:
         """Initialize the system"""
+        if not state["ingestion_mode"]:
+            # Queries reuse the open database; serving data is reloaded by the snapshot refresh only
+            db_initialized = self.vector_db.is_initialized() or self.vector_db.initialize(reset=False)
+            return {"pdf_files": [], "processed_pdfs": [], "db_initialized": db_initialized}
+        
         if not os.path.exists(state["pdf_directory"]):
             raise ValueError(f"Directory {state['pdf_directory']} does not exist")
         
@@ -297,6 +327,7 @@ class RAGOrchestrator:
         
         # Only reset DB if we're doing ingestion (when ingestion_mode is True)
         reset_db = state["ingestion_mode"]
+        # A fresh database also starts a fresh near-duplicate index
         db_initialized = self.vector_db.initialize(reset=reset_db)
         
         return {
@@ -327,7 +358,9 @@ class RAGOrchestrator:
             current_pdf = {
                 "name": pdf_file,
                 "index": pdf_index,
-                "documents": documents
+                "documents": documents,
+                "page_index": self.pdf_processor.page_indexes.get(pdf_file),
+                "tables": self.pdf_processor.table_records.get(pdf_file)
             }
             
             return {
@@ -345,9 +378,22 @@ class RAGOrchestrator:
             return {"processed_pdfs": state["processed_pdfs"]}
         
         current_pdf = state["current_pdf"]
-        success = self.vector_db.add_documents_batch(current_pdf["documents"])
+        
+        # Store passages shared with earlier labels once, with back-references
+        documents, canonical_updates = self.vector_db.near_duplicates.fold_duplicates(current_pdf["documents"])
+        folded = len(current_pdf["documents"]) - len(documents)
+        if folded:
+            print(f"Folded {folded} near-duplicate chunks from {current_pdf['name']} into existing passages")
+        if canonical_updates:
+            self.vector_db.update_metadatas(canonical_updates)
+        
+        success = self.vector_db.add_documents_batch(documents) if documents else True
         
         if success:
+            if current_pdf.get("page_index"):
+                self.vector_db.add_page_offsets(current_pdf["name"], *current_pdf["page_index"])
+            if current_pdf.get("tables"):
+                self.vector_db.add_tables(current_pdf["name"], current_pdf["tables"])
             processed_pdfs = state["processed_pdfs"] + [current_pdf]
             print(f"Successfully processed {current_pdf['name']}")
             return {"processed_pdfs": processed_pdfs}
@@ -360,24 +406,79 @@ class RAGOrchestrator:
         return {"query_analysis": self.query_processor.analyze_query(state["query"])}
     
     def _retrieve_information(self, state: RAGState) -> dict:
-        """Retrieve relevant information without filtering"""
+        """Retrieve relevant information, restricted to the labels of the drugs the query names"""
         if not state["db_initialized"]:
             return {"retrieved_chunks": []}
         
-        # Retrieve documents without any filtering
+        analysis = state.get("query_analysis") or {}
+        start = time.perf_counter()
+        
+        # Dosing rows matching a weight or CrCl in the question go first, ahead of the search results
+        table_rows = self.vector_db.lookup_table_rows(
+            state["query"],
+            drugs=analysis.get("mentioned_drugs"),
+            pdf_filter=analysis.get("pdf_filter")
+        )
+        
+        # Sub-queries are expanded and retrieved as one batch alongside the original query
+        expanded = None
+        deadline = start + self.expansion_budget_ms / 1000.0
+        if self.query_expansion and self._expansion_slots.acquire(blocking=False):
+            expanded = self._expansion_executor.submit(self._retrieve_sub_queries, state["query"], analysis, deadline)
+            expanded.add_done_callback(lambda _: self._expansion_slots.release())
+        
+        # Over-fetch a candidate pool, rerank it and keep the top n_results
         retrieved_chunks = self.vector_db.query(
             state["query"],
-            n_results=10  # Get more results for better context
+            n_results=self.n_results,
+            drugs=analysis.get("mentioned_drugs"),
+            pdf_filter=analysis.get("pdf_filter")
         )
         
-        # Return top results without additional filtering
-        return {"retrieved_chunks": retrieved_chunks[:15]}
+        if expanded is not None:
+            remaining = deadline - time.perf_counter()
+            try:
+                sub_results = expanded.result(timeout=max(remaining, 0.0))
+            except FutureTimeoutError:
+                print(f"Query expansion exceeded its {self.expansion_budget_ms:.0f} ms budget; using the original query only")
+                sub_results = []
+            if sub_results:
+                retrieved_chunks = self.vector_db.fuse_results([retrieved_chunks] + sub_results, self.n_results)
+        
+        return {"retrieved_chunks": self._with_table_rows(table_rows, retrieved_chunks)}
+    
+    @staticmethod
+    def _with_table_rows(table_rows: List[Dict[str, Any]], chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Looked-up table rows followed by the retrieved chunks that are not the same rows"""
+        if not table_rows:
+            return chunks
+        seen = {(row["pdf_name"], row.get("table_index"), row.get("row_index")) for row in table_rows}
+        return table_rows + [
+            chunk for chunk in chunks
+            if chunk.get("doc_type") != "table_row"
+            or (chunk.get("pdf_name"), chunk.get("table_index"), chunk.get("row_index")) not in seen
+        ]
+    
+    def _retrieve_sub_queries(self, user_query: str, analysis: Dict[str, Any],
+                              deadline: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """Result lists of the sub-queries of a query, retrieved as one batch; nothing once the deadline passed"""
+        try:
+            sub_queries = self.query_processor.expand_query(user_query, analysis, use_llm=self.llm_query_expansion)
+            # The caller stops waiting at the deadline, so later results would be discarded anyway
+            if not sub_queries or (deadline is not None and time.perf_counter() >= deadline):
+                return []
+            return self.vector_db.query_batch(
+                [sub_query["query"] for sub_query in sub_queries],
+                n_results=self.n_results,
+                drugs=[sub_query["drugs"] for sub_query in sub_queries]
+            )
+        except Exception as e:
+            print(f"Error retrieving expanded sub-queries: {e}")
+            return []
     
     def _generate_response(self, state: RAGState) -> dict:
         """Generate response"""
-        retrieved_info = self.query_processor.format_retrieved_info(state["retrieved_chunks"])
-        response = self.query_processor.generate_response(state["query"], retrieved_info)
-        return {"response": response}
+        return {"response": self._answer(state["query"], state["retrieved_chunks"])}
     
     def load_pdfs(self) -> dict:
         """Load all PDFs into the system (one-time ingestion)"""
@@ -395,6 +496,12 @@ class RAGOrchestrator:
         }
         
         result = self.workflow.invoke(initial_state)
+        self.vector_db.save_lexical_index()
+        self.vector_db.save_metadata_store()
+        self.vector_db.save_near_duplicates()
+        if self.vector_db.quantization:
+            self.vector_db.build_quantized_index()
+        self.vector_db.publish_snapshot()
         self._ingestion_completed = True
         print(f"Processing complete. Processed {len(result['processed_pdfs'])} PDF files")
         print(f"Total documents in database: {self.vector_db.get_document_count()}")
@@ -425,4 +532,46 @@ class RAGOrchestrator:
         }
         
         result = self.workflow.invoke(query_state)
-        return result["response"]
\ No newline at end of file
+        return result["response"]
+    
+    def query_batch(self, user_queries: List[str], batch_size: int = 32, max_concurrent_llm_calls: int = 4) -> List[str]:
+        """Answer many questions, e.g. for evaluation runs or reports.
+
+        Questions are retrieved `batch_size` at a time with one batched vector
+        search per chunk; response generation runs on a thread pool, so LLM calls
+        for one chunk overlap with retrieval of the next. Answers are returned in
+        the order of the questions.
+        """
+        if not self.vector_db.is_initialized():
+            if not self.vector_db.initialize(reset=False):
+                return ["Database not initialized. Please run ingestion first."] * len(user_queries)
+        
+        if self.vector_db.get_document_count() == 0:
+            return ["No documents found in database. Please run ingestion first."] * len(user_queries)
+        
+        with ThreadPoolExecutor(max_workers=max_concurrent_llm_calls) as executor:
+            futures = []
+            for start in range(0, len(user_queries), batch_size):
+                batch = user_queries[start:start + batch_size]
+                analyses = [self.query_processor.analyze_query(user_query) for user_query in batch]
+                table_rows = [
+                    self.vector_db.lookup_table_rows(
+                        user_query, drugs=analysis.get("mentioned_drugs"), pdf_filter=analysis.get("pdf_filter")
+                    )
+                    for user_query, analysis in zip(batch, analyses)
+                ]
+                searched = self.vector_db.query_batch(
+                    batch,
+                    n_results=self.n_results,
+                    drugs=[analysis.get("mentioned_drugs") for analysis in analyses],
+                    pdf_filters=[analysis.get("pdf_filter") for analysis in analyses]
+                )
+                retrieved = [self._with_table_rows(rows, chunks) for rows, chunks in zip(table_rows, searched)]
+                for user_query, retrieved_chunks in zip(batch, retrieved):
+                    futures.append(executor.submit(self._answer, user_query, retrieved_chunks))
+            return [future.result() for future in futures]
+    
+    def _answer(self, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> str:
+        """Generate the response to one question from its retrieved chunks"""
+        retrieved_info = self.query_processor.format_retrieved_info(retrieved_chunks, query=user_query)
+        return self.query_processor.generate_response(user_query, retrieved_info)
\ No newline at end of file
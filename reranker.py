@@ -0,0 +1,107 @@
+import time
+from typing import List, Dict, Any, Tuple
+
+
+class CrossEncoderReranker:
+    """Reranks retrieved chunks with a small cross-encoder running on CPU.
+
+    Candidates arrive sorted by the heuristic relevance score and are scored in
+    batches, best first. When the time budget would be exceeded, the remaining
+    candidates keep their heuristic order behind the reranked ones.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16,
+                 time_budget_ms: float = 300.0, max_length: int = 256):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.time_budget_ms = time_budget_ms
+        self.max_length = max_length
+        self.model = None
+        self._initialize_model()
+
+    def _initialize_model(self):
+        """Load the cross-encoder"""
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+            print(f"Cross-encoder reranker {self.model_name} loaded")
+        except Exception as e:
+            print(f"Failed to load cross-encoder {self.model_name}: {e}")
+            print("Falling back to heuristic ranking")
+            self.model = None
+
+    def is_available(self) -> bool:
+        """Check if the cross-encoder was loaded"""
+        return self.model is not None
+
+    def _score_pairs(self, pairs: List[Tuple[str, str]], budget_ms: float) -> List[float]:
+        """Cross-encoder scores of the longest prefix of pairs that fits in the time budget"""
+        start = time.perf_counter()
+        budget = budget_ms / 1000.0
+        scores = []
+        batch_time = 0.0
+        for i in range(0, len(pairs), self.batch_size):
+            elapsed = time.perf_counter() - start
+            # Stop before a batch that would likely overrun the budget
+            if elapsed + batch_time > budget:
+                break
+            batch_start = time.perf_counter()
+            try:
+                batch_scores = self.model.predict(
+                    pairs[i:i + self.batch_size],
+                    batch_size=self.batch_size,
+                    show_progress_bar=False
+                )
+            except Exception as e:
+                print(f"Error reranking candidates: {e}")
+                break
+            batch_time = time.perf_counter() - batch_start
+            scores.extend(float(score) for score in batch_scores)
+
+        if len(scores) < len(pairs):
+            print(f"Reranking budget of {budget_ms:.0f} ms reached after {len(scores)}/{len(pairs)} candidates")
+        return scores
+
+    @staticmethod
+    def _apply_scores(results: List[Dict[str, Any]], scores: List[float], n_results: int) -> List[Dict[str, Any]]:
+        """Sort the scored prefix by rerank score; the unscored tail keeps its heuristic order"""
+        reranked = results[:len(scores)]
+        for result, score in zip(reranked, scores):
+            result["rerank_score"] = score
+        reranked = sorted(reranked, key=lambda result: result["rerank_score"], reverse=True)
+        return (reranked + results[len(scores):])[:n_results]
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """Return the top n_results of heuristically ranked results after cross-encoder reranking"""
+        if self.model is None or len(results) <= 1:
+            return results[:n_results]
+
+        scores = self._score_pairs([(query, result["chunk_text"]) for result in results], self.time_budget_ms)
+        return self._apply_scores(results, scores, n_results)
+
+    def rerank_batch(self, queries: List[str], results_lists: List[List[Dict[str, Any]]],
+                     n_results: int) -> List[List[Dict[str, Any]]]:
+        """Rerank the candidates of many queries with shared model batches.
+
+        Pairs are interleaved by candidate rank, so when the combined budget
+        (time_budget_ms per query) runs out every query has had its best
+        candidates scored.
+        """
+        if self.model is None:
+            return [results[:n_results] for results in results_lists]
+
+        positions = []
+        for rank in range(max([len(results) for results in results_lists] + [0])):
+            for q, results in enumerate(results_lists):
+                if rank < len(results):
+                    positions.append((q, rank))
+        pairs = [(queries[q], results_lists[q][rank]["chunk_text"]) for q, rank in positions]
+        scores = self._score_pairs(pairs, self.time_budget_ms * len(queries))
+
+        scores_by_query = [[] for _ in queries]
+        for (q, rank), score in zip(positions, scores):
+            scores_by_query[q].append(score)
+        return [
+            self._apply_scores(results, query_scores, n_results)
+            for results, query_scores in zip(results_lists, scores_by_query)
+        ]
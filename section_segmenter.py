@@ -0,0 +1,132 @@
+import re
+from typing import List, Dict, Any, Iterable, Optional
+
+FDA_SECTIONS = [
+    "BOXED WARNING", "INDICATIONS AND USAGE", "DOSAGE AND ADMINISTRATION",
+    "CONTRAINDICATIONS", "WARNINGS AND PRECAUTIONS", "ADVERSE REACTIONS",
+    "DRUG INTERACTIONS", "USE IN SPECIFIC POPULATIONS", "PATIENT COUNSELING INFORMATION",
+    "CLINICAL PHARMACOLOGY", "HOW SUPPLIED/STORAGE AND HANDLING", "MEDICATION GUIDE",
+    "DESCRIPTION", "CLINICAL STUDIES", "MECHANISM OF ACTION", "PHARMACOKINETICS",
+    "NONCLINICAL TOXICOLOGY", "CLINICAL TRIALS"
+]
+
+TEXT_ELEMENT_TYPES = ("CompositeElement", "TextElement")
+
+
+class SectionSegmenter:
+    """Single-pass section segmenter over extracted text elements.
+
+    Lines are classified with one compiled heading regex and section bodies are
+    accumulated in list buffers, so the work is linear in the document size.
+    Page boundaries are kept as structured `page_offsets` (character offset into
+    the section content, page number) instead of injected page marker lines.
+    `doc_offset` places each section in a document-wide character space where
+    sections follow each other separated by one character.
+    """
+
+    def __init__(self, fda_sections: List[str] = None, min_fda_sections: int = 3,
+                 max_heading_length: int = 100):
+        self.fda_sections = list(fda_sections or FDA_SECTIONS)
+        self.min_fda_sections = min_fda_sections
+        self.max_heading_length = max_heading_length
+
+        names = '|'.join(re.escape(section) for section in self.fda_sections)
+        # FDA section names match case-insensitively, generic headings must be upper case
+        self.heading_pattern = re.compile(
+            r'^\s*(?:(?P<fda>(?i:' + names + r'))|(?P<heading>[A-Z][A-Z\s\-]+(?:\.|:)?))\s*$'
+        )
+        self.fda_name_pattern = re.compile(names, re.IGNORECASE)
+
+    def is_fda_format(self, texts: Iterable[str]) -> bool:
+        """Check whether enough distinct FDA section names occur in the texts"""
+        found = set()
+        for text in texts:
+            for match in self.fda_name_pattern.finditer(text):
+                found.add(match.group(0).upper())
+                if len(found) >= self.min_fda_sections:
+                    return True
+        return False
+
+    def _is_heading(self, line: str, is_fda: bool) -> bool:
+        if len(line) > self.max_heading_length + 20:
+            return False
+        match = self.heading_pattern.match(line)
+        if not match:
+            return False
+        if is_fda:
+            return match.group("fda") is not None
+        return len(line.strip()) < self.max_heading_length and (
+            match.group("heading") is not None or line.strip().isupper()
+        )
+
+    def segment(self, elements: List[Dict[str, Any]],
+                state: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Split text elements into sections with page offsets.
+
+        For a document segmented in parts, `state` carries the open section and
+        the FDA format decision from one part to the next; it is updated in place.
+        """
+        state = state if state is not None else {}
+        text_elements = [
+            e for e in elements
+            if e["type"] in TEXT_ELEMENT_TYPES and e["text"].strip()
+        ]
+        if not text_elements:
+            return []
+
+        # Stable sort keeps reading order within a page
+        text_elements.sort(key=lambda e: e["page_number"])
+        is_fda = state.get("is_fda")
+        if is_fda is None:
+            is_fda = self.is_fda_format(e["text"] for e in text_elements)
+
+        sections = []
+        current_section = state.get("section", "INTRODUCTION")
+        buffer = []
+        buffer_length = 0
+        page_offsets = []
+        document_length = 0
+
+        def flush():
+            nonlocal document_length
+            content = "\n".join(buffer).rstrip()
+            if not content:
+                return
+            offsets = [(offset, page) for offset, page in page_offsets if offset < len(content)]
+            pages = [page for _, page in offsets]
+            sections.append({
+                "section": current_section,
+                "content": content,
+                "page_start": min(pages),
+                "page_end": max(pages),
+                "page_offsets": offsets,
+                "doc_offset": document_length,
+                "is_fda": is_fda
+            })
+            document_length += len(content) + 1
+
+        for element in text_elements:
+            page = element["page_number"]
+            for line in element["text"].split("\n"):
+                if self._is_heading(line, is_fda):
+                    flush()
+                    current_section = line.strip().upper()
+                    buffer = []
+                    buffer_length = 0
+                    page_offsets = []
+                    continue
+
+                if not buffer:
+                    line = line.lstrip()
+                    if not line:
+                        continue
+
+                if not page_offsets or page_offsets[-1][1] != page:
+                    page_offsets.append((buffer_length, page))
+                buffer.append(line)
+                buffer_length += len(line) + 1
+
+        flush()
+        state["is_fda"] = is_fda
+        state["section"] = current_section
+        return sections
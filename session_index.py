@@ -0,0 +1,237 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator
+import numpy as np
+from vector_db import EfficientVectorDB
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, the key of its extraction cache entry"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Extraction results of uploaded PDFs on disk, keyed by file content.
+
+    An entry holds the prepared documents (before session metadata is added),
+    the structured tables, the page offset index, the paths of the extracted
+    images (removed with the entry) and the chunk embeddings, so
+    a re-uploaded file or an evicted session is restored without running the
+    extraction pipeline or the embedding model again.
+    """
+
+    def __init__(self, directory: str = "./temp_uploads/extraction_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        return os.path.join(self.directory, f"{key}.json"), os.path.join(self.directory, f"{key}.npy")
+
+    def __contains__(self, key: str) -> bool:
+        return all(os.path.exists(path) for path in self._paths(key))
+
+    def save(self, key: str, entry: Dict[str, Any], embeddings: np.ndarray) -> bool:
+        """Persist an entry: documents, tables, page_index and pages_total, plus the embeddings"""
+        entry_path, embeddings_path = self._paths(key)
+        try:
+            np.save(embeddings_path, np.asarray(embeddings, dtype=np.float32))
+            with open(entry_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            return True
+        except Exception as e:
+            print(f"Error saving extraction cache entry {key}: {e}")
+            return False
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached entry with its embeddings under "embeddings", or None"""
+        if key not in self:
+            return None
+        entry_path, embeddings_path = self._paths(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["embeddings"] = np.load(embeddings_path)
+            return entry
+        except Exception as e:
+            print(f"Error loading extraction cache entry {key}: {e}")
+            return None
+
+    def _images(self, key: str) -> List[str]:
+        try:
+            with open(self._paths(key)[0], "r", encoding="utf-8") as f:
+                return json.load(f).get("images", [])
+        except Exception:
+            return []
+
+    def size(self, key: str) -> int:
+        """Bytes on disk of an entry, including its extracted images"""
+        paths = list(self._paths(key)) + self._images(key)
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def remove(self, key: str) -> int:
+        """Delete an entry and its extracted images; returns the bytes freed"""
+        freed = 0
+        for path in self._images(key) + list(self._paths(key)):
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+                os.remove(path)
+        return freed
+
+
+class SessionIndex:
+    """One in-memory vector index per upload session, with LRU eviction.
+
+    Each session's chunks live in their own exact-search `EfficientVectorDB`,
+    so a session query scans only that session's vectors and never touches
+    disk or other sessions. When more than `max_sessions` indexes are held or
+    their estimated memory exceeds `memory_budget_mb`, the least recently used
+    sessions are evicted. The files of a session are remembered by extraction
+    cache key, so an evicted session is rebuilt from the cache on its next use.
+    Sessions in use (`open` blocks) are never evicted.
+    """
+
+    def __init__(self, cache: ExtractionCache, max_sessions: int = 32, memory_budget_mb: int = 512,
+                 embedding_function: Optional[Callable[[List[str]], Any]] = None):
+        self.cache = cache
+        self.max_sessions = max_sessions
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.embedding_function = embedding_function
+        self._indexes = OrderedDict()  # session_id -> EfficientVectorDB, least recently used first
+        self._files = {}               # session_id -> [(cache key, filename)]
+        self._pins = {}                # session_id -> number of open users
+        self._building = {}            # session_id -> lock held while its index is rebuilt
+        self._lock = threading.RLock()
+
+    def _create(self) -> EfficientVectorDB:
+        db = EfficientVectorDB(persist_directory=None, hybrid_search=False, embedding_function=self.embedding_function)
+        db.initialize(reset=False)
+        # Every session shares the first index's embedding model
+        self.embedding_function = db.embedding_function
+        return db
+
+    def _restore(self, db: EfficientVectorDB, session_id: str, key: str, filename: str) -> tuple:
+        """Add a cached file to an index; returns (documents restored, pages of the file)"""
+        entry = self.cache.load(key)
+        if entry is None:
+            return 0, 0
+        for doc in entry["documents"]:
+            doc["metadata"]["session_id"] = session_id
+            doc["metadata"]["filename"] = filename
+        if entry["documents"]:
+            db.add_documents_batch(entry["documents"], embeddings=entry["embeddings"])
+        if entry.get("page_index"):
+            db.add_page_offsets(entry["pdf_name"], *entry["page_index"])
+        if entry.get("tables"):
+            db.add_tables(entry["pdf_name"], entry["tables"])
+        return len(entry["documents"]), entry.get("pages_total", 0)
+
+    def _pin(self, session_id: str, create: bool) -> Optional[EfficientVectorDB]:
+        """Pin the session's index, building it if needed; other sessions are not blocked by a rebuild"""
+        with self._lock:
+            db = self._indexes.get(session_id)
+            if db is None and not (create or session_id in self._files):
+                return None
+            if db is not None:
+                self._indexes.move_to_end(session_id)
+                self._pins[session_id] = self._pins.get(session_id, 0) + 1
+                return db
+            build_lock = self._building.setdefault(session_id, threading.Lock())
+        
+        # Only users of the same session wait for its rebuild
+        with build_lock:
+            with self._lock:
+                db = self._indexes.get(session_id)
+                files = list(self._files.get(session_id, []))
+            if db is None:
+                db = self._create()
+                for key, filename in files:
+                    self._restore(db, session_id, key, filename)
+            with self._lock:
+                db = self._indexes.setdefault(session_id, db)
+                self._building.pop(session_id, None)
+                self._indexes.move_to_end(session_id)
+                self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        return db
+
+    @contextmanager
+    def open(self, session_id: str, create: bool = True) -> Iterator[Optional[EfficientVectorDB]]:
+        """The session's index, rebuilt from the extraction cache if it was evicted; pinned while open"""
+        db = self._pin(session_id, create)
+        try:
+            yield db
+        finally:
+            if db is not None:
+                with self._lock:
+                    self._pins[session_id] -= 1
+                    if not self._pins[session_id]:
+                        del self._pins[session_id]
+                    self._evict()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_function is None:
+            with self._lock:
+                if self.embedding_function is None:
+                    self._create()
+        return np.asarray(self.embedding_function(texts), dtype=np.float32)
+
+    def register_file(self, session_id: str, key: str, filename: str):
+        """Remember a fully extracted file of a session, for rebuilding after eviction"""
+        with self._lock:
+            files = self._files.setdefault(session_id, [])
+            if (key, filename) not in files:
+                files.append((key, filename))
+
+    def restore_file(self, session_id: str, key: str, filename: str) -> tuple:
+        """Add a cached file to a session; returns (documents restored, pages of the file)"""
+        with self.open(session_id) as db:
+            count, pages_total = self._restore(db, session_id, key, filename)
+        if count:
+            self.register_file(session_id, key, filename)
+        return count, pages_total
+
+    def forget_file(self, session_id: str, key: str):
+        """Stop rebuilding a session from a cache entry that was removed"""
+        with self._lock:
+            files = self._files.get(session_id)
+            if files:
+                self._files[session_id] = [(file_key, name) for file_key, name in files if file_key != key]
+
+    def files(self, session_id: str) -> List[tuple]:
+        with self._lock:
+            return list(self._files.get(session_id, []))
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(db.collection.memory_bytes() for db in self._indexes.values())
+
+    def _evict(self):
+        """Drop least recently used, unpinned indexes until both limits hold"""
+        total = sum(db.collection.memory_bytes() for db in self._indexes.values())
+        for session_id in list(self._indexes):
+            if len(self._indexes) <= self.max_sessions and total <= self.memory_budget_bytes:
+                break
+            if session_id in self._pins:
+                continue
+            db = self._indexes.pop(session_id)
+            total -= db.collection.memory_bytes()
+            print(f"Evicted session index {session_id} ({len(self._indexes)} sessions in memory)")
+
+    def drop(self, session_id: str) -> int:
+        """Forget a session entirely; returns the number of chunks it held in memory"""
+        with self._lock:
+            db = self._indexes.pop(session_id, None)
+            self._files.pop(session_id, None)
+            return db.get_document_count() if db is not None else 0
+
+    def sessions(self) -> List[str]:
+        """Sessions with an index in memory or files to rebuild one from"""
+        with self._lock:
+            return list(dict.fromkeys(list(self._indexes) + list(self._files)))
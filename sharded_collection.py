@@ -0,0 +1,219 @@
+import heapq
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Optional, Set
+from drug_index import drug_key
+from exact_search import ExactSearchCollection
+
+SHARD_PREFIX = "shard_"
+
+
+def shard_collection_name(shard_key: str) -> str:
+    """Valid Chroma collection name of a shard (3-63 chars of [a-z0-9_])"""
+    slug = re.sub(r'[^a-z0-9]+', '_', shard_key.lower()).strip('_')[:40] or "default"
+    return f"{SHARD_PREFIX}{slug}_{zlib.crc32(shard_key.encode('utf-8')):08x}"
+
+
+class ShardedCollection:
+    """Chroma collections partitioned by drug, behind the single-collection interface.
+
+    Every chunk is stored in the shard of its `drug` partition key, or of a hash
+    group of drugs when `num_groups` is set. Each shard has its own HNSW index,
+    so it can be dropped and rebuilt without touching the others. Queries whose
+    `where` filter names documents or drugs only search those shards; other
+    queries fan out to all shards in parallel and the per-shard top-k lists
+    are k-way merged by distance. Shards with at most `exact_search_threshold`
+    chunks are searched exactly from an in-memory copy instead of their HNSW index.
+    """
+
+    def __init__(self, client: Any, metadata: Dict[str, Any], num_groups: Optional[int] = None,
+                 max_workers: int = 8, embedding_function: Optional[Any] = None,
+                 exact_search_threshold: int = 0):
+        self.client = client
+        self.metadata = metadata
+        self.num_groups = num_groups
+        self.embedding_function = embedding_function
+        self.exact_search_threshold = exact_search_threshold if embedding_function is not None else 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.shards = {}  # shard key -> chroma collection
+        self._exact_shards = {}  # shard key -> in-memory copy of a small shard
+        self._large_shards = set()
+        self._load_shards()
+
+    def _load_shards(self):
+        """Open the shards that already exist in the client"""
+        for collection in self.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if not name.startswith(SHARD_PREFIX):
+                continue
+            shard = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+            shard_key = (shard.metadata or {}).get("shard_key")
+            if shard_key:
+                self.shards[shard_key] = shard
+
+    def shard_key(self, drug: str) -> str:
+        """Shard of a drug partition key"""
+        if self.num_groups:
+            return f"group_{zlib.crc32(drug.encode('utf-8')) % self.num_groups:04d}"
+        return drug
+
+    def _get_or_create_shard(self, shard_key: str) -> Any:
+        shard = self.shards.get(shard_key)
+        if shard is None:
+            shard = self.client.get_or_create_collection(
+                name=shard_collection_name(shard_key),
+                metadata={**self.metadata, "shard_key": shard_key},
+                embedding_function=self.embedding_function
+            )
+            self.shards[shard_key] = shard
+        return shard
+
+    def _invalidate(self, shard_key: str):
+        """Forget the cached search backend of a shard after it changed"""
+        self._exact_shards.pop(shard_key, None)
+        self._large_shards.discard(shard_key)
+
+    def _searcher(self, shard_key: str) -> Any:
+        """Exact in-memory copy for small shards, the HNSW-backed collection otherwise"""
+        shard = self.shards[shard_key]
+        if not self.exact_search_threshold or shard_key in self._large_shards:
+            return shard
+        exact = self._exact_shards.get(shard_key)
+        if exact is None:
+            if shard.count() > self.exact_search_threshold:
+                self._large_shards.add(shard_key)
+                return shard
+            exact = self._exact_shards[shard_key] = ExactSearchCollection.from_collection(shard, self.embedding_function)
+        return exact
+
+    def _route_keys(self, where: Optional[Dict[str, Any]]) -> List[str]:
+        """Keys of the shards that can hold documents matching a where filter"""
+        keys = self._filter_shard_keys(where) if where else None
+        if keys is None:
+            return list(self.shards)
+        return [key for key in keys if key in self.shards]
+
+    def _filter_shard_keys(self, where: Dict[str, Any]) -> Optional[Set[str]]:
+        """Shard keys implied by pdf_name/drug equality conditions, or None if unrestricted"""
+        for field, condition in where.items():
+            if field == "$and":
+                for clause in condition:
+                    keys = self._filter_shard_keys(clause)
+                    if keys is not None:
+                        return keys
+                continue
+            if field not in ("pdf_name", "drug"):
+                continue
+            if isinstance(condition, dict):
+                values = condition.get("$in") or ([condition["$eq"]] if "$eq" in condition else None)
+            else:
+                values = [condition]
+            if values is None:
+                continue
+            drugs = [drug_key(value) if field == "pdf_name" else value for value in values]
+            return {self.shard_key(drug) for drug in drugs}
+        return None
+
+    def drop_shard(self, shard_key: str) -> bool:
+        """Delete a shard collection so it can be rebuilt"""
+        if shard_key not in self.shards:
+            return False
+        self.client.delete_collection(name=shard_collection_name(shard_key))
+        del self.shards[shard_key]
+        self._invalidate(shard_key)
+        return True
+
+    def add(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
+        """Add documents to the shard of their drug"""
+        batches = {}
+        for document, metadata, doc_id in zip(documents, metadatas, ids):
+            batch = batches.setdefault(self.shard_key(metadata.get("drug", "unknown")), ([], [], []))
+            batch[0].append(document)
+            batch[1].append(metadata)
+            batch[2].append(doc_id)
+        for shard_key, (shard_documents, shard_metadatas, shard_ids) in batches.items():
+            self._get_or_create_shard(shard_key).add(
+                documents=shard_documents, metadatas=shard_metadatas, ids=shard_ids
+            )
+            self._invalidate(shard_key)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Update metadata in the shard of each document"""
+        batches = {}
+        for doc_id, metadata in zip(ids, metadatas):
+            batch = batches.setdefault(self.shard_key(metadata.get("drug", "unknown")), ([], []))
+            batch[0].append(doc_id)
+            batch[1].append(metadata)
+        for shard_key, (shard_ids, shard_metadatas) in batches.items():
+            if shard_key in self.shards:
+                self.shards[shard_key].update(ids=shard_ids, metadatas=shard_metadatas)
+                self._invalidate(shard_key)
+
+    def count(self) -> int:
+        return sum(shard.count() for shard in self.shards.values())
+
+    def query(self, query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, query_embeddings: Optional[Any] = None,
+              **kwargs) -> Dict[str, Any]:
+        """Search the routed shards in parallel and merge their top-k by distance"""
+        shard_keys = self._route_keys(where)
+        num_queries = len(query_embeddings) if query_embeddings is not None else len(query_texts)
+        empty = {"ids": [[] for _ in range(num_queries)], "documents": [[] for _ in range(num_queries)],
+                 "metadatas": [[] for _ in range(num_queries)], "distances": [[] for _ in range(num_queries)]}
+        if not shard_keys:
+            return empty
+
+        # Embed once for all shards
+        if query_embeddings is None and self.embedding_function is not None:
+            query_embeddings = self.embedding_function(query_texts)
+        if query_embeddings is not None:
+            kwargs["query_embeddings"] = [list(map(float, embedding)) for embedding in query_embeddings]
+        else:
+            kwargs["query_texts"] = query_texts
+
+        def search(shard_key):
+            return self._searcher(shard_key).query(n_results=n_results, where=where, **kwargs)
+
+        shard_results = list(self.executor.map(search, shard_keys))
+
+        merged = empty
+        for q in range(num_queries):
+            # Each shard returns hits sorted by distance; merge them lazily
+            streams = [
+                zip(result["distances"][q], result["ids"][q], result["documents"][q], result["metadatas"][q])
+                for result in shard_results
+            ]
+            for distance, doc_id, document, metadata in islice(heapq.merge(*streams, key=lambda hit: hit[0]), n_results):
+                merged["ids"][q].append(doc_id)
+                merged["documents"][q].append(document)
+                merged["metadatas"][q].append(metadata)
+                merged["distances"][q].append(distance)
+        return merged
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fetch documents from all routed shards"""
+        kwargs = {"ids": ids, "where": where}
+        if include is not None:
+            kwargs["include"] = include
+        results = list(self.executor.map(lambda key: self.shards[key].get(**kwargs), self._route_keys(where)))
+
+        merged = {"ids": [], "documents": [], "metadatas": []}
+        if include and "embeddings" in include:
+            merged["embeddings"] = []
+        for result in results:
+            merged["ids"].extend(result["ids"])
+            merged["documents"].extend(result.get("documents") or [None] * len(result["ids"]))
+            merged["metadatas"].extend(result.get("metadatas") or [None] * len(result["ids"]))
+            if "embeddings" in merged:
+                merged["embeddings"].extend(result["embeddings"])
+        return merged
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Delete documents from all routed shards"""
+        shard_keys = self._route_keys(where)
+        list(self.executor.map(lambda key: self.shards[key].delete(ids=ids, where=where), shard_keys))
+        for shard_key in shard_keys:
+            self._invalidate(shard_key)
@@ -0,0 +1,81 @@
+import csv
+import io
+from typing import List, Any, Optional
+
+TABLE_FORMATS = ("sentences", "markdown", "csv")
+
+
+def _column_names(headers: List[str], width: int) -> List[str]:
+    """Header of every column, with a positional name for empty headers"""
+    return [headers[j] if j < len(headers) and headers[j] else f"Column_{j + 1}" for j in range(width)]
+
+
+def render_row(headers: List[str], row: List[str], table_index: Optional[int] = None,
+               page_number: Optional[int] = None) -> str:
+    """Self-contained text of one table row, for embedding and for the prompt"""
+    names = _column_names(headers, len(row))
+    cells = ", ".join(f"{names[j]}: {cell.strip()}" for j, cell in enumerate(row) if cell and cell.strip())
+    prefix = f"Table {table_index}" if table_index is not None else "Table"
+    if page_number is not None:
+        prefix += f" (page {page_number})"
+    return f"{prefix}: {cells}."
+
+
+def render_sentences(headers: List[str], rows: List[List[str]], page_number: Optional[int] = None) -> str:
+    """"Row i: Header: cell, ..." sentences; cells without a header are left out"""
+    names = _column_names(headers, len(headers))
+    width = len(names)
+    parts = [f"Table from page {page_number}."]
+    if headers:
+        parts.append(f"Headers: {', '.join(header for header in headers if header)}.")
+    for i, row in enumerate(rows):
+        cells = ", ".join(f"{names[j]}: {cell}" for j, cell in enumerate(row[:width]) if cell and cell.strip())
+        if cells:
+            parts.append(f"Row {i + 1}: {cells}.")
+    return " ".join(parts)
+
+
+def _markdown_cell(cell: Any) -> str:
+    return str(cell if cell is not None else "").replace("|", "\\|").replace("\n", " ").strip()
+
+
+def render_markdown(headers: List[str], rows: List[List[str]]) -> str:
+    """GitHub-style markdown table"""
+    width = max([len(headers)] + [len(row) for row in rows])
+    names = [_markdown_cell(name) for name in _column_names(headers, width)]
+    lines = ["| " + " | ".join(names) + " |", "|" + "---|" * width]
+    padding = [""] * width
+    lines.extend(
+        "| " + " | ".join(_markdown_cell(cell) for cell in (list(row) + padding)[:width]) + " |"
+        for row in rows if any(cell and str(cell).strip() for cell in row)
+    )
+    return "\n".join(lines)
+
+
+def render_csv(headers: List[str], rows: List[List[str]]) -> str:
+    """Compact CSV: header line, then one line per non-empty row, quoting only where needed"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if headers:
+        writer.writerow(headers)
+    writer.writerows(row for row in rows if any(cell and str(cell).strip() for cell in row))
+    return buffer.getvalue().rstrip("\n")
+
+
+def render_table(headers: List[str], rows: List[List[str]], fmt: str = "sentences",
+                 page_number: Optional[int] = None) -> str:
+    """Text of a whole table in one of TABLE_FORMATS"""
+    if fmt == "sentences":
+        return render_sentences(headers, rows, page_number)
+    if fmt == "markdown":
+        return render_markdown(headers, rows)
+    if fmt == "csv":
+        return render_csv(headers, rows)
+    raise ValueError(f"Unknown table format {fmt}; expected one of {TABLE_FORMATS}")
+
+
+def dataframe_rows(df: Any) -> List[List[str]]:
+    """All cells of a DataFrame as lists of strings, converted in one vectorized step"""
+    if df.empty:
+        return []
+    return df.fillna("").astype(str).values.tolist()
@@ -0,0 +1,148 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+from table_render import render_table
+
+_PLACEHOLDER_HEADER = re.compile(r'^Column_\d+$')
+_DIGITS = re.compile(r'\d+(?:[.,]\d+)*')
+_LETTERS = re.compile(r'[^\W\d_]+')
+
+
+def _header_terms(headers: List[str]) -> set:
+    return {word.lower() for header in headers for word in re.findall(r'\w+', header or "")}
+
+
+def header_similarity(headers: List[str], other: List[str]) -> float:
+    """Jaccard similarity of the words of two header rows"""
+    terms, other_terms = _header_terms(headers), _header_terms(other)
+    if not terms and not other_terms:
+        return 1.0
+    return len(terms & other_terms) / max(len(terms | other_terms), 1)
+
+
+def _has_header(headers: List[str]) -> bool:
+    return any(header and header.strip() and not _PLACEHOLDER_HEADER.match(header.strip()) for header in headers)
+
+
+def _cell_shape(cell: str) -> str:
+    """Coarse shape of a cell: digit runs become 0 and letter runs become a"""
+    return _LETTERS.sub("a", _DIGITS.sub("0", (cell or "").strip().lower()))
+
+
+def _looks_like_data(row: List[str], reference: List[str]) -> bool:
+    """True if a row has the cell shapes of a reference data row"""
+    pairs = [(a, b) for a, b in zip(row, reference) if (a and a.strip()) or (b and b.strip())]
+    if not pairs:
+        return False
+    return sum(1 for a, b in pairs if _cell_shape(a) == _cell_shape(b)) * 2 >= len(pairs)
+
+
+def _same_geometry(bounds: Optional[List[Tuple[float, float]]], other: Optional[List[Tuple[float, float]]],
+                   tolerance: float) -> Optional[bool]:
+    """Compare column boundaries relative to the table width; None when either is unknown"""
+    if not bounds or not other:
+        return None
+    if len(bounds) != len(other):
+        return False
+
+    def relative(columns):
+        left, right = columns[0][0], columns[-1][1]
+        width = max(right - left, 1e-9)
+        return [((x0 - left) / width, (x1 - left) / width) for x0, x1 in columns]
+
+    return all(
+        abs(a0 - b0) <= tolerance and abs(a1 - b1) <= tolerance
+        for (a0, a1), (b0, b1) in zip(relative(bounds), relative(other))
+    )
+
+
+def _is_continuation(table: Dict[str, Any], fragment: Dict[str, Any], header_threshold: float,
+                     geometry_tolerance: float) -> Optional[str]:
+    """How a fragment continues a table: "repeated_header", "headerless" or None"""
+    data, other = table["table_data"], fragment["table_data"]
+    if fragment["page_number"] != table["page_end"] + 1:
+        return None
+    if data.get("col_count") and other.get("col_count") and data["col_count"] != other["col_count"]:
+        return None
+    if _same_geometry(table.get("column_bounds"), fragment.get("column_bounds"), geometry_tolerance) is False:
+        return None
+
+    if _has_header(other["headers"]):
+        if _has_header(data["headers"]) and header_similarity(data["headers"], other["headers"]) >= header_threshold:
+            return "repeated_header"
+        # A "header" row that is shaped like the table's data is the first continued row
+        if data["data"] and _looks_like_data(other["headers"], data["data"][-1]):
+            return "headerless"
+        return None
+    return "headerless"
+
+
+def stitch_table_fragments(tables: List[Dict[str, Any]], header_threshold: float = 0.8,
+                           geometry_tolerance: float = 0.05) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Merge table fragments that continue across page breaks.
+
+    Fragments are considered per extractor, in page order. A fragment continues
+    the previous table when it is the first table of the next page, the previous
+    table was the last of its page, the column counts (and, when known, the
+    relative column boundaries) agree, and its header row either repeats the
+    table header or is shaped like a data row. Returns the stitched tables and
+    a report of the merges.
+    """
+    groups = {}
+    for position, table in enumerate(tables):
+        groups.setdefault(table.get("extractor", ""), []).append((position, table))
+
+    stitched = []
+    merges = 0
+    for _, members in groups.items():
+        members.sort(key=lambda member: (member[1]["page_number"], member[0]))
+        first_on_page = {}
+        last_on_page = {}
+        for position, table in members:
+            first_on_page.setdefault(table["page_number"], position)
+            last_on_page[table["page_number"]] = position
+
+        current = None
+        for position, table in members:
+            kind = None
+            if (current is not None and last_on_page.get(current["page_end"]) == current["_last_position"]
+                    and first_on_page.get(table["page_number"]) == position):
+                kind = _is_continuation(current, table, header_threshold, geometry_tolerance)
+
+            rows = [list(row) for row in table["table_data"]["data"]]
+            if kind is None:
+                if current is not None:
+                    stitched.append(current)
+                current = dict(table)
+                current["table_data"] = dict(table["table_data"], data=rows)
+                current["page_end"] = table["page_number"]
+                current["row_pages"] = [table["page_number"]] * len(rows)
+                current["fragments"] = 1
+            else:
+                if kind == "headerless" and _has_header(table["table_data"]["headers"]):
+                    rows = [list(table["table_data"]["headers"])] + rows
+                current["table_data"]["data"].extend(rows)
+                current["row_pages"].extend([table["page_number"]] * len(rows))
+                current["page_end"] = table["page_number"]
+                current["fragments"] += 1
+                merges += 1
+            current["_last_position"] = position
+        if current is not None:
+            stitched.append(current)
+
+    for table in stitched:
+        table.pop("_last_position", None)
+        if table["fragments"] > 1:
+            data = table["table_data"]
+            data["row_count"] = len(data["data"])
+            table["text_representation"] = render_table(data["headers"], data["data"], "sentences",
+                                                        page_number=table["page_number"])
+            table["text"] = render_table(data["headers"], data["data"], "csv")
+
+    stitched.sort(key=lambda table: (table["page_number"], table.get("extractor", "")))
+    report = {
+        "fragments_before": len(tables),
+        "tables_after": len(stitched),
+        "fragments_merged": merges,
+        "multi_page_tables": sum(1 for table in stitched if table["fragments"] > 1)
+    }
+    return stitched, report
@@ -0,0 +1,236 @@
+import os
+import re
+import json
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from table_render import render_row
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_UNIT = r'\s*(?:kg|ml/min|mg|years?)?'
+
+# Cell phrasings of a numeric range, tried in order
+_BETWEEN = re.compile(r'(>=|>)?\s*' + _NUMBER + _UNIT + r'\s*(?:to|-|through)\s*(<=|<)?\s*' + _NUMBER)
+_OPEN_ABOVE = re.compile(_NUMBER + _UNIT + r'\s*(?:or|and)\s*(?:more|greater|above|over|higher)')
+_OPEN_BELOW = re.compile(_NUMBER + _UNIT + r'\s*(?:or|and)\s*(?:less|below|under|lower|fewer)')
+_UPPER = re.compile(r'(<=|<|less than|fewer than|under|below|up to|at most)\s*' + _NUMBER)
+_LOWER = re.compile(r'(>=|>|greater than|more than|over|above|at least)\s*' + _NUMBER)
+_EXACT = re.compile(r'^\s*' + _NUMBER + _UNIT + r'\s*$')
+
+# Quantities a column can be keyed on: header pattern and unit pattern of its cells
+DIMENSIONS = {
+    "weight": (re.compile(r'weight|\bkg\b'), re.compile(r'\bkg\b')),
+    "crcl": (re.compile(r'crcl|clcr|creatinine clearance|ml/min'), re.compile(r'ml/min')),
+}
+
+# Header of a dose column; only tables with one are range-indexed, not PK or demographics tables
+DOSE_HEADER = re.compile(r'\bdos(?:e|es|age|ing)\b|\bmg\b|\bvials?\b|\bregimen\b|\binfusion rate\b')
+
+# Quantities mentioned in a question: (dimension, pattern, factor to the column unit)
+QUERY_QUANTITIES = [
+    ("weight", re.compile(_NUMBER + r'\s*(?:kg|kilograms?)\b'), 1.0),
+    ("weight", re.compile(_NUMBER + r'\s*(?:lbs?|pounds?)\b'), 0.45359237),
+    ("weight", re.compile(r'\bweigh(?:s|ing|t)?\b\D{0,15}?' + _NUMBER + r'\b(?!\s*(?:lbs?|pounds?))'), 1.0),
+    ("crcl", re.compile(_NUMBER + r'\s*ml/min'), 1.0),
+    ("crcl", re.compile(r'\b(?:crcl|clcr|creatinine clearance)\b\D{0,15}?' + _NUMBER), 1.0),
+]
+
+
+def parse_range(cell: str) -> Optional[Tuple[float, float, bool, bool]]:
+    """(low, high, low_inclusive, high_inclusive) of a cell such as "60 to 100 kg" or "<30 mL/min\""""
+    text = cell.lower().replace("–", "-").replace("—", "-").replace("≤", "<=").replace("≥", ">=")
+    match = _BETWEEN.search(text)
+    if match:
+        return float(match.group(2)), float(match.group(4)), match.group(1) != ">", match.group(3) != "<"
+    match = _OPEN_ABOVE.search(text)
+    if match:
+        return float(match.group(1)), float("inf"), True, True
+    match = _OPEN_BELOW.search(text)
+    if match:
+        return float("-inf"), float(match.group(1)), True, True
+    match = _UPPER.search(text)
+    if match:
+        return float("-inf"), float(match.group(2)), True, match.group(1) in ("<=", "up to", "at most")
+    match = _LOWER.search(text)
+    if match:
+        return float(match.group(2)), float("inf"), match.group(1) in (">=", "at least"), True
+    match = _EXACT.match(text)
+    if match:
+        value = float(match.group(1))
+        return value, value, True, True
+    return None
+
+
+def query_quantities(query: str) -> List[Tuple[str, float]]:
+    """(dimension, value) pairs of the quantities a question mentions"""
+    text = query.lower()
+    found = []
+    for dimension, pattern, factor in QUERY_QUANTITIES:
+        for match in pattern.finditer(text):
+            quantity = (dimension, round(float(match.group(1)) * factor, 2))
+            if quantity not in found:
+                found.append(quantity)
+    return found
+
+
+class TableStore:
+    """Extracted tables in columnar form with a numeric range index.
+
+    Every table is stored once as its headers and column lists. Columns whose
+    header or cells identify a quantity (body weight in kg, creatinine clearance
+    in mL/min) and whose cells parse as ranges ("60 to 100 kg", "<30 mL/min")
+    are indexed as flat low/high arrays, so "dose for 75 kg" is answered by a
+    vectorized interval test instead of a similarity search. Only tables with
+    a dose column are indexed, so PK or demographics tables with a weight
+    column do not produce matches.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._tables = {}  # table_id -> table record
+        self._range_index = None
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def add(self, table_id: str, pdf_name: str, headers: List[str], rows: List[List[str]],
+            page_number: Optional[int] = None, table_index: Optional[int] = None,
+            row_pages: Optional[List[int]] = None):
+        """Store a table; rows are converted to columns. `row_pages` is set for tables spanning pages"""
+        width = max([len(headers)] + [len(row) for row in rows])
+        self._tables[table_id] = {
+            "pdf_name": pdf_name,
+            "page_number": page_number,
+            "row_pages": row_pages,
+            "table_index": table_index,
+            "headers": [str(header or "") for header in headers] + [""] * (width - len(headers)),
+            "columns": [[str(row[j]) if j < len(row) and row[j] is not None else "" for row in rows] for j in range(width)]
+        }
+        self._range_index = None
+
+    def remove(self, pdf_names: List[str]):
+        """Forget the tables of documents"""
+        names = set(pdf_names)
+        self._tables = {table_id: table for table_id, table in self._tables.items() if table["pdf_name"] not in names}
+        self._range_index = None
+
+    def rows(self, table_id: str) -> List[List[str]]:
+        """Rows of a stored table"""
+        columns = self._tables[table_id]["columns"]
+        return [list(row) for row in zip(*columns)] if columns else []
+
+    def _column_dimension(self, header: str, cells: List[str]) -> Optional[str]:
+        header = header.lower()
+        for dimension, (header_pattern, unit_pattern) in DIMENSIONS.items():
+            if header_pattern.search(header):
+                return dimension
+        filled = [cell.lower() for cell in cells if cell.strip()]
+        for dimension, (header_pattern, unit_pattern) in DIMENSIONS.items():
+            if filled and sum(1 for cell in filled if unit_pattern.search(cell)) * 2 >= len(filled):
+                return dimension
+        return None
+
+    def _build_range_index(self) -> Dict[str, Dict[str, Any]]:
+        """Flat interval arrays per dimension over all range columns"""
+        entries = {}
+        for table_id, table in self._tables.items():
+            if not any(DOSE_HEADER.search(header.lower()) for header in table["headers"]):
+                continue
+            for header, cells in zip(table["headers"], table["columns"]):
+                dimension = self._column_dimension(header, cells)
+                if dimension is None:
+                    continue
+                parsed = [(row, parse_range(cell)) for row, cell in enumerate(cells) if cell.strip()]
+                ranges = [(row, bounds) for row, bounds in parsed if bounds is not None]
+                # Mostly non-numeric cells: not a range column
+                if not ranges or len(ranges) * 2 < len(parsed):
+                    continue
+                bucket = entries.setdefault(dimension, [])
+                bucket.extend((table_id, row) + bounds for row, bounds in ranges)
+
+        index = {}
+        for dimension, bucket in entries.items():
+            table_ids, rows, lows, highs, low_inclusive, high_inclusive = zip(*bucket)
+            index[dimension] = {
+                "table_ids": list(table_ids),
+                "pdf_names": np.array([self._tables[table_id]["pdf_name"] for table_id in table_ids]),
+                "rows": np.array(rows, dtype=np.int64),
+                "lows": np.array(lows, dtype=np.float64),
+                "highs": np.array(highs, dtype=np.float64),
+                "low_inclusive": np.array(low_inclusive, dtype=bool),
+                "high_inclusive": np.array(high_inclusive, dtype=bool)
+            }
+        return index
+
+    def lookup(self, query: str, pdf_names: Optional[List[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Table rows whose range column contains a quantity in the query, as retrieval results"""
+        quantities = query_quantities(query)
+        if not quantities or not self._tables:
+            return []
+        if self._range_index is None:
+            self._range_index = self._build_range_index()
+
+        results = []
+        seen = set()
+        for dimension, value in quantities:
+            index = self._range_index.get(dimension)
+            if index is None:
+                continue
+            above_low = (index["lows"] < value) | ((index["lows"] == value) & index["low_inclusive"])
+            below_high = (value < index["highs"]) | ((value == index["highs"]) & index["high_inclusive"])
+            mask = above_low & below_high
+            if pdf_names is not None:
+                mask &= np.isin(index["pdf_names"], list(pdf_names))
+            for position in np.flatnonzero(mask):
+                key = (index["table_ids"][position], int(index["rows"][position]))
+                if key not in seen:
+                    seen.add(key)
+                    results.append(self._row_result(*key))
+        return results[:limit]
+
+    def _row_result(self, table_id: str, row: int) -> Dict[str, Any]:
+        table = self._tables[table_id]
+        cells = [column[row] for column in table["columns"]]
+        page_number = table["row_pages"][row] if table.get("row_pages") else table["page_number"]
+        return {
+            "chunk_text": render_row(table["headers"], cells, table["table_index"], page_number),
+            "pdf_index": 0,
+            "pdf_name": table["pdf_name"],
+            "section": "TABULAR_DATA_ROW",
+            "page_start": page_number,
+            "page_end": page_number,
+            "is_fda": False,
+            "content_type": "tabular",
+            "doc_type": "table_row",
+            "table_index": table["table_index"],
+            "row_index": row,
+            "image_index": None,
+            "shared_sources": [],
+            "score": 1.0,
+            "distance": 0.0
+        }
+
+    def load(self) -> bool:
+        """Load the store from disk if it exists"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._tables = json.load(f)
+            self._range_index = None
+            return True
+        except Exception as e:
+            print(f"Error loading table store: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Persist the store next to the vector store"""
+        if not self.path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._tables, f)
+            return True
+        except Exception as e:
+            print(f"Error saving table store: {e}")
+            return False
@@ -0,0 +1,78 @@
+from dedup import NearDuplicateIndex, reconcile_extractor_text, shingle_set, containment
+
+PARAGRAPH = ("Serious infections have been reported in patients receiving this product, including "
+             "tuberculosis and opportunistic infections. Screen patients for latent tuberculosis "
+             "before starting treatment and monitor them for signs of infection during and after therapy.")
+
+
+def _doc(doc_id, pdf_name, content=PARAGRAPH, doc_type="text"):
+    return {"id": doc_id, "content": content,
+            "metadata": {"pdf_name": pdf_name, "doc_type": doc_type, "section": "WARNINGS", "char_start": 0, "char_end": 10}}
+
+
+def test_containment_of_identical_text_is_one():
+    shingles = shingle_set(PARAGRAPH)
+    assert containment(shingles, shingles) == 1.0
+    assert containment(shingle_set("completely different words about dosing in children"), shingles) == 0.0
+
+
+def test_reconcile_drops_page_text_covered_by_composites():
+    elements = [
+        {"type": "CompositeElement", "text": PARAGRAPH, "page_number": 3},
+        {"type": "TextElement", "text": PARAGRAPH, "page_number": 3},
+        {"type": "TextElement", "text": "Store refrigerated at 2 to 8 degrees in the original carton.", "page_number": 9},
+    ]
+    kept, dropped, report = reconcile_extractor_text(elements)
+    assert [e["page_number"] for e in dropped] == [3]
+    assert len(kept) == 2
+    assert report["elements_dropped"] == 1 and report["bytes_saved"] > 0
+
+
+def test_labels_of_the_same_drug_fold_into_one_canonical():
+    index = NearDuplicateIndex()
+    names = ["orencia_intravenous.pdf", "orencia_clickject_125mg.pdf",
+             "orencia_subcutaneous_injection.pdf", "Orencia-IV-250mg.pdf"]
+    documents = [_doc(str(i), name) for i, name in enumerate(names)]
+
+    unique, updates = index.fold_duplicates(documents)
+
+    assert [doc["id"] for doc in unique] == ["0"]
+    assert updates == {}  # the canonical is in the same batch
+    shared = unique[0]["metadata"]["shared_sources"]
+    assert [source["pdf_name"] for source in shared] == names[1:]
+    assert index.folded_count == 3
+
+
+def test_different_drugs_are_not_folded():
+    index = NearDuplicateIndex()
+    unique, _ = index.fold_duplicates([_doc("a", "orencia.pdf"), _doc("b", "humira.pdf")])
+    assert [doc["id"] for doc in unique] == ["a", "b"]
+
+
+def test_later_batches_update_stored_canonicals():
+    index = NearDuplicateIndex()
+    index.fold_duplicates([_doc("a", "orencia_iv.pdf")])
+    unique, updates = index.fold_duplicates([_doc("b", "orencia_sc.pdf")])
+    assert unique == []
+    assert list(updates) == ["a"]
+
+
+def test_only_text_and_tables_are_folded():
+    index = NearDuplicateIndex()
+    unique, _ = index.fold_duplicates([_doc("a", "orencia_iv.pdf", doc_type="image"),
+                                       _doc("b", "orencia_sc.pdf", doc_type="image")])
+    assert len(unique) == 2
+
+
+def test_persisted_index_folds_after_reload_and_forgets_removed_documents(tmp_path):
+    index = NearDuplicateIndex(directory=str(tmp_path))
+    index.fold_duplicates([_doc("a", "orencia_iv.pdf")])
+    assert index.save()
+
+    reloaded = NearDuplicateIndex(directory=str(tmp_path))
+    assert reloaded.load()
+    _, updates = reloaded.fold_duplicates([_doc("b", "orencia_sc.pdf")])
+    assert list(updates) == ["a"]
+
+    assert reloaded.remove_documents(["orencia_iv.pdf"]) == 1
+    assert reloaded.find_duplicate(reloaded.signature(PARAGRAPH)) is None
@@ -0,0 +1,57 @@
+from drug_index import drug_key, filename_drug_names
+from drug_lexicon import DrugLexicon, description_drug_names
+
+
+def test_brand_and_generic_names_are_declared():
+    assert description_drug_names("HUMIRA (adalimumab) injection, for subcutaneous use") == ["humira", "adalimumab"]
+    assert description_drug_names("SIMPONI ARIA (golimumab) injection") == ["simponi aria", "golimumab"]
+
+
+def test_biosimilar_suffix_also_declares_the_core_name():
+    assert description_drug_names("INFLECTRA (infliximab-dyyb)") == ["inflectra", "infliximab dyyb", "infliximab"]
+
+
+def test_generic_is_cut_at_the_first_non_drug_word():
+    assert description_drug_names("ORENCIA (abatacept for injection)") == ["orencia", "abatacept"]
+
+
+def test_section_headings_are_not_drug_names():
+    assert description_drug_names("5 WARNINGS AND PRECAUTIONS (continued)") == []
+    assert description_drug_names("6 ADVERSE REACTIONS (continued)") == []
+
+
+def test_filename_names_skip_routes_devices_and_strengths():
+    assert filename_drug_names("orencia_subcutaneous_injection.pdf") == ["orencia"]
+    assert filename_drug_names("Humira-Pen-40mg.pdf") == ["humira"]
+    # The partition key is unchanged, so existing shards keep their routing
+    assert drug_key("orencia_subcutaneous_injection.pdf") == "orencia subcutaneous"
+
+
+def _lexicon():
+    lexicon = DrugLexicon()
+    lexicon.add_document("humira.pdf", ["humira", "adalimumab"])
+    lexicon.add_document("simponi_aria.pdf", ["simponi aria", "simponi", "aria", "golimumab"])
+    return lexicon
+
+
+def test_find_matches_whole_words_only():
+    lexicon = _lexicon()
+    assert lexicon.find("Is malaria a risk with variable dosing?") == []
+    assert lexicon.find("What is the dose of Humira?") == ["humira"]
+
+
+def test_find_prefers_the_longest_name():
+    assert _lexicon().find("Simponi Aria infusion time") == ["simponi aria"]
+
+
+def test_headings_in_labels_do_not_create_fake_drugs():
+    lexicon = _lexicon()
+    lexicon.add_document("humira.pdf", description_drug_names("5 WARNINGS AND PRECAUTIONS (continued)"))
+    assert lexicon.find("warnings and precautions for Humira") == ["humira"]
+
+
+def test_removed_documents_are_no_longer_found():
+    lexicon = _lexicon()
+    lexicon.remove_document("humira.pdf")
+    assert lexicon.find("humira dosing") == []
+    assert lexicon.documents_for(["golimumab"]) == ["simponi_aria.pdf"]
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pytest
+from index_snapshot import IndexSnapshot, publish_snapshot, CURRENT_FILE, VERSIONS_DIR, SIDECARS_DIR
+
+VOCABULARY = ["dose", "infection", "storage", "pediatric"]
+
+
+def embed(texts):
+    """Bag-of-words vectors over a tiny vocabulary"""
+    return [[float(word in text.lower()) for word in VOCABULARY] + [0.01] for text in texts]
+
+
+def _publish(root, documents, keep=2, sidecars=None):
+    ids = [f"c{i}" for i in range(len(documents))]
+    metadatas = [{"pdf_name": pdf_name, "doc_type": "text", "row": i} for i, (pdf_name, _) in enumerate(documents)]
+    texts = [text for _, text in documents]
+    return publish_snapshot(str(root), ids, embed(texts), texts, metadatas, keep=keep, sidecars=sidecars)
+
+
+def test_query_returns_the_nearest_chunks(tmp_path):
+    _publish(tmp_path, [("humira.pdf", "Dose for adults"), ("humira.pdf", "Storage in the fridge")])
+    snapshot = IndexSnapshot(str(tmp_path), embed)
+
+    results = snapshot.query(query_texts=["storage conditions"], n_results=1)
+
+    assert snapshot.count() == 2
+    assert results["ids"] == [["c1"]]
+    assert results["metadatas"][0][0]["pdf_name"] == "humira.pdf"
+
+
+def test_where_filter_restricts_the_search(tmp_path):
+    _publish(tmp_path, [("humira.pdf", "Dose for adults"), ("orencia.pdf", "Dose for adults")])
+    snapshot = IndexSnapshot(str(tmp_path), embed)
+
+    results = snapshot.query(query_texts=["dose"], n_results=5, where={"pdf_name": {"$in": ["orencia.pdf"]}})
+    assert results["ids"] == [["c1"]]
+    assert snapshot.get(ids=["c1", "missing"])["ids"] == ["c1"]
+
+
+def test_new_versions_are_swapped_in_with_their_sidecars(tmp_path):
+    sidecar = tmp_path / "drug_index.json"
+    sidecar.write_text('{"humira": ["humira.pdf"]}')
+    _publish(tmp_path / "snapshots", [("humira.pdf", "Dose for adults")], sidecars={"drug_index.json": str(sidecar)})
+    swapped = []
+    snapshot = IndexSnapshot(str(tmp_path / "snapshots"), embed, check_interval=0.0, on_swap=swapped.append)
+    assert snapshot.count() == 1
+
+    sidecar.write_text('{"keytruda": ["keytruda.pdf"]}')
+    version = _publish(tmp_path / "snapshots", [("keytruda.pdf", "Dose for adults"), ("keytruda.pdf", "Infection risk")],
+                       sidecars={"drug_index.json": str(sidecar)})
+
+    assert snapshot.count() == 2
+    assert snapshot.version == version
+    assert len(swapped) == 2 and swapped[-1].endswith(version)
+    with open(os.path.join(swapped[-1], SIDECARS_DIR, "drug_index.json")) as f:
+        assert "keytruda" in f.read()
+
+
+def test_cleanup_keeps_the_current_and_newest_versions(tmp_path):
+    versions = [_publish(tmp_path, [("humira.pdf", f"Dose {i}")], keep=2) for i in range(4)]
+
+    assert versions == sorted(versions)
+    assert sorted(os.listdir(tmp_path / VERSIONS_DIR)) == versions[-2:]
+    assert (tmp_path / CURRENT_FILE).read_text() == versions[-1]
+
+
+def test_snapshot_is_read_only(tmp_path):
+    _publish(tmp_path, [("humira.pdf", "Dose")])
+    snapshot = IndexSnapshot(str(tmp_path), embed)
+    with pytest.raises(RuntimeError):
+        snapshot.add(ids=["x"], documents=["y"])
+    assert np.isclose(snapshot.query(query_texts=["dose"], n_results=1)["distances"][0][0], 0.0, atol=1e-3)
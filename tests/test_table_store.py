@@ -0,0 +1,69 @@
+import pytest
+from table_store import TableStore, parse_range, query_quantities
+
+DOSE_TABLE = (["Body Weight", "Dose", "Number of Vials"],
+              [["Less than 60 kg", "500 mg", "2"], ["60 to 100 kg", "750 mg", "3"], ["More than 100 kg", "1,000 mg", "4"]])
+RENAL_TABLE = (["CrCl (mL/min)", "Recommended Dosage"],
+               [[">= 50", "No adjustment"], ["30 to 49", "250 mg daily"], ["< 30", "Not recommended"]])
+PK_TABLE = (["Body weight (kg)", "Clearance (L/h)"],
+            [["< 60", "0.18"], ["60 to 100", "0.22"], ["> 100", "0.26"]])
+
+
+@pytest.mark.parametrize("cell, expected", [
+    ("60 to 100 kg", (60.0, 100.0, True, True)),
+    ("<30 mL/min", (float("-inf"), 30.0, True, False)),
+    (">= 50", (50.0, float("inf"), True, True)),
+    ("100 kg or more", (100.0, float("inf"), True, True)),
+    ("500 mg", (500.0, 500.0, True, True)),
+    ("No adjustment", None),
+])
+def test_parse_range(cell, expected):
+    assert parse_range(cell) == expected
+
+
+def test_query_quantities_convert_pounds_to_kilograms():
+    assert query_quantities("dose for a 75 kg patient") == [("weight", 75.0)]
+    assert query_quantities("patient weighs 220 lbs") == [("weight", 99.79)]
+    assert query_quantities("CrCl of 40 mL/min") == [("crcl", 40.0)]
+
+
+def _store():
+    store = TableStore()
+    store.add("t1", "orencia.pdf", *DOSE_TABLE, page_number=5, table_index=1)
+    store.add("t2", "renal.pdf", *RENAL_TABLE, page_number=9, table_index=2)
+    store.add("t3", "orencia.pdf", *PK_TABLE, page_number=30, table_index=7)
+    return store
+
+
+def test_lookup_returns_the_row_whose_range_contains_the_weight():
+    rows = _store().lookup("What is the dose for a 75 kg patient?")
+    assert [(row["pdf_name"], row["table_index"], row["row_index"]) for row in rows] == [("orencia.pdf", 1, 1)]
+    assert "750 mg" in rows[0]["chunk_text"]
+    assert rows[0]["page_start"] == 5 and rows[0]["doc_type"] == "table_row"
+
+
+def test_lookup_respects_exclusive_bounds():
+    rows = _store().lookup("dose with a creatinine clearance of 30 mL/min")
+    assert [(row["table_index"], row["row_index"]) for row in rows] == [(2, 1)]
+
+
+def test_tables_without_a_dose_column_are_not_indexed():
+    rows = _store().lookup("75 kg", pdf_names=["orencia.pdf"])
+    assert all(row["table_index"] != 7 for row in rows)
+
+
+def test_lookup_is_restricted_to_the_given_documents():
+    assert _store().lookup("75 kg", pdf_names=["renal.pdf"]) == []
+
+
+def test_row_pages_of_stitched_tables_are_cited(tmp_path):
+    store = TableStore(str(tmp_path / "tables.json"))
+    store.add("t1", "orencia.pdf", *DOSE_TABLE, page_number=5, table_index=1, row_pages=[5, 5, 6])
+    assert store.save()
+
+    reloaded = TableStore(str(tmp_path / "tables.json"))
+    assert reloaded.load()
+    assert reloaded.lookup("110 kg")[0]["page_start"] == 6
+
+    reloaded.remove(["orencia.pdf"])
+    assert len(reloaded) == 0 and reloaded.lookup("110 kg") == []
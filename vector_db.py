@@ -201,34 +201,208 @@
 
 
 import chromadb
+from chromadb.utils import embedding_functions
 import shutil
 from typing import List, Dict, Any, Optional
 import os
 import json
+import numpy as np
+from page_index import PageOffsetIndex
+from lexical_index import BM25Index
+from drug_index import drug_key, filename_drug_names
+from drug_lexicon import DrugLexicon, DRUG_NAME_SECTIONS, description_drug_names
+from sharded_collection import ShardedCollection
+from exact_search import ExactSearchCollection
+from quantized_store import QuantizedVectorStore
+from index_snapshot import IndexSnapshot, publish_snapshot, SIDECARS_DIR
+from metadata_store import MetadataStore
+from table_store import TableStore
+from dedup import NearDuplicateIndex
+
+# Scalar fields kept in the vector store for where filters; everything else lives in the metadata store
+INDEX_FIELDS = ("pdf_name", "content_type", "drug", "doc_type", "session_id")
+
+# Files and directories next to the collection that are published with each index snapshot
+SNAPSHOT_SIDECARS = ("page_index.json", "bm25", "metadata", "tables.json", "drug_index.json")
+
+def hnsw_metadata(m: Optional[int] = None, construction_ef: Optional[int] = None,
+                  search_ef: Optional[int] = None) -> Dict[str, Any]:
+    """Chroma collection metadata for the HNSW index; unset values keep Chroma's defaults"""
+    metadata = {"hnsw:space": "cosine"}
+    if m is not None:
+        metadata["hnsw:M"] = m
+    if construction_ef is not None:
+        metadata["hnsw:construction_ef"] = construction_ef
+    if search_ef is not None:
+        metadata["hnsw:search_ef"] = search_ef
+    return metadata
+
+
+CONTENT_TYPE_WEIGHTS = {
+    "medical": 0.5,
+    "tabular": 0.4,
+    "visual": 0.4,
+    "general": 0.3,
+    "metadata": 0.1
+}
+
+
+def relevance_features(metadata: Dict[str, Any]) -> Dict[str, float]:
+    """Static relevance boosts of a chunk, computed once at ingestion"""
+    content_weight = CONTENT_TYPE_WEIGHTS.get(metadata.get("content_type", "general"), 0.3)
+    
+    # FDA document bonus
+    fda_bonus = 0.3 if metadata.get("is_fda", False) else 0.0
+    
+    # Section importance
+    section = metadata.get("section", "").lower()
+    section_bonus = 0.0
+    if any(key in section for key in ['dosage', 'administration']):
+        section_bonus = 0.2
+    elif any(key in section for key in ['adverse', 'warning', 'contraindication']):
+        section_bonus = 0.1
+    
+    # Document type bonus
+    doc_type_bonus = 0.1 if metadata.get("doc_type") in ["table", "table_row", "image"] else 0.0
+    
+    return {
+        "content_weight": content_weight,
+        "fda_bonus": fda_bonus,
+        "section_bonus": section_bonus,
+        "doc_type_bonus": doc_type_bonus,
+        # Final score is similarity * 0.6 + prior_score, capped at 1.0
+        "prior_score": content_weight * 0.2 + fda_bonus * 0.1 + section_bonus * 0.1 + doc_type_bonus * 0.1
+    }
+
 
 class EfficientVectorDB:
     """Enhanced Vector database manager with improved multimodal support"""
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = "./chroma_db", hybrid_search: bool = True, rrf_k: int = 60,
+                 candidate_pool: int = 25, reranker: Optional[Any] = None, sharded: bool = False,
+                 num_shard_groups: Optional[int] = None, max_workers: int = 8,
+                 exact_search_threshold: int = 2000, embedding_function: Optional[Any] = None,
+                 quantization: Optional[str] = None, serve_snapshot: bool = False):
+        # persist_directory=None keeps everything in memory with exact brute-force search
         self.persist_directory = persist_directory
         self.client = None
         self.collection = None
+        self.page_index = PageOffsetIndex()
+        self.lexical_index = BM25Index()
+        # Drug names of the corpus; shared with the query processor, so it is reloaded in place
+        self.drug_index = DrugLexicon()
+        # Full chunk metadata, columnar; the vector store only keeps INDEX_FIELDS and the row number
+        self.metadata_store = MetadataStore()
+        # Structured tables for direct numeric-range lookups (weight bands, CrCl thresholds)
+        self.table_store = TableStore()
+        # Corpus-level near-duplicate passages, folded at ingestion
+        self.near_duplicates = NearDuplicateIndex()
+        self.hybrid_search = hybrid_search
+        self.rrf_k = rrf_k
+        # Number of candidates fetched and scored before the final top-n is selected
+        self.candidate_pool = candidate_pool
+        self.reranker = reranker
+        # Sharded layout: one collection per drug (or per hash group of drugs)
+        self.sharded = sharded
+        self.num_shard_groups = num_shard_groups
+        self.max_workers = max_workers
+        # Shards with at most this many chunks are searched exactly in memory instead of via HNSW
+        self.exact_search_threshold = exact_search_threshold
+        self.embedding_function = embedding_function
+        # "sq8" or "pq": serve dense search from a compressed memory-mapped index
+        self.quantization = quantization
+        self.quantized_store = None
+        # Serving workers query a shared read-only snapshot instead of opening Chroma
+        self.serve_snapshot = serve_snapshot
         self._initialized = False
     
-    def initialize(self, reset: bool = False) -> bool:
-        """Initialize the database with optional cleanup"""
+    def initialize(self, reset: bool = False, hnsw_m: Optional[int] = None,
+                   hnsw_construction_ef: Optional[int] = None, hnsw_search_ef: Optional[int] = None) -> bool:
+        """Initialize the database with optional cleanup.
+
+        HNSW parameters are stored in the collection metadata when the collection
+        is created; changing them for an existing collection requires a reset.
+        """
         try:
             # Clean up existing database if reset requested
-            if reset and os.path.exists(self.persist_directory):
+            if reset and self.persist_directory and os.path.exists(self.persist_directory):
                 shutil.rmtree(self.persist_directory)
                 print(f"Cleaned up existing database at {self.persist_directory}")
             
+            # Both backends embed with the same model so their vectors are interchangeable
+            if self.embedding_function is None:
+                self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            
+            collection_metadata = hnsw_metadata(hnsw_m, hnsw_construction_ef, hnsw_search_ef)
+            collection_metadata["description"] = "FDA drug labels and medical documents with multimodal support"
+            
+            if self.persist_directory is None:
+                # Small, short-lived corpora (uploaded PDFs): exact search, no disk I/O
+                self.client = None
+                self.collection = ExactSearchCollection(self.embedding_function, name="medical_documents")
+                self.page_index = PageOffsetIndex()
+                self.lexical_index = BM25Index()
+                self.metadata_store = MetadataStore()
+                self.table_store = TableStore()
+                self.near_duplicates = NearDuplicateIndex()
+                self.drug_index.path = None
+                self.drug_index.clear()
+                self._initialized = True
+                print("In-memory vector database initialized")
+                return True
+            
+            snapshot = None
+            if self.serve_snapshot:
+                snapshot = IndexSnapshot(os.path.join(self.persist_directory, "snapshots"), self.embedding_function,
+                                         on_swap=self._load_snapshot_sidecars)
+                if not snapshot.refresh(force=True):
+                    print("No index snapshot published yet, serving from the vector database")
+                    snapshot = None
+            
             # Create or connect to client and collection
-            self.client = chromadb.PersistentClient(path=self.persist_directory)
-            self.collection = self.client.get_or_create_collection(
-                name="medical_documents",
-                metadata={"hnsw:space": "cosine", "description": "FDA drug labels and medical documents with multimodal support"}
-            )
+            if snapshot is not None:
+                self.client = None
+                self.collection = snapshot
+                collections = []
+            elif self.sharded:
+                self.client = chromadb.PersistentClient(path=self.persist_directory)
+                self.collection = ShardedCollection(
+                    self.client, collection_metadata, num_groups=self.num_shard_groups, max_workers=self.max_workers,
+                    embedding_function=self.embedding_function, exact_search_threshold=self.exact_search_threshold
+                )
+                collections = list(self.collection.shards.values())
+            else:
+                self.client = chromadb.PersistentClient(path=self.persist_directory)
+                self.collection = self.client.get_or_create_collection(
+                    name="medical_documents",
+                    metadata=collection_metadata,
+                    embedding_function=self.embedding_function
+                )
+                collections = [self.collection]
+            
+            for collection in collections:
+                stored = collection.metadata or {}
+                mismatched = [
+                    key for key, value in collection_metadata.items()
+                    if key.startswith("hnsw:") and stored.get(key) != value
+                ]
+                if mismatched:
+                    print(f"Collection {collection.name} keeps its stored HNSW settings for {', '.join(mismatched)}; "
+                          f"reset the database to apply new values")
+            
+            # A served snapshot brings its own sidecars, loaded when it was opened
+            if snapshot is None:
+                self._load_sidecars(self.persist_directory)
+            
+            # MinHash signatures of stored passages, so later additions fold into them
+            self.near_duplicates = NearDuplicateIndex(directory=os.path.join(self.persist_directory, "near_duplicates"))
+            self.near_duplicates.load()
+            
+            if self.quantization:
+                self.quantized_store = QuantizedVectorStore(
+                    os.path.join(self.persist_directory, "quantized"), method=self.quantization
+                )
+                self.quantized_store.load()
             
             self._initialized = True
             if reset:
@@ -242,12 +416,43 @@ class EfficientVectorDB:
             self._initialized = False
             return False
         
+    def _load_sidecars(self, directory: str):
+        """Load the page, BM25, metadata, table and drug indexes stored under a directory"""
+        # Page offsets are stored once per PDF next to the collection
+        page_index = PageOffsetIndex(os.path.join(directory, "page_index.json"))
+        page_index.load()
+        
+        # BM25 index over chunk text for exact drug names, doses and codes
+        lexical_index = BM25Index(os.path.join(directory, "bm25"))
+        lexical_index.load()
+        
+        metadata_store = MetadataStore(os.path.join(directory, "metadata"))
+        metadata_store.load()
+        
+        table_store = TableStore(os.path.join(directory, "tables.json"))
+        table_store.load()
+        
+        self.page_index = page_index
+        self.lexical_index = lexical_index
+        self.metadata_store = metadata_store
+        self.table_store = table_store
+        
+        # Drug name -> document lexicon used for query analysis and filtered retrieval
+        self.drug_index.path = os.path.join(directory, "drug_index.json")
+        if not self.drug_index.load():
+            self.drug_index.clear()
+    
+    def _load_snapshot_sidecars(self, version_directory: str):
+        """Swap in the sidecars published with a snapshot version (older versions have none)"""
+        sidecars = os.path.join(version_directory, SIDECARS_DIR)
+        self._load_sidecars(sidecars if os.path.isdir(sidecars) else self.persist_directory)
+    
     def is_initialized(self) -> bool:
         """Check if database is initialized"""
         return self._initialized and self.collection is not None
     
-    def add_documents_batch(self, documents_batch: List[Dict[str, Any]]) -> bool:
-        """Add a batch of documents to the database"""
+    def add_documents_batch(self, documents_batch: List[Dict[str, Any]], embeddings: Optional[Any] = None) -> bool:
+        """Add a batch of documents to the database; precomputed `embeddings` skip the embedding step"""
         if not self.is_initialized() or not documents_batch:
             return False
         
@@ -257,12 +462,46 @@ class EfficientVectorDB:
             metadatas = [doc["metadata"] for doc in documents_batch]
             ids = [doc["id"] for doc in documents_batch]
             
+            # Precompute the static relevance boosts as numeric feature columns
+            # and tag every chunk with its drug partition key
+            for metadata in metadatas:
+                metadata.update(relevance_features(metadata))
+                metadata["drug"] = drug_key(metadata.get("pdf_name", "unknown"))
+            
+            # Full metadata goes to the columnar store; the collection gets the filter fields and the row
+            rows = self.metadata_store.add(metadatas)
+            index_metadatas = []
+            for metadata, row in zip(metadatas, rows):
+                metadata["row"] = row
+                index_metadata = {field: metadata[field] for field in INDEX_FIELDS if metadata.get(field) is not None}
+                index_metadata["row"] = row
+                index_metadata["generation"] = self.metadata_store.generation
+                index_metadatas.append(index_metadata)
+            
             # Add to collection
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            if embeddings is not None:
+                self.collection.add(documents=documents, metadatas=index_metadatas, ids=ids, embeddings=embeddings)
+            else:
+                self.collection.add(
+                    documents=documents,
+                    metadatas=index_metadatas,
+                    ids=ids
+                )
+            if self.hybrid_search:
+                self.lexical_index.add(ids, documents, [metadata.get("pdf_name", "unknown") for metadata in metadatas])
+            
+            # Drug names from filenames and from the label title and DESCRIPTION text
+            drug_names = {}
+            for document, metadata in zip(documents, metadatas):
+                pdf_name = metadata.get("pdf_name", "unknown")
+                names = drug_names.setdefault(pdf_name, filename_drug_names(pdf_name))
+                if metadata.get("section") in DRUG_NAME_SECTIONS:
+                    names.extend(description_drug_names(document))
+            drugs_changed = False
+            for pdf_name, names in drug_names.items():
+                drugs_changed |= self.drug_index.add_document(pdf_name, names)
+            if drugs_changed:
+                self.drug_index.save()
             
             print(f"Added {len(documents_batch)} documents to database")
             return True
@@ -271,6 +510,165 @@ class EfficientVectorDB:
             print(f"Error adding documents to database: {e}")
             return False
     
+    def update_metadatas(self, metadatas_by_id: Dict[str, Dict[str, Any]]) -> bool:
+        """Update the metadata of documents that are already stored"""
+        if not self.is_initialized() or not metadatas_by_id:
+            return False
+        
+        try:
+            # Rows of the metadata store are updated in place; older chunks keep their metadata in the collection
+            legacy_ids = []
+            for doc_id, metadata in metadatas_by_id.items():
+                if metadata.get("row") is None:
+                    legacy_ids.append(doc_id)
+                else:
+                    self.metadata_store.update(metadata["row"], {k: v for k, v in metadata.items() if k != "row"})
+            if legacy_ids:
+                self.collection.update(ids=legacy_ids, metadatas=[metadatas_by_id[doc_id] for doc_id in legacy_ids])
+            return True
+        except Exception as e:
+            print(f"Error updating document metadata: {e}")
+            return False
+    
+    def add_page_offsets(self, pdf_name: str, offsets: List[int], pages: List[int]) -> bool:
+        """Store the page offset index of a PDF"""
+        if not self.is_initialized():
+            return False
+        self.page_index.add(pdf_name, offsets, pages)
+        return self.page_index.save()
+    
+    def add_tables(self, pdf_name: str, tables: List[Dict[str, Any]]) -> bool:
+        """Store the structured tables of a document"""
+        if not self.is_initialized():
+            return False
+        for table in tables:
+            self.table_store.add(table["table_id"], pdf_name, table["headers"], table["rows"],
+                                 page_number=table.get("page_number"), table_index=table.get("table_index"),
+                                 row_pages=table.get("row_pages"))
+        return self.table_store.save()
+    
+    def lookup_table_rows(self, query_text: str, pdf_filter: str = None, drugs: List[str] = None,
+                          limit: int = 10) -> List[Dict[str, Any]]:
+        """Table rows answering a numeric-range question ("dose for 75 kg") by direct lookup.
+
+        Only the labels of the drugs the query names are searched, since weight
+        bands and renal thresholds differ per drug.
+        """
+        if not self.is_initialized() or not len(self.table_store):
+            return []
+        pdf_names = self.resolve_documents(pdf_filter, drugs)
+        if not pdf_names:
+            return []
+        try:
+            return self.table_store.lookup(query_text, pdf_names=pdf_names, limit=limit)
+        except Exception as e:
+            print(f"Error looking up table rows: {e}")
+            return []
+    
+    def save_lexical_index(self) -> bool:
+        """Persist the BM25 index next to the vector store"""
+        if not self.is_initialized():
+            return False
+        return self.lexical_index.save()
+    
+    def save_near_duplicates(self) -> bool:
+        """Persist the near-duplicate signatures next to the vector store"""
+        if not self.is_initialized():
+            return False
+        return self.near_duplicates.save()
+    
+    def save_metadata_store(self) -> bool:
+        """Persist the columnar chunk metadata next to the vector store"""
+        if not self.is_initialized():
+            return False
+        return self.metadata_store.save()
+    
+    def drop_shard(self, drug: str) -> List[str]:
+        """Remove the shards holding a drug (name or PDF) so they can be rebuilt on their own.
+
+        Returns the documents that were stored in the shards; re-adding them
+        recreates the shards without touching any other shard.
+        """
+        if not self.is_initialized() or not self.sharded:
+            return []
+        
+        try:
+            documents = self.drug_index.documents_for([drug]) or [drug]
+            shard_keys = {self.collection.shard_key(drug_key(pdf_name)) for pdf_name in documents}
+            pdf_names = sorted({
+                pdf_name
+                for documents in self.drug_index.documents_by_drug.values()
+                for pdf_name in documents
+                if self.collection.shard_key(drug_key(pdf_name)) in shard_keys
+            })
+            for shard_key in shard_keys:
+                self.collection.drop_shard(shard_key)
+            
+            self.lexical_index.remove(pdf_names)
+            self.table_store.remove(pdf_names)
+            self.near_duplicates.remove_documents(pdf_names)
+            for pdf_name in pdf_names:
+                self.drug_index.remove_document(pdf_name)
+                self.page_index.remove(pdf_name)
+            self.lexical_index.save()
+            self.drug_index.save()
+            self.page_index.save()
+            self.table_store.save()
+            self.near_duplicates.save()
+            
+            print(f"Dropped {len(shard_keys)} shard(s) with {len(pdf_names)} documents")
+            return pdf_names
+        except Exception as e:
+            print(f"Error dropping shard for {drug}: {e}")
+            return []
+    
+    def publish_snapshot(self, keep: int = 2) -> Optional[str]:
+        """Publish the current contents as a new immutable snapshot for serving workers"""
+        if not self.is_initialized() or not self.persist_directory or isinstance(self.collection, IndexSnapshot):
+            return None
+        
+        try:
+            # The sidecars are copied into the version, so they must be current on disk
+            for sidecar in (self.page_index, self.lexical_index, self.metadata_store, self.table_store, self.drug_index):
+                sidecar.save()
+            stored = self.collection.get(include=["embeddings", "documents", "metadatas"])
+            version = publish_snapshot(
+                os.path.join(self.persist_directory, "snapshots"),
+                stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"], keep=keep,
+                sidecars={name: os.path.join(self.persist_directory, name) for name in SNAPSHOT_SIDECARS}
+            )
+            print(f"Published index snapshot {version} with {len(stored['ids'])} chunks")
+            return version
+        except Exception as e:
+            print(f"Error publishing index snapshot: {e}")
+            return None
+    
+    def build_quantized_index(self) -> bool:
+        """(Re)build the compressed vector index from the stored embeddings.
+
+        Chunks added afterwards are only found by dense search once the index is rebuilt,
+        so ingestion calls this after all PDFs are loaded.
+        """
+        if not self.is_initialized() or self.quantized_store is None:
+            return False
+        
+        try:
+            stored = self.collection.get(include=["embeddings", "metadatas"])
+            if not stored["ids"]:
+                return False
+            self.quantized_store.build(
+                stored["ids"],
+                stored["embeddings"],
+                [metadata.get("pdf_name", "unknown") for metadata in stored["metadatas"]]
+            )
+            memory = self.quantized_store.memory_bytes()
+            print(f"Built {self.quantization} index over {len(self.quantized_store)} chunks: "
+                  f"{memory['codes'] / 1e6:.1f} MB codes instead of {memory['float32'] / 1e6:.1f} MB float32")
+            return self.quantized_store.save()
+        except Exception as e:
+            print(f"Error building quantized index: {e}")
+            return False
+    
     def get_document_count(self) -> int:
         """Get the number of documents in the collection"""
         if not self.is_initialized():
@@ -280,29 +678,51 @@ class EfficientVectorDB:
         except:
             return 0
     
+    def resolve_documents(self, pdf_filter: str = None, drugs: List[str] = None) -> Optional[List[str]]:
+        """Exact document names of the requested drugs, or None when no known drug was requested"""
+        names = list(drugs or [])
+        if pdf_filter:
+            names.append(pdf_filter)
+        if not names:
+            return None
+        return self.drug_index.documents_for(names) or None
+    
     def query(self, query_text: str, n_results: int = 8, pdf_filter: str = None, 
-              content_types: List[str] = None) -> List[Dict[str, Any]]:
-        """Enhanced query with content type filtering and multimodal support"""
+              content_types: List[str] = None, hybrid: Optional[bool] = None,
+              candidate_pool: Optional[int] = None, rerank: Optional[bool] = None,
+              drugs: List[str] = None) -> List[Dict[str, Any]]:
+        """Enhanced query with drug, content type filtering and multimodal support.
+
+        `pdf_filter` and `drugs` name drugs; they are resolved to exact document names
+        through the drug index. Unknown drugs fall back to searching all documents.
+        """
         if not self.is_initialized():
             return []
         
+        use_hybrid = self.hybrid_search if hybrid is None else hybrid
+        use_reranker = self.reranker is not None and self.reranker.is_available() and rerank is not False
+        candidate_count = max(self.candidate_pool if candidate_pool is None else candidate_pool, n_results)
+        
         try:
-            # Build where filter
-            where_filter = {}
-            
-            if pdf_filter:
-                where_filter["pdf_name"] = {"$contains": pdf_filter.lower()}
-            
-            if content_types:
-                where_filter["content_type"] = {"$in": content_types}
+            pdf_names = self.resolve_documents(pdf_filter, drugs)
+            where_filter = self._where_filter(pdf_names, content_types)
             
             # Get more results for better filtering
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=min(n_results * 3, 25),
-                where=where_filter if where_filter else None
-            )
+            if self.quantized_store is not None and len(self.quantized_store):
+                results = self._quantized_query(query_text, candidate_count, pdf_names, content_types)
+            else:
+                results = self.collection.query(
+                    query_texts=[query_text],
+                    n_results=candidate_count,
+                    where=where_filter
+                )
+            
+            if use_hybrid and len(self.lexical_index):
+                results = self._fuse_lexical_results(query_text, results, candidate_count, content_types, pdf_names)
             
+            if use_reranker:
+                candidates = self._process_query_results(results, candidate_count)
+                return self.reranker.rerank(query_text, candidates, n_results)
             return self._process_query_results(results, n_results)
             
         except Exception as e:
@@ -318,64 +738,288 @@ class EfficientVectorDB:
                 print(f"Error in fallback query: {e2}")
                 return []
     
+    def query_batch(self, query_texts: List[str], n_results: int = 8, pdf_filters: List[Optional[str]] = None,
+                    content_types: List[str] = None, hybrid: Optional[bool] = None,
+                    candidate_pool: Optional[int] = None, rerank: Optional[bool] = None,
+                    drugs: List[Optional[List[str]]] = None) -> List[List[Dict[str, Any]]]:
+        """Answer many queries at once; returns one result list per query.
+
+        All queries are embedded in one call and queries with the same filter are
+        searched together, so an unfiltered batch is a single vector search.
+        `pdf_filters` and `drugs` hold one entry per query, as in `query`.
+        Reranking scores the candidates of all queries in shared model batches.
+        """
+        if not self.is_initialized() or not query_texts:
+            return [[] for _ in query_texts]
+        
+        use_hybrid = self.hybrid_search if hybrid is None else hybrid
+        use_reranker = self.reranker is not None and self.reranker.is_available() and rerank is not False
+        candidate_count = max(self.candidate_pool if candidate_pool is None else candidate_pool, n_results)
+        pdf_filters = pdf_filters or [None] * len(query_texts)
+        drugs = drugs or [None] * len(query_texts)
+        
+        try:
+            embeddings = np.asarray(self.embedding_function(list(query_texts)), dtype=np.float32)
+            pdf_names = [self.resolve_documents(pdf_filter, query_drugs)
+                         for pdf_filter, query_drugs in zip(pdf_filters, drugs)]
+            
+            # Queries sharing a filter are searched in one call
+            groups = {}
+            for i, names in enumerate(pdf_names):
+                groups.setdefault(tuple(names) if names else None, []).append(i)
+            
+            per_query = [None] * len(query_texts)
+            for names, indices in groups.items():
+                names = list(names) if names else None
+                if self.quantized_store is not None and len(self.quantized_store):
+                    for i in indices:
+                        per_query[i] = self._quantized_query(
+                            query_texts[i], candidate_count, names, content_types, query_embedding=embeddings[i]
+                        )
+                    continue
+                results = self.collection.query(
+                    query_embeddings=embeddings[indices].tolist(),
+                    n_results=candidate_count,
+                    where=self._where_filter(names, content_types)
+                )
+                for position, i in enumerate(indices):
+                    per_query[i] = {key: [results[key][position]] for key in ("ids", "documents", "metadatas", "distances")}
+            
+            candidates = []
+            for i, results in enumerate(per_query):
+                if use_hybrid and len(self.lexical_index):
+                    results = self._fuse_lexical_results(
+                        query_texts[i], results, candidate_count, content_types, pdf_names[i]
+                    )
+                candidates.append(self._process_query_results(results, candidate_count if use_reranker else n_results))
+            
+            if use_reranker:
+                return self.reranker.rerank_batch(list(query_texts), candidates, n_results)
+            return candidates
+            
+        except Exception as e:
+            print(f"Error in batch query: {e}")
+            # Fall back to answering the queries one by one
+            return [
+                self.query(query_text, n_results=n_results, pdf_filter=pdf_filter, content_types=content_types,
+                           hybrid=hybrid, candidate_pool=candidate_pool, rerank=rerank, drugs=query_drugs)
+                for query_text, pdf_filter, query_drugs in zip(query_texts, pdf_filters, drugs)
+            ]
+    
+    def fuse_results(self, result_lists: List[List[Dict[str, Any]]], n_results: int = 8) -> List[Dict[str, Any]]:
+        """Merge ranked result lists (e.g. of sub-queries) with reciprocal rank fusion.
+
+        A chunk found by several lists is kept once, with the scores of all its
+        ranks summed; earlier lists win ties.
+        """
+        fused_scores = {}
+        records = {}
+        for results in result_lists:
+            for rank, result in enumerate(results):
+                key = (result.get("pdf_name"), result.get("chunk_text"))
+                fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                records.setdefault(key, result)
+        ranked_keys = sorted(fused_scores, key=lambda key: fused_scores[key], reverse=True)[:n_results]
+        return [records[key] for key in ranked_keys]
+    
+    def _where_filter(self, pdf_names: List[str] = None, content_types: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Build a where filter from exact equality conditions"""
+        conditions = []
+        if pdf_names:
+            conditions.append({"pdf_name": {"$in": pdf_names}})
+        if content_types:
+            conditions.append({"content_type": {"$in": content_types}})
+        
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        return conditions[0] if conditions else None
+    
+    def _quantized_query(self, query_text: str, candidate_count: int, pdf_names: List[str] = None,
+                         content_types: List[str] = None, query_embedding: Optional[Any] = None) -> Any:
+        """Dense search over the compressed index, returned in Chroma's query format"""
+        if query_embedding is None:
+            query_embedding = self.embedding_function([query_text])[0]
+        hits = self.quantized_store.search(query_embedding, k=candidate_count, pdf_names=pdf_names)
+        fetched = self.collection.get(ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas"])
+        records = {
+            doc_id: (document, metadata)
+            for doc_id, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        }
+        
+        ranked = [
+            (doc_id, distance) for doc_id, distance in hits
+            if doc_id in records and (not content_types or records[doc_id][1].get("content_type") in content_types)
+        ]
+        return {
+            "ids": [[doc_id for doc_id, _ in ranked]],
+            "documents": [[records[doc_id][0] for doc_id, _ in ranked]],
+            "metadatas": [[records[doc_id][1] for doc_id, _ in ranked]],
+            "distances": [[distance for _, distance in ranked]]
+        }
+    
+    def _fuse_lexical_results(self, query_text: str, results: Any, candidate_count: int,
+                              content_types: List[str] = None, pdf_names: List[str] = None) -> Any:
+        """Merge BM25 and dense candidates with reciprocal rank fusion.
+
+        Returns results in Chroma's query format. The distance of a fused candidate
+        is 1 - its RRF score relative to the best possible score (rank 1 in both lists).
+        """
+        dense_ids = results["ids"][0] if results and results.get("ids") else []
+        records = {
+            doc_id: (results["documents"][0][i], results["metadatas"][0][i])
+            for i, doc_id in enumerate(dense_ids)
+        }
+        
+        fused_scores = {}
+        for rank, doc_id in enumerate(dense_ids):
+            fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        lexical_hits = self.lexical_index.search(query_text, k=candidate_count, pdf_names=pdf_names)
+        for rank, (doc_id, _) in enumerate(lexical_hits):
+            fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        # Lexical-only candidates still need their text and metadata
+        missing_ids = [doc_id for doc_id, _ in lexical_hits if doc_id not in records]
+        if missing_ids:
+            fetched = self.collection.get(ids=missing_ids, include=["documents", "metadatas"])
+            for doc_id, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                if content_types and metadata.get("content_type") not in content_types:
+                    continue
+                records[doc_id] = (document, metadata)
+        
+        best_score = 2.0 / (self.rrf_k + 1)
+        ranked_ids = sorted(
+            (doc_id for doc_id in fused_scores if doc_id in records),
+            key=lambda doc_id: fused_scores[doc_id],
+            reverse=True
+        )[:candidate_count]
+        
+        return {
+            "ids": [ranked_ids],
+            "documents": [[records[doc_id][0] for doc_id in ranked_ids]],
+            "metadatas": [[records[doc_id][1] for doc_id in ranked_ids]],
+            "distances": [[1.0 - fused_scores[doc_id] / best_score for doc_id in ranked_ids]]
+        }
+    
     def _process_query_results(self, results: Any, n_results: int) -> List[Dict[str, Any]]:
-        """Process and rank query results with enhanced metadata handling"""
+        """Re-score candidates as one vectorized operation and build results for the top-n only"""
         if not results or not results["documents"] or len(results["documents"][0]) == 0:
             return []
         
-        scored_results = []
+        documents = results["documents"][0]
+        metadatas = results["metadatas"][0]
+        if results.get("distances"):
+            distances = np.asarray(results["distances"][0], dtype=np.float32)
+        else:
+            distances = np.full(len(documents), 0.5, dtype=np.float32)
         
-        for i in range(len(results["documents"][0])):
-            metadata = results["metadatas"][0][i]
-            
-            # Handle metadata parsing safely
+        rows = self._metadata_rows(metadatas)
+        if rows is not None:
+            # Column gathers from the metadata store
+            priors = self.metadata_store.numeric("prior_score", rows).astype(np.float32)
+        else:
+            # Static boosts were precomputed at ingestion; older chunks are scored on the fly
+            priors = np.fromiter(
+                (
+                    metadata["prior_score"] if "prior_score" in metadata
+                    else relevance_features(metadata)["prior_score"]
+                    for metadata in metadatas
+                ),
+                dtype=np.float32,
+                count=len(metadatas)
+            )
+        scores = np.minimum((1.0 - np.minimum(distances, 1.0)) * 0.6 + priors, 1.0)
+        top_indices = np.argsort(-scores, kind="stable")[:n_results]
+        
+        if rows is not None:
+            top_metadatas = self.metadata_store.gather(rows[top_indices])
+        else:
+            top_metadatas = [metadatas[i] for i in top_indices]
+        return [
+            self._build_result(documents[i], metadata, float(scores[i]), float(distances[i]))
+            for i, metadata in zip(top_indices, top_metadatas)
+        ]
+    
+    def _metadata_rows(self, metadatas: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Metadata store rows of the candidates, or None if some predate the store"""
+        rows = [metadata.get("row") for metadata in metadatas]
+        if any(row is None for row in rows):
+            return None
+        rows = np.asarray(rows, dtype=np.int64)
+        # Chunks carry the generation of the store their rows belong to (older chunks have none)
+        generations = {metadata.get("generation") for metadata in metadatas} - {None}
+        stale = bool(generations) and generations != {self.metadata_store.generation}
+        if stale or rows.max() >= len(self.metadata_store):
+            # The ingestion process added rows or rebuilt the store
+            self.metadata_store.load()
+        if generations and generations != {self.metadata_store.generation}:
+            return None
+        return rows if rows.max() < len(self.metadata_store) else None
+    
+    def _build_result(self, chunk_text: str, metadata: Dict[str, Any], score: float, distance: float) -> Dict[str, Any]:
+        """Assemble the result dict of a selected candidate"""
+        # Handle metadata parsing safely
+        try:
+            if isinstance(metadata.get('table_data_sample'), str):
+                metadata['table_data_sample'] = json.loads(metadata['table_data_sample'])
+        except:
+            metadata['table_data_sample'] = []
+        
+        shared_sources = metadata.get('shared_sources') or []
+        if isinstance(shared_sources, str):
             try:
-                if isinstance(metadata.get('table_data_sample'), str):
-                    metadata['table_data_sample'] = json.loads(metadata['table_data_sample'])
+                shared_sources = json.loads(shared_sources)
             except:
-                metadata['table_data_sample'] = []
-            
-            # Get page information with proper fallbacks
-            page_info = self._get_page_info(metadata)
-            
-            score = self._calculate_relevance_score(
-                results["documents"][0][i],
-                metadata,
-                results["distances"][0][i] if results["distances"] else 0.5
-            )
-            
-            scored_results.append({
-                "chunk_text": results["documents"][0][i],
-                "pdf_index": metadata.get("pdf_index", 0),
-                "pdf_name": metadata.get("pdf_name", "unknown"),
-                "section": metadata.get("section", ""),
-                "page_start": page_info.get("start", 1),
-                "page_end": page_info.get("end", 1),
-                "pdf_page_number": metadata.get("pdf_page_number", page_info.get("start", 1)),
-                "pdf_page_start": metadata.get("pdf_page_start", page_info.get("start", 1)),
-                "pdf_page_end": metadata.get("pdf_page_end", page_info.get("end", 1)),
-                "is_fda": metadata.get("is_fda", False),
-                "content_type": metadata.get("content_type", "general"),
-                "doc_type": metadata.get("doc_type", "text"),
-                "table_index": metadata.get("table_index"),
-                "row_index": metadata.get("row_index"),
-                "image_index": metadata.get("image_index"),
-                "score": score,
-                "distance": results["distances"][0][i] if results["distances"] else 0.5
-            })
+                shared_sources = []
+        # Copies, so the stored back-references are not modified
+        shared_sources = [dict(source) for source in shared_sources]
+        for source in shared_sources:
+            source_pages = self._get_page_info(source)
+            source["page_start"] = source_pages["start"]
+            source["page_end"] = source_pages["end"]
+        
+        # Get page information with proper fallbacks
+        page_info = self._get_page_info(metadata)
         
-        # Sort by score and return top results
-        scored_results.sort(key=lambda x: x["score"], reverse=True)
-        return scored_results[:n_results]
+        return {
+            "chunk_text": chunk_text,
+            "pdf_index": metadata.get("pdf_index", 0),
+            "pdf_name": metadata.get("pdf_name", "unknown"),
+            "section": metadata.get("section", ""),
+            "page_start": page_info["start"],
+            "page_end": page_info["end"],
+            "is_fda": metadata.get("is_fda", False),
+            "content_type": metadata.get("content_type", "general"),
+            "doc_type": metadata.get("doc_type", "text"),
+            "table_index": metadata.get("table_index"),
+            "row_index": metadata.get("row_index"),
+            "image_index": metadata.get("image_index"),
+            "char_start": metadata.get("char_start"),
+            "char_end": metadata.get("char_end"),
+            "shared_sources": shared_sources,
+            "score": score,
+            "distance": distance
+        }
     
-    def _get_page_info(self, metadata: Dict[str, Any]) -> Dict[str, int]:
-        """Extract page information with proper fallbacks"""
+    def _get_page_info(self, metadata: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """Resolve the pages of a chunk from its character offsets, or stored page fields; None if unknown"""
+        if metadata.get('char_start') is not None and metadata.get('char_end') is not None:
+            span = self.page_index.page_span(metadata.get('pdf_name'), metadata['char_start'], metadata['char_end'])
+            if span:
+                return {"start": span[0], "end": span[1]}
+        
+        # Tables and images sit on one page, stitched tables on a page range
+        if metadata.get('page_number'):
+            return {"start": metadata['page_number'], "end": metadata.get('page_end') or metadata['page_number']}
+        
         page_start = (
             metadata.get('pdf_page_start') or 
             metadata.get('page_start') or 
-            metadata.get('pdf_page_number') or 
-            1
+            metadata.get('pdf_page_number')
         )
+        if not page_start:
+            # No page is better than a wrong citation
+            return {"start": None, "end": None}
         
         page_end = (
             metadata.get('pdf_page_end') or 
@@ -385,40 +1029,6 @@ class EfficientVectorDB:
         
         return {"start": page_start, "end": page_end}
     
-    def _calculate_relevance_score(self, chunk_text: str, metadata: Dict[str, Any], distance: float) -> float:
-        """Calculate enhanced relevance score"""
-        base_score = 1.0 - min(distance, 1.0)  # Convert distance to similarity
-        
-        # Content type weights
-        content_type_weights = {
-            "medical": 0.5,
-            "tabular": 0.4,
-            "visual": 0.4,
-            "general": 0.3,
-            "metadata": 0.1
-        }
-        
-        content_bonus = content_type_weights.get(metadata.get("content_type", "general"), 0.3)
-        
-        # FDA document bonus
-        fda_bonus = 0.3 if metadata.get("is_fda", False) else 0.0
-        
-        # Section importance
-        section = metadata.get("section", "").lower()
-        section_bonus = 0.0
-        if any(key in section for key in ['dosage', 'administration']):
-            section_bonus = 0.2
-        elif any(key in section for key in ['adverse', 'warning', 'contraindication']):
-            section_bonus = 0.1
-        
-        # Document type bonus
-        doc_type_bonus = 0.1 if metadata.get("doc_type") in ["table", "image"] else 0.0
-        
-        # Calculate final score
-        final_score = base_score * 0.6 + content_bonus * 0.2 + fda_bonus * 0.1 + section_bonus * 0.1 + doc_type_bonus * 0.1
-        
-        return min(final_score, 1.0)
-    
     def list_all_documents(self) -> List[str]:
         """List all unique PDF names in the database"""
         if not self.is_initialized():